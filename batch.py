@@ -0,0 +1,373 @@
+import argparse
+import json
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Union
+
+from numpy.typing import NDArray
+
+from utils.chain import OptionChain
+from utils.provider import MarketDataProvider, get_provider
+from utils.watchlist import load_chains
+from vis.montecarlo import CHUNK_PATHS, PNL_RANGE_SIGMAS, simulate_strategy, terminal_prices
+from vis.strategy import StrategyPayoff
+from vis.surface_cache import SurfaceCache
+from vis.vol_surface import VolSurface
+
+# stock prices the value of a strategy with legs of several expirations is priced on, for the Monte Carlo metrics
+CALENDAR_GRID_PRICES = 2001
+
+# strategy names are used as output directory names, so they are restricted to a single plain path component that
+# does not clash with the summary files written next to them
+STRATEGY_NAME = re.compile(r'[A-Za-z0-9_][A-Za-z0-9_.-]*')
+RESERVED_NAMES = {'summary.csv', 'summary.json'}
+
+# Headless counterpart of main.py: prices strategies from a spec file and writes payoff curves, value/profit surfaces
+# and summary metrics to disk. Nothing here imports PyQt5 or pyqtgraph (vis.payoff is only loaded by the window), so
+# it runs on servers without a display.
+#
+# Spec file: a JSON list of strategies (or {"strategies": [...]}), e.g.
+# [
+#     {"name": "aapl_bull_call", "ticker": "AAPL",
+#      "legs": [{"type": "call", "expiration": "12/20/2024", "strike": 230, "position": "long"},
+#               {"type": "call", "expiration": "12/20/2024", "strike": 240, "position": "short", "quantity": 1}]}
+# ]
+# Names are optional (strategy_<i> by default), must be unique and may only use letters, digits, '_', '-' and '.'.
+# "expiration" is a chain label (MM/DD/YYYY) or YYYY-MM-DD. A leg may set "premium" (per share), otherwise it is
+# priced at the ask like in the app. With --vol-surface, legs are priced on every date at the volatility of a surface
+# fitted to the whole chain (vis.vol_surface), at their strike and the time they have left, instead of the quoted
+# volatility of their contract.
+
+
+def load_spec(path: Path) -> list[dict]:
+    '''
+    Read a strategy spec file. Raises ValueError if it is malformed, or if a strategy name is not a valid directory
+    name (see STRATEGY_NAME) or is used twice.
+    '''
+    with open(path) as f:
+        spec = json.load(f)
+
+    strategies = spec['strategies'] if isinstance(spec, dict) else spec
+    names = set()
+    for i, strategy in enumerate(strategies):
+        if not strategy.get('legs') or 'ticker' not in strategy:
+            raise ValueError(f"Strategy {strategy.get('name', i)} needs a ticker and at least one leg.")
+        name = strategy.setdefault('name', f"strategy_{i}")
+        if not isinstance(name, str) or not STRATEGY_NAME.fullmatch(name):
+            raise ValueError(f"Invalid strategy name {name!r}: use letters, digits, '_', '-' and '.', not starting "
+                             f"with '.'.")
+        # compared case insensitively, the output directories would clash on case insensitive file systems
+        if name.lower() in RESERVED_NAMES:
+            raise ValueError(f"Strategy name {name!r} is reserved for the summary files.")
+        if name.lower() in names:
+            raise ValueError(f"Strategy name {name!r} is used more than once.")
+        names.add(name.lower())
+
+    return strategies
+
+
+def find_contract(chain: OptionChain, opt_type: str, expiration: str, strike: float) -> pd.Series:
+    '''
+    Get the row of one contract of the chain. Raises ValueError if it is not listed.
+
+    ### Parameters:
+    - chain: OptionChain: Chain of the underlying.
+    - opt_type: str: 'call' or 'put'.
+    - expiration: str: Expiration label (MM/DD/YYYY) or date (YYYY-MM-DD).
+    - strike: float: Strike price.
+    '''
+    if expiration not in chain.expirations:
+        try:
+            expiration = datetime.strptime(expiration, '%Y-%m-%d').strftime('%m/%d/%Y')
+        except ValueError:
+            pass
+    if expiration not in chain.expirations:
+        raise ValueError(f"No expiration {expiration} in the chain.")
+
+    options = chain.view(f"{opt_type}s", expiration)
+    rows = options.index[np.isclose(options['Strike'].to_numpy(), strike)]
+    if len(rows) == 0:
+        raise ValueError(f"No {opt_type} with strike {strike} expiring {expiration}.")
+
+    return options.loc[rows[0]]
+
+
+def run_strategy(strategy: dict,
+                 chain: OptionChain,
+                 s0: float,
+                 r: float,
+                 q: float,
+                 cache: SurfaceCache,
+                 num_prices: int = 20,
+                 num_dates: int = 20,
+                 price_range: float = 0.1,
+                 n_paths: int = 100_000,
+                 seed: Optional[int] = 0,
+                 vol_surface: Optional[VolSurface] = None) -> tuple[dict, dict[str, pd.DataFrame]]:
+    '''
+    Price one strategy. Returns its summary metrics and its tables: the expiry payoff curve, and the value and profit
+    surfaces (dates x stock prices, like the heatmap of the app). Unlike the heatmap, every leg is priced with its own
+    time to expiration, and takes its intrinsic value once expired. Max profit, max loss and break-evens are those of
+    the expiry payoff, so they are left empty (None) for strategies with legs of several expirations.
+
+    ### Parameters:
+    - strategy: dict: Strategy of the spec file.
+    - chain: OptionChain: Chain of the underlying.
+    - s0: float: Price of the underlying.
+    - r: float: Risk-free interest rate.
+    - q: float: Dividend yield.
+    - cache: SurfaceCache: Cache of per-leg surfaces, shared by all strategies of a batch.
+    - num_prices: int: Number of stock prices of the surfaces.
+    - num_dates: int: Number of dates of the surfaces.
+    - price_range: float: The surfaces cover s0 * (1 -/+ price_range).
+    - n_paths: int: Monte Carlo paths of the probability metrics. 0 to skip them. Strategies with legs of several
+    expirations are held to the first one (see simulate_to_first_expiry).
+    - seed: int: Seed of the Monte Carlo simulation.
+    - vol_surface: VolSurface: Surface fitted to the chain. If given, every leg is priced on each date at the
+    volatility of the surface at its strike and the time it has left, and the Monte Carlo simulation at the at the
+    money volatility of the first expiration. Defaults to the quoted volatilities.
+    '''
+    payoff = StrategyPayoff()
+    legs = []
+    for leg in strategy['legs']:
+        opt_type = leg['type'].lower()
+        option = find_contract(chain, opt_type, str(leg['expiration']), float(leg['strike']))
+        buy = leg.get('position', 'long').lower() == 'long'
+        quantity = int(leg.get('quantity', 1))
+        premium = float(leg.get('premium', option['Ask']))
+
+        for _ in range(quantity):
+            payoff.add_leg(opt_type, option['Strike'], premium, buy, s0)
+        legs.append({
+            'opt_type': opt_type[0],
+            'k': option['Strike'],
+            'iv': option['Volatility']/100 if option['Volatility'] < 200 else 2, # same cap as Heatmap.get_legs
+            'contract': option['Contract Name'],
+            'days': int(option['Days to Expiration']),
+            'sign': (1 if buy else -1) * quantity,
+            'premium': premium,
+        })
+
+    cost = sum(leg['sign'] * leg['premium'] * 100 for leg in legs)
+
+    # surfaces from today to the last expiration
+    prices = np.round(np.linspace(s0 * (1 - price_range), s0 * (1 + price_range), num_prices), 2)
+    last = max(leg['days'] for leg in legs)
+    days = np.unique(np.round(np.linspace(0, last, num_dates)).astype(np.int64))
+
+    values = np.zeros((len(days), len(prices)))
+    for leg in legs:
+        dtes = np.maximum(leg['days'] - days, 0) / 365
+        values += leg['sign'] * 100 * cache.get_surface(leg['opt_type'], prices, dtes, leg['k'], r, q,
+                                                        leg_volatility(leg, dtes, vol_surface), contract=leg['contract'])
+
+    value = pd.DataFrame(values, index=pd.Index(days, name='Days'), columns=prices)
+    tables = {
+        'payoff': pd.DataFrame({'Price': payoff.prices, 'Payoff': payoff.payoff}),
+        'value': value,
+        'profit': value - cost,
+    }
+
+    single_expiry = len(set(leg['days'] for leg in legs)) == 1
+    summary = {
+        'name': strategy['name'],
+        'ticker': strategy['ticker'],
+        'cost': cost,
+        'max_profit': payoff.max_profit() if single_expiry else None,
+        'max_loss': payoff.max_loss() if single_expiry else None,
+        'break_evens': payoff.break_evens().round(2).tolist() if single_expiry else None,
+    }
+    if n_paths > 0:
+        # held to the first expiration, at the average volatility of the legs
+        t = max(min(leg['days'] for leg in legs), 0.5) / 365
+        iv = float(np.mean([leg['iv'] for leg in legs])) if vol_surface is None else float(vol_surface.iv(s0, t))
+        if single_expiry:
+            metrics = simulate_strategy(payoff, s0, t, r, q, iv, n_paths=n_paths, seed=seed)
+        else:
+            metrics = simulate_to_first_expiry(legs, cost, s0, t, r, q, iv, cache, n_paths, seed, vol_surface)
+        summary.update({'pop': metrics['pop'], 'expected_pnl': metrics['expected_pnl'],
+                        'std_error': metrics['std_error']})
+
+    return summary, tables
+
+
+def leg_volatility(leg: dict,
+                   dtes: NDArray[np.float64],
+                   vol_surface: Optional[VolSurface] = None) -> Union[NDArray[np.float64], float]:
+    '''
+    Volatility a leg is priced at on each time to expiration of dtes: the volatility of the surface at its strike and
+    that time if a surface is given, otherwise its quoted volatility.
+    '''
+    if vol_surface is None:
+        return leg['iv']
+    return vol_surface.iv(leg['k'], dtes)
+
+
+def simulate_to_first_expiry(legs: list[dict],
+                             cost: float,
+                             s0: float,
+                             t: float,
+                             r: float,
+                             q: float,
+                             iv: float,
+                             cache: SurfaceCache,
+                             n_paths: int,
+                             seed: Optional[int] = 0,
+                             vol_surface: Optional[VolSurface] = None) -> dict:
+    '''
+    Monte Carlo probability metrics (pop, expected_pnl and std_error, like vis.montecarlo.simulate_strategy) of a
+    strategy whose legs expire on different dates, held to the first expiration t. There, the legs expiring take
+    their intrinsic value and the others are valued like the surfaces, American at their own volatility (see
+    leg_volatility). The value is
+    priced once through the cache on CALENDAR_GRID_PRICES stock prices (plus the strikes, where the intrinsic values
+    kink) covering PNL_RANGE_SIGMAS standard deviations, and interpolated at the simulated prices.
+
+    ### Parameters:
+    - legs: list[dict]: Legs of the strategy, as built by run_strategy.
+    - cost: float: Net debit of the strategy, in dollars.
+    - iv: float: Volatility of the simulated stock price.
+    - cache: SurfaceCache: Cache of per-leg surfaces.
+    - n_paths: int: Number of simulated paths.
+    - seed: int: Seed of the random number generator.
+    - vol_surface: VolSurface: Surface the legs are valued on, see run_strategy.
+    The other parameters are the same as run_strategy.
+    '''
+    spread = PNL_RANGE_SIGMAS * iv * np.sqrt(t)
+    drift = (r - q - 0.5 * iv ** 2) * t
+    grid = np.unique(np.concatenate([np.linspace(s0 * np.exp(drift - spread), s0 * np.exp(drift + spread),
+                                                 CALENDAR_GRID_PRICES), [leg['k'] for leg in legs]]))
+
+    values = np.full(len(grid), -cost)
+    for leg in legs:
+        dtes = np.array([max(leg['days'] / 365 - t, 0)])
+        values += leg['sign'] * 100 * cache.get_surface(leg['opt_type'], grid, dtes, leg['k'], r, q,
+                                                        leg_volatility(leg, dtes, vol_surface),
+                                                        contract=leg['contract'])[0]
+
+    rng = np.random.default_rng(seed)
+    n_profit, total, total_sq = 0, 0.0, 0.0
+    for start in range(0, n_paths, CHUNK_PATHS):
+        pnl = np.interp(terminal_prices(s0, t, r, q, iv, min(CHUNK_PATHS, n_paths - start), rng), grid, values)
+        n_profit += np.sum(pnl > 0)
+        total += pnl.sum()
+        total_sq += np.square(pnl).sum()
+
+    mean = total / n_paths
+    return {'pop': n_profit / n_paths, 'expected_pnl': mean,
+            'std_error': np.sqrt(max(total_sq / n_paths - mean ** 2, 0) / n_paths)}
+
+
+def run_batch(spec_path: Path,
+              out_dir: Path,
+              engine: MarketDataProvider,
+              num_prices: int = 20,
+              num_dates: int = 20,
+              price_range: float = 0.1,
+              n_paths: int = 100_000,
+              seed: Optional[int] = 0,
+              use_vol_surface: bool = False) -> pd.DataFrame:
+    '''
+    Price every strategy of a spec file and write the results to out_dir: one directory per strategy with
+    payoff.csv, value.csv and profit.csv, plus summary.csv and summary.json over all strategies. The chains and
+    quotes of every ticker are loaded up front, concurrently (see utils.watchlist.load_chains), and leg surfaces are
+    shared through one SurfaceCache. With use_vol_surface, a VolSurface is fitted to every chain once and legs are
+    priced off it (see run_strategy). A strategy that fails, or whose chain could not be loaded, is reported and
+    skipped. Returns the summary.
+    '''
+    strategies = load_spec(spec_path)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    markets = {}
+    for market in load_chains(engine, [strategy['ticker'] for strategy in strategies]):
+        markets[market['ticker']] = market
+
+    cache = SurfaceCache()
+    surfaces = {}
+    summaries = []
+    for strategy in strategies:
+        market = markets[strategy['ticker'].upper()]
+        try:
+            if market['error'] is not None:
+                raise ValueError(f"could not load the chain of {market['ticker']}: {market['error']}")
+            chain, s0, r, q = market['chain'], market['price'], market['interest_rate']/100, market['div_yield']
+            if use_vol_surface and market['ticker'] not in surfaces:
+                try:
+                    surfaces[market['ticker']] = VolSurface.from_chain(chain, s0, r, q)
+                except ValueError as e:
+                    print(f"Pricing {market['ticker']} at the quoted volatilities: {e}")
+                    surfaces[market['ticker']] = None
+
+            summary, tables = run_strategy(strategy, chain, s0, r, q, cache, num_prices, num_dates, price_range,
+                                           n_paths, seed, surfaces.get(market['ticker']))
+        except (ValueError, KeyError) as e:
+            print(f"Skipping {strategy['name']}: {e}")
+            continue
+
+        strategy_dir = out_dir / strategy['name']
+        strategy_dir.mkdir(exist_ok=True)
+        tables['payoff'].to_csv(strategy_dir / 'payoff.csv', index=False)
+        tables['value'].to_csv(strategy_dir / 'value.csv')
+        tables['profit'].to_csv(strategy_dir / 'profit.csv')
+        summaries.append(summary)
+
+    summary = pd.DataFrame(summaries)
+    summary.to_csv(out_dir / 'summary.csv', index=False)
+    with open(out_dir / 'summary.json', 'w') as f:
+        json.dump(summaries, f, indent=2)
+
+    return summary
+
+
+def main(spec: str, out: str, demo: bool = False, offline: bool = False, num_prices: int = 20, num_dates: int = 20,
+         price_range: float = 0.1, n_paths: int = 100_000, seed: Optional[int] = 0, url: Optional[str] = None,
+         use_vol_surface: bool = False):
+    start = time.perf_counter()
+    try:
+        engine = get_provider(demo, offline, url)
+    except ConnectionError as e:
+        print(e)
+        sys.exit(1)
+    try:
+        summary = run_batch(Path(spec), Path(out), engine, num_prices, num_dates, price_range, n_paths, seed,
+                            use_vol_surface)
+    except ValueError as e: # malformed spec file
+        print(f"Invalid spec {spec}: {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+
+    print(f"Priced {len(summary)} strategies in {elapsed:.2f} s, results in {out}")
+    if getattr(engine, 'http', None) is not None:
+        print(engine.http.report())
+    sys.exit(0 if len(summary) > 0 else 1)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Option Profit Calculator batch mode: price strategies without the GUI')
+    parser.add_argument('spec', help='JSON file of strategies to price.')
+    parser.add_argument('out', help='Directory the results are written to.')
+    parser.add_argument('-d', '--demo', action='store_true',
+                        help='Use the dummy AAPL data instead of the Schwab API.')
+    parser.add_argument('-o', '--offline', action='store_true',
+                        help='Load option chains from snapshots captured in data/snapshots.')
+    parser.add_argument('--url', default=None,
+                        help='Load option chains from a server with the Schwab market data endpoints (utils.mock_server).')
+    parser.add_argument('--prices', type=int, default=20, help='Number of stock prices of the surfaces.')
+    parser.add_argument('--dates', type=int, default=20, help='Number of dates of the surfaces.')
+    parser.add_argument('--range', type=float, default=0.1,
+                        help='Price range of the surfaces, as a fraction of the stock price.')
+    parser.add_argument('--paths', type=int, default=100_000,
+                        help='Monte Carlo paths for the probability of profit, 0 to skip it.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the Monte Carlo simulation.')
+    parser.add_argument('--vol-surface', action='store_true',
+                        help='Price legs at the volatility of a surface fitted to the whole chain.')
+
+    args = parser.parse_args()
+
+    main(args.spec, args.out, args.demo, args.offline, args.prices, args.dates, args.range, args.paths, args.seed, args.url,
+         args.vol_surface)
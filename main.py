@@ -1,20 +1,71 @@
+import time
+START = time.perf_counter() # before the heavy imports, for --startup-budget
+
 from PyQt5 import QtWidgets as qtw
-import src.window as win
 import sys
 import argparse
+import subprocess
 
-def main(demo: bool = False):
+def main(demo: bool = False, offline: bool = False, startup_budget: float = None, url: str = None):
     app = qtw.QApplication([])
-    
-    window = win.MainWindow(demo=demo)
+
+    import src.window as win # after the QApplication, so the window is the only thing left to load
+
+    window = win.MainWindow(demo=demo, offline=offline, url=url)
     window.show()
+
+    if startup_budget is not None:
+        # time until the dashboard is painted, then quit instead of running the app
+        app.processEvents()
+        elapsed = time.perf_counter() - START
+        print(f'Startup took {elapsed:.2f} s (budget {startup_budget:.2f} s)')
+        sys.exit(0 if elapsed <= startup_budget else 1)
+
     sys.exit(app.exec_())
 
+def import_report(args: list[str], top: int = 15) -> None:
+    '''
+    Start the app in a child process with -X importtime, quit once the dashboard is painted, and print the slowest
+    imports grouped by top-level package. Time is the self time of every module of the package, in milliseconds.
+    '''
+    result = subprocess.run([sys.executable, '-X', 'importtime', __file__, *args, '--startup-budget', 'inf'],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+    packages = {}
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(self_us)
+
+    total = sum(packages.values())
+    print(f'{"package":<24}{"ms":>10}{"share":>8}')
+    for package, us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f'{package:<24}{us / 1000:>10.1f}{us / total:>8.1%}')
+    print(f'{"total":<24}{total / 1000:>10.1f}')
+    print(result.stdout.strip())
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Option Profit Calculator Configs')
     parser.add_argument('-d', '--demo', action='store_true',
                         help='Run demo version of the app for users who do not have an active Schwab Developer account.')
+    parser.add_argument('-o', '--offline', action='store_true',
+                        help='Run offline, loading option chains from snapshots captured in data/snapshots.')
+    parser.add_argument('--url', default=None,
+                        help='Load option chains from a server with the Schwab market data endpoints, e.g. the local '
+                             'stand-in started with python -m utils.mock_server.')
+    parser.add_argument('--import-report', action='store_true',
+                        help='Print the import time of each package at startup, then quit.')
+    parser.add_argument('--startup-budget', type=float, default=None, metavar='SECONDS',
+                        help='Quit once the dashboard is painted, exit with an error if that took longer than SECONDS. '
+                             'Use QT_QPA_PLATFORM=offscreen to run it without a display.')
 
     args = parser.parse_args()
 
-    main(args.demo)
\ No newline at end of file
+    if args.import_report:
+        flags = [flag for flag, on in (('--demo', args.demo), ('--offline', args.offline)) if on]
+        import_report(flags + (['--url', args.url] if args.url else []))
+    else:
+        main(args.demo, args.offline, args.startup_budget, args.url)
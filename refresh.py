@@ -0,0 +1,73 @@
+import argparse
+import sys
+import time
+
+from pathlib import Path
+from typing import Optional
+
+from utils.provider import get_provider
+from utils.watchlist import SCHWAB_REQUESTS_PER_SECOND, load_chains
+
+# Loads the option chains of a watchlist concurrently, e.g. every morning before the market opens. With the Schwab
+# API, every chain is saved as a snapshot (see utils.snapshots), so the app and batch mode can then run on them with
+# --offline. Nothing here imports PyQt5.
+
+
+def read_watchlist(path: Path) -> list[str]:
+    '''
+    Read a watchlist file: one ticker per line, blank lines and lines starting with # are skipped.
+    '''
+    with open(path) as f:
+        lines = [line.split('#')[0].strip() for line in f]
+
+    return [line for line in lines if line]
+
+
+def main(tickers: list[str], demo: bool = False, offline: bool = False, url: Optional[str] = None,
+         max_workers: int = 8, rate: float = SCHWAB_REQUESTS_PER_SECOND, burst: int = 8):
+    start = time.perf_counter()
+    try:
+        engine = get_provider(demo, offline, url)
+    except ConnectionError as e:
+        print(e)
+        sys.exit(1)
+
+    failed = []
+    for market in load_chains(engine, tickers, max_workers, rate, burst):
+        if market['error'] is not None:
+            failed.append(market['ticker'])
+            print(f"{market['ticker']:<8}failed: {market['error']}")
+        else:
+            print(f"{market['ticker']:<8}{len(market['chain']):>7} contracts  price {market['price']:>9.2f}"
+                  f"  {market['seconds']:>6.2f} s")
+    elapsed = time.perf_counter() - start
+
+    loaded = len(set(ticker.upper() for ticker in tickers)) - len(failed)
+    print(f"Loaded {loaded} chains in {elapsed:.2f} s" + (f", failed: {', '.join(failed)}" if failed else ''))
+    if getattr(engine, 'http', None) is not None:
+        print(engine.http.report())
+    sys.exit(0 if not failed else 1)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Option Profit Calculator: load the option chains of a watchlist')
+    parser.add_argument('tickers', nargs='*', help='Ticker symbols to load.')
+    parser.add_argument('-f', '--file', default=None, help='Watchlist file, one ticker per line.')
+    parser.add_argument('-d', '--demo', action='store_true',
+                        help='Use the dummy AAPL data instead of the Schwab API.')
+    parser.add_argument('-o', '--offline', action='store_true',
+                        help='Load option chains from snapshots captured in data/snapshots.')
+    parser.add_argument('--url', default=None,
+                        help='Load option chains from a server with the Schwab market data endpoints (utils.mock_server).')
+    parser.add_argument('--workers', type=int, default=8, help='Chains downloaded at once.')
+    parser.add_argument('--rate', type=float, default=SCHWAB_REQUESTS_PER_SECOND,
+                        help='Chain requests per second, 0 for no limit. Defaults to the Schwab limit.')
+    parser.add_argument('--burst', type=int, default=8,
+                        help='Chain requests allowed back to back before the rate limit applies.')
+
+    args = parser.parse_args()
+
+    tickers = args.tickers + (read_watchlist(Path(args.file)) if args.file else [])
+    if not tickers:
+        parser.error('no tickers given, list them or pass a watchlist file with --file')
+
+    main(tickers, args.demo, args.offline, args.url, args.workers, args.rate, args.burst)
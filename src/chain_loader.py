@@ -0,0 +1,257 @@
+import threading
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+from PyQt5 import QtCore
+
+from utils.provider import MarketDataProvider, get_provider
+
+_executor = None
+_engine_jobs = {}
+
+
+def get_executor() -> ThreadPoolExecutor:
+    '''
+    Returns the thread pool chain downloads run on, creating it on first use. A few workers so that a slow download
+    of a cancelled ticker does not hold up the next one.
+    '''
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='chain')
+    return _executor
+
+
+def create_engine(demo: bool = False, offline: bool = False, url: Optional[str] = None) -> MarketDataProvider:
+    '''
+    Create the data engine of the app, see utils.provider.get_provider. Runs on the chain thread pool.
+    '''
+    return get_provider(demo, offline, url)
+
+
+def get_engine_job(demo: bool = False, offline: bool = False, url: Optional[str] = None) -> 'EngineJob':
+    '''
+    Returns the EngineJob creating the data engine for this mode, starting it on first use. The job is shared, so the
+    dashboard can warm the engine up at startup and the strategy builder picks up the same engine later. A job that
+    failed is replaced by a new one, so the next caller retries.
+    '''
+    job = _engine_jobs.get((demo, offline, url))
+    if job is None or job.error is not None:
+        job = EngineJob(demo, offline, url)
+        _engine_jobs[(demo, offline, url)] = job
+        job.start()
+    return job
+
+
+class EngineJob(QtCore.QObject):
+    '''
+    Creates the data engine (see create_engine) on the chain thread pool, so connecting to the data source does not
+    block the Qt event loop. Signals are delivered on the GUI thread. Use get_engine_job to share the job.
+
+    ### Parameters:
+    - demo: bool: Create a DummyData engine.
+    - offline: bool: Create a SnapshotData engine.
+    - url: str: Create an HTTPData engine reading from the server at this URL.
+
+    ### Attributes:
+    - engine: MarketDataProvider: The engine once created, None before.
+    - error: str: Error message if the engine could not be created, None otherwise.
+
+    ### Signals:
+    - ready(object): The engine.
+    - failed(str): Error message if the engine could not be created.
+
+    ### Methods:
+    - start: Submit the job to the thread pool.
+    '''
+    ready = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal(str)
+
+    # emitted from the worker thread, queued to the GUI thread
+    _done = QtCore.pyqtSignal(object)
+
+    def __init__(self, demo: bool = False, offline: bool = False, url: Optional[str] = None,
+                 parent: Optional[QtCore.QObject] = None):
+        super().__init__(parent)
+
+        self.demo = demo
+        self.offline = offline
+        self.url = url
+
+        self.engine = None
+        self.error = None
+        self._future = None
+
+        self._done.connect(self.__on_done, QtCore.Qt.QueuedConnection)
+
+        return
+
+    def start(self) -> None:
+        '''
+        Submits the engine creation to the thread pool.
+        '''
+        self._future = get_executor().submit(create_engine, self.demo, self.offline, self.url)
+        self._future.add_done_callback(self._done.emit)
+
+        return
+
+    def __on_done(self, future: Future) -> None:
+        '''
+        Runs on the GUI thread once the engine is created.
+        '''
+        error = future.exception()
+        if error is not None:
+            # some errors (e.g. a cancelled authentication) come without a message
+            self.error = str(error) or 'check your connection and your credentials.'
+            self.failed.emit(self.error)
+        else:
+            self.engine = future.result()
+            self.ready.emit(self.engine)
+
+        return
+
+
+class ChainLoadJob(QtCore.QObject):
+    '''
+    Downloads and parses the options chain of a ticker on a worker thread, off the Qt event loop. The expirations
+    are handed to the GUI thread one at a time, so tabs can be added as they arrive while the window stays responsive.
+    Signals are delivered on the GUI thread, and never after the job is cancelled.
+
+    ### Parameters:
+    - engine: MarketDataProvider: Data engine to load the chain and quote from.
+    - ticker: str: Ticker symbol of the security.
+
+    ### Signals:
+    - chain_ready(object, float, float): The {'calls': ..., 'puts': ...} chain, the interest rate (in percent) and
+    the last price of the security.
+    - expiration_ready(str, object, object): Expiration label and its calls and puts DataFrames.
+    - finished(): Every expiration has been emitted.
+    - failed(str): Error message if the chain could not be loaded.
+
+    ### Methods:
+    - start: Submit the job to the thread pool.
+    - cancel: Cancel the job. A download in progress is not interrupted, but its result is dropped.
+    - release: Delete the job once its download can no longer report back.
+    '''
+    chain_ready = QtCore.pyqtSignal(object, float, float)
+    expiration_ready = QtCore.pyqtSignal(str, object, object)
+    finished = QtCore.pyqtSignal()
+    failed = QtCore.pyqtSignal(str)
+
+    # emitted from the worker thread, queued to the GUI thread
+    _chain_ready = QtCore.pyqtSignal(object, float, float)
+    _expiration_ready = QtCore.pyqtSignal(str, object, object)
+    _done = QtCore.pyqtSignal(object)
+
+    def __init__(self, engine, ticker: str, parent: Optional[QtCore.QObject] = None):
+        super().__init__(parent)
+
+        self.engine = engine
+        self.ticker = ticker
+
+        self.cancelled = False
+        self._future = None
+        self._reported = False # the done callback of the download has finished
+        self._released = False
+        self._lock = threading.Lock()
+
+        self._chain_ready.connect(self.__on_chain_ready, QtCore.Qt.QueuedConnection)
+        self._expiration_ready.connect(self.__on_expiration_ready, QtCore.Qt.QueuedConnection)
+        self._done.connect(self.__on_done, QtCore.Qt.QueuedConnection)
+
+        return
+
+    def start(self) -> None:
+        '''
+        Submits the download to the thread pool.
+        '''
+        self._future = get_executor().submit(self.__load)
+        self._future.add_done_callback(self.__on_future_done)
+
+        return
+
+    def release(self) -> None:
+        '''
+        Schedules the job for deletion. A download in progress cannot be interrupted and reports back from the
+        thread pool, so the job is only deleted once it has, otherwise it would emit on a deleted object. Call it once.
+        '''
+        with self._lock:
+            self._released = True
+            idle = self._future is None or self._reported
+        if idle:
+            self.deleteLater()
+
+        return
+
+    def cancel(self) -> None:
+        '''
+        Cancels the job. No further signals are emitted.
+        '''
+        self.cancelled = True
+        if self._future is not None:
+            self._future.cancel()
+
+        return
+
+    def __load(self) -> None:
+        '''
+        Runs on a worker thread. Downloads the chain, then builds and emits the DataFrames of each expiration, in
+        date order. An expiration listing only calls (or only puts) gets an empty DataFrame for the other side.
+        '''
+        data, r_f = self.engine.get_options_chain_dict(self.ticker)
+        price = self.engine.get_price(self.ticker)
+        if self.cancelled:
+            return
+
+        self._chain_ready.emit(data, float(r_f), float(price))
+
+        calls, puts = data['calls'], data['puts']
+        expdates = sorted(set(calls.keys()) | set(puts.keys()), key=lambda label: datetime.strptime(label, '%m/%d/%Y'))
+        if not expdates:
+            return
+        first = calls.get(expdates[0])
+        empty = (first if first is not None else puts[expdates[0]]).iloc[0:0]
+
+        for expdate in expdates:
+            if self.cancelled:
+                return
+            self._expiration_ready.emit(expdate, calls.get(expdate, empty), puts.get(expdate, empty))
+
+        return
+
+    def __on_future_done(self, future: Future) -> None:
+        '''
+        Done callback of the download, runs on the worker thread (or on the GUI thread if it was cancelled before it
+        started). Queues the result to the GUI thread, then deletes the job if it was released meanwhile.
+        '''
+        self._done.emit(future)
+        with self._lock:
+            self._reported = True
+            delete = self._released
+        if delete:
+            self.deleteLater()
+
+        return
+
+    def __on_chain_ready(self, data: dict, r_f: float, price: float) -> None:
+        if not self.cancelled:
+            self.chain_ready.emit(data, r_f, price)
+
+    def __on_expiration_ready(self, expdate: str, calls_df, puts_df) -> None:
+        if not self.cancelled:
+            self.expiration_ready.emit(expdate, calls_df, puts_df)
+
+    def __on_done(self, future: Future) -> None:
+        '''
+        Runs on the GUI thread once the worker returns. Queued after every expiration, so it arrives last.
+        '''
+        if self.cancelled or future.cancelled():
+            return
+
+        if future.exception() is not None:
+            self.failed.emit(str(future.exception()))
+        else:
+            self.finished.emit()
+
+        return
@@ -3,8 +3,7 @@
 from PyQt5 import QtWidgets as qtw
 from PyQt5 import QtCore
 from typing import Callable
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 from PyQt5.QtCore import Qt
 
@@ -33,11 +32,12 @@ class WindowWithFigureAbove(WindowWithVerticalSlots):
     A window with vertical layout and matplotlib figure on top. 
     '''
     def __init__(self, 
-                 fig: plt.Figure, 
+                 fig: 'matplotlib.figure.Figure', 
                  title: str = 'Window with a Figure'):
         super().__init__(title=title)
 
-        # Create a canvas for the figure
+        # Create a canvas for the figure. The matplotlib Qt backend is slow to import, so only load it here
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
         self.canvas = FigureCanvasQTAgg(fig)
         self.my_layout.addWidget(self.canvas)
 
@@ -93,32 +93,44 @@ def configure_button(button: qtw.QPushButton,
 class PandasModel(QtCore.QAbstractTableModel):
     '''
     Custom class to display pandas dataframes in PyQt5. Inherits from QAbstractTableModel.
-    Directly ported from this StackOverflow post https://stackoverflow.com/questions/44603119/how-to-display-a-pandas-data-frame-with-pyqt5-pyside2, 
-    aided by ChatGPT to update outdated methods. 
+    Originally ported from this StackOverflow post https://stackoverflow.com/questions/44603119/how-to-display-a-pandas-data-frame-with-pyqt5-pyside2.
+
+    The DataFrame is not copied. Its columns are pulled out as arrays once, and the text of every cell is formatted
+    once per column with a vectorized conversion (same text as str() of each value), so data() is a plain list lookup
+    with no pandas indexing on repaints.
+
+    Sorting never moves the data: the model keeps a permutation from view rows to rows of the DataFrame, and the
+    argsort of each column is computed once and reused. Use source_row to map a row of the view back to the DataFrame.
+
+    ### Parameters:
+    - data: pd.DataFrame: Data to display. Treated as read-only.
+
+    ### Methods:
+    - source_row: Get the row of the DataFrame shown at a row of the view.
+    - update_data: Replace the displayed DataFrame.
     '''
     def __init__(self, data: pd.DataFrame, parent=None):
         super().__init__(parent)
-        self._data = data.copy()
+        self.__set_data(data)
 
     def rowCount(self, parent=None) -> int:
         '''
         Returns the number of rows in the dataframe.
         '''
-        return self._data.shape[0]
+        return len(self._index)
 
     def columnCount(self, parent=None) -> int:
         '''
         Returns the number of columns in the dataframe.
         '''
-        return self._data.shape[1]
+        return len(self._headers)
 
     def data(self, index, role=Qt.DisplayRole): # role for why the data is requested
         if not index.isValid():
             return None
 
         if role == Qt.DisplayRole:
-            value = self._data.iloc[index.row(), index.column()]
-            return str(value)
+            return self._display[index.column()][self._rows[index.row()]]
 
         elif role == Qt.TextAlignmentRole: # centers the data in each cell
             return Qt.AlignCenter
@@ -139,28 +151,68 @@ class PandasModel(QtCore.QAbstractTableModel):
 
         if orientation == Qt.Horizontal:
             try:
-                return str(self._data.columns[section])
+                return self._headers[section]
             except (IndexError, ):
                 return 
         elif orientation == Qt.Vertical:
-            return str(self._data.index[section])
+            return self._index[self._rows[section]]
         
         return
     
     def sort(self, column, order):
         '''
-        Sorts the data by the column and order specified.
+        Sorts the view by the column and order specified. NaNs are placed last in both orders.
+        A negative column restores the original order.
         '''
-        colname = self._data.columns[column]
         self.layoutAboutToBeChanged.emit()
-        self._data.sort_values(colname, ascending=order == Qt.AscendingOrder, inplace=True)
-        self._data.reset_index(drop=True, inplace=True)
+
+        if column < 0:
+            self._rows = np.arange(len(self._index))
+        else:
+            key = (column, order == Qt.AscendingOrder)
+            if key not in self._orders:
+                self._orders[key] = _argsort(self._columns[column], ascending=key[1])
+            self._rows = self._orders[key]
+
         self.layoutChanged.emit()
 
+    def source_row(self, row: int) -> int:
+        '''
+        Get the position in the DataFrame (for iloc) of the row shown at the given row of the view.
+        '''
+        return int(self._rows[row])
+
     def update_data(self, data: pd.DataFrame):
         '''
         Updates the data displayed in the table.
         '''
         self.beginResetModel()
-        self._data = data.copy()
-        self.endResetModel()
\ No newline at end of file
+        self.__set_data(data)
+        self.endResetModel()
+
+    def __set_data(self, data: pd.DataFrame) -> None:
+        self._data = data
+        self._headers = [str(name) for name in data.columns]
+        self._index = data.index.astype(str).tolist()
+
+        self._columns = [data[name].to_numpy() for name in data.columns]
+        # object arrays of python str, so a lookup returns the text as is
+        self._display = [np.array(values.astype(str).tolist(), dtype=object) for values in self._columns]
+
+        self._rows = np.arange(len(self._index)) # view row -> DataFrame row
+        self._orders = {} # (column, ascending) -> argsort of the column
+
+
+def _argsort(values: np.ndarray, ascending: bool = True) -> np.ndarray:
+    '''
+    Stable argsort of a column with NaNs (and Nones) last, in either order. Equal values keep their row order.
+    '''
+    missing = pd.isna(values)
+    valid = np.flatnonzero(~missing)
+    if ascending:
+        order = valid[np.argsort(values[valid], kind='stable')]
+    else: # sort on the negated rank, reversing the ascending order would also reverse equal values
+        ranks = np.unique(values[valid], return_inverse=True)[1]
+        order = valid[np.argsort(-ranks.ravel(), kind='stable')]
+
+    return np.concatenate([order, np.flatnonzero(missing)])
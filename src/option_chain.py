@@ -19,9 +19,8 @@ from PyQt5.QtGui import QFont
 
 
 from src.custom_components import configure_button
-from utils.data_utils import SchwabData, DummyData
+from src.chain_loader import ChainLoadJob, get_engine_job
 from vis.payoff import OptionPayoffPlot
-from vis.heatmap import Heatmap
 
 import pandas as pd
 import traceback
@@ -34,15 +33,22 @@ class OptionChainWindow(qtw.QWidget):
     A window that contains multiple tabs, each representing an expiration date.
     Each tab contains a table displaying the options chain for that expiration date.
 
+    ### Parameters:
+    - demo: bool: Load the dummy AAPL data.
+    - offline: bool: Load chains from snapshots.
+    - url: str: Load chains from the server at this URL (see utils.mock_server).
 
     ### Attributes:
-    - engine: SchwabData: The data engine to retrieve options chain data.
+    - engine: MarketDataProvider: The data engine to retrieve options chain data. None until the shared EngineJob has
+    created it; a ticker entered before then is loaded once it is ready.
+    - engine_job: EngineJob: Job creating the engine, shared with the dashboard (see src.chain_loader.get_engine_job).
     - display: OptionPayoffPlot: The plot to display the option strategy.
     - heatmap: QPushButton: Button to show the future payoff heatmap.
     - ticker: str: The ticker symbol for the stock.
+    - load_job: ChainLoadJob: The chain download in progress, if any.
     - total_cost: float: The total cost of all options in the strategy.
     - show_calls: bool: Toggle state for calls/puts.
-    - table_views: list[dict]: List of dictionaries containing table views and data for each expiration date.
+    - table_views: list[dict]: List of dictionaries containing table views (built on first show), models and data for each expiration date.
     - options: list[dict]: List of dictionaries containing option data.
     - expirations: list[int]: List of days to expiration for each option.
     - div_yields: list[float]: List of dividend yields for each option.
@@ -60,32 +66,42 @@ class OptionChainWindow(qtw.QWidget):
     - initialize_labels: Initializes QLabel widgets for displaying descriptive statistics.
     - update_stock_labels: Updates the labels with the given stock data.
     - update_option_labels: Updates the labels with new options data.
-    - add_tab: Adds a new tab for a given expiration date with its options chain table.
+    - add_tab: Adds a new placeholder tab for a given expiration date.
+    - show_tab: Builds or updates the options chain table of the tab being shown.
     - retrieve_option: Slot to handle click events on the table view.
     - toggle_calls_puts: Toggles the displayed options between calls and puts.
-    - get_ticker_data: Get the options chain data for the given ticker and add tabs for each expiration date.
+    - get_ticker_data: Start loading the options chain data for the given ticker in the background.
+    - on_engine_ready: Stores the data engine and loads a ticker entered while connecting.
+    - on_engine_failed: Shows the error of a failed connection.
+    - on_chain_ready: Stores the downloaded chain and updates the current price.
+    - on_expiration_ready: Adds the tab of one expiration date.
+    - on_load_finished: Handles the end of a chain load.
+    - on_load_failed: Shows the error of a failed chain load.
     - add_long: Adds a long option to the plot.
     - add_short: Adds a short option to the plot.
     - reset_plot: Resets the plot.
     - show_heatmap: Shows the future payoff heatmap.
 
     '''
-    def __init__(self, demo = False, parent=None):
+    def __init__(self, demo = False, offline = False, url = None, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Options Chains by Expiration Date")
         self.setGeometry(200, 200, 1600, 600)
 
         self.demo = demo
-        if demo:
-            self.engine = DummyData()
-        else:
-            self.engine = SchwabData()
-            
+        self.offline = offline
+        self.url = url
+
+        # the engine is created in the background, usually already warmed up by the dashboard
+        self.engine = None
+        self.__watch_engine_job()
+
         self.display = OptionPayoffPlot()
 
         self.heatmap = None
 
         self.ticker = None
+        self.load_job = None # chain download in progress
 
         # display values
         self.total_cost = 0
@@ -116,6 +132,7 @@ class OptionChainWindow(qtw.QWidget):
                 color: #ECEFF4;           
             }
         """)
+        self.tabs.currentChanged.connect(self.show_tab)
         main_layout.addWidget(self.tabs, stretch = 3)
 
         self.configure_figure(main_layout)
@@ -236,9 +253,12 @@ class OptionChainWindow(qtw.QWidget):
         
         layout.addLayout(right_layout, stretch = 2)
 
-    def show_no_data_message(self) -> None:
+    def show_no_data_message(self, message: str = "Data not loaded.") -> None:
         '''
-        Displays a message indicating that no data is loaded.
+        Displays a message indicating that no data is loaded, or that it is loading.
+
+        ### Parameters:
+        - message: str: Text of the message.
         '''
         # Create a new QWidget for the tab
         tab = QWidget()
@@ -246,7 +266,7 @@ class OptionChainWindow(qtw.QWidget):
         tab.setLayout(tab_layout)
 
         # Add a label with the message
-        message_label = QLabel("Data not loaded.")
+        message_label = QLabel(message)
         message_label.setAlignment(Qt.AlignCenter)
         message_label.setStyleSheet("font-size: 16px; color: #777777;")
         tab_layout.addWidget(message_label)
@@ -359,12 +379,14 @@ class OptionChainWindow(qtw.QWidget):
 
     def add_tab(self, expiration_date: str, calls_df: pd.DataFrame, puts_df: pd.DataFrame) -> None:
         '''
-        Adds a new tab for a given expiration date with its options chain table. Each tab is a TableView widget.
+        Adds a new tab for a given expiration date. The tab starts as an empty placeholder; its TableView and model
+        are only built by show_tab when the tab is first shown, so adding tabs does not depend on the size of the chain.
         Used to display the options chain data for a given expiration date.
 
         ### Parameters:
             - expiration_date (str): The expiration date label for the tab.
-            - df (pd.DataFrame): The options chain data to display in the table.
+            - calls_df (pd.DataFrame): The calls of the expiration.
+            - puts_df (pd.DataFrame): The puts of the expiration.
             - The data inserted into the table is originally in the form of 'exp_date': pd.DataFrame
         '''
         # Create a new QWidget for the tab
@@ -372,6 +394,52 @@ class OptionChainWindow(qtw.QWidget):
         tab_layout = qtw.QVBoxLayout()
         tab.setLayout(tab_layout)
 
+        self.table_views.append({
+            'tab': tab,
+            'table_view': None, # built on first show
+            'calls_df': calls_df,
+            'puts_df': puts_df,
+            'models': {}, # show_calls -> PandasModel, built on first show
+            'current_model': None
+        })
+
+        # Add the tab to the QTabWidget
+        tab_index = self.tabs.addTab(tab, expiration_date)
+        self.tabs.tabBar().setTabData(tab_index, expiration_date) # allows us to retrieve data for a certain tab
+
+    def show_tab(self, tab_index: int) -> None:
+        '''
+        Slot for the current tab changing. Builds the table of the tab on first show and makes sure it displays calls
+        or puts according to show_calls. The calls and puts models of a tab are each built once and kept, so toggling
+        back keeps their sort order.
+
+        ### Parameters:
+        - tab_index (int): Index of the tab being shown.
+        '''
+        if tab_index < 0 or tab_index >= len(self.table_views): # no data or loading tab
+            return
+
+        tab_info = self.table_views[tab_index]
+
+        if tab_info['table_view'] is None:
+            tab_info['table_view'] = self.__create_table_view()
+            tab_info['tab'].layout().addWidget(tab_info['table_view'])
+
+        if self.show_calls not in tab_info['models']:
+            df = tab_info['calls_df'] if self.show_calls else tab_info['puts_df']
+            tab_info['models'][self.show_calls] = PandasModel(df)
+
+        model = tab_info['models'][self.show_calls]
+        if tab_info['current_model'] is not model:
+            tab_info['table_view'].setModel(model)
+            tab_info['current_model'] = model
+
+        return
+
+    def __create_table_view(self) -> QTableView:
+        '''
+        Creates the styled, read-only, sortable TableView of a tab.
+        '''
         # Create the table view
         table_view = QTableView()
 
@@ -400,31 +468,13 @@ class OptionChainWindow(qtw.QWidget):
         table_view.setSelectionBehavior(qtw.QAbstractItemView.SelectRows)
         table_view.setSortingEnabled(True)  # Enable sorting
 
-        # Create and set the model
-        df = calls_df if self.show_calls else puts_df
-
-        model = PandasModel(df)
-        table_view.setModel(model)
-
         # Stretch columns to fit content
         table_view.horizontalHeader().setStretchLastSection(True)
         table_view.horizontalHeader().setSectionResizeMode(qtw.QHeaderView.Stretch)
 
         table_view.clicked.connect(self.retrieve_option)
 
-        # Add the table to the tab layout
-        tab_layout.addWidget(table_view)
-
-        # Add the tab to the QTabWidget
-        tab_index = self.tabs.addTab(tab, expiration_date)
-        self.tabs.tabBar().setTabData(tab_index, expiration_date) # allows us to retrieve data for a certain tab
-
-        self.table_views.append({
-            'table_view': table_view,
-            'calls_df': calls_df,
-            'puts_df': puts_df,
-            'current_model': model
-        })
+        return table_view
 
     def retrieve_option(self, index: QModelIndex) -> None:
         '''
@@ -455,7 +505,7 @@ class OptionChainWindow(qtw.QWidget):
             )
             return
 
-        row = index.row()
+        row = index.model().source_row(index.row()) # the view may be sorted
 
         self.current_option = df.iloc[row].to_dict() # make attribute so other functions can access
 
@@ -483,29 +533,17 @@ class OptionChainWindow(qtw.QWidget):
             self.toggle_button.setText("View Puts")
         else:
             self.toggle_button.setText("View Calls")
-        
-        for tab_info in self.table_views:
-            table_view = tab_info['table_view']
-            calls_df = tab_info['calls_df']
-            puts_df = tab_info['puts_df']
-
-            # Determine which DataFrame to display
-            new_df = calls_df if self.show_calls else puts_df
 
-            # Create a new model and set it to the table view
-            new_model = PandasModel(new_df)
-            table_view.setModel(new_model)
-
-            # Update the current model reference
-            tab_info['current_model'] = new_model
+        # other tabs switch when they are shown
+        self.show_tab(self.tabs.currentIndex())
         
         return
 
     def get_ticker_data(self) -> None:
         '''
-        Get the options chain data for the given ticker and add tabs for each expiration date. Uses the SchwabData class to get the data from Schwab Developer.
-        Adds vertical lines to the plot for the current price of the stock. Instantiates calls_data and puts_data attributes. Clears existing tabs,
-        and adds new ones for the new options chain.
+        Get the options chain data for the given ticker and add tabs for each expiration date. The chain is downloaded
+        on a background ChainLoadJob while a loading tab is shown, so the window stays responsive; entering another ticker
+        cancels a load in progress. Tabs are added as the expirations arrive, see on_chain_ready and on_expiration_ready.
         '''
 
         if self.ticker and self.ticker_input.text().upper() != self.ticker: # if we have a different ticker than already exists
@@ -524,44 +562,144 @@ class OptionChainWindow(qtw.QWidget):
 
         # Get the ticker from the input field
         self.ticker = self.ticker_input.text().upper()
-        
-        try:
-            data, r_f = self.engine.get_options_chain_dict(self.ticker)
-        except ValueError as e:
-            QMessageBox.warning(
-                self,
-                "Invalid Ticker",
-                str(e),
-                QMessageBox.Ok
-            )
-            return 
 
-        self.calls_data = data['calls'] # data initialized
-        self.puts_data = data['puts']
-        self.interest_rate = r_f/100
+        if self.load_job is not None:
+            self.load_job.cancel()
+            self.load_job.release()
 
-        # Clear existing tabs
-        self.tabs.clear()
         self.table_views.clear()
+        self.tabs.clear()
+        self.ticker_input.clear()
 
-        # Add tabs for calls and puts based on ticker
-        expiration_dates = self.calls_data.keys()
+        if self.engine is None: # on_engine_ready loads the ticker
+            if self.engine_job.error is not None: # the last attempt failed, try again
+                self.__watch_engine_job()
+            self.show_no_data_message(f"Connecting to the data source, {self.ticker} will load once connected...")
+            return
 
-        for expdate in expiration_dates:
-            self.add_tab(expdate, self.calls_data[expdate], self.puts_data[expdate])
+        self.__start_load()
 
-        self.ticker_input.clear()
+        return
+
+    def __start_load(self) -> None:
+        '''
+        Starts the ChainLoadJob of self.ticker.
+        '''
+        self.show_no_data_message(f"Loading {self.ticker}...")
+
+        self.load_job = ChainLoadJob(self.engine, self.ticker, parent=self)
+        self.load_job.chain_ready.connect(self.on_chain_ready)
+        self.load_job.expiration_ready.connect(self.on_expiration_ready)
+        self.load_job.finished.connect(self.on_load_finished)
+        self.load_job.failed.connect(self.on_load_failed)
+        self.load_job.start()
+
+        return
+
+    def __watch_engine_job(self) -> None:
+        '''
+        Gets the shared EngineJob and takes its engine, or waits for it if it is still connecting.
+        '''
+        self.engine_job = get_engine_job(self.demo, self.offline, self.url)
+        if self.engine_job.engine is not None:
+            self.engine = self.engine_job.engine
+        else:
+            self.engine_job.ready.connect(self.on_engine_ready)
+            self.engine_job.failed.connect(self.on_engine_failed)
+
+        return
+
+    def on_engine_ready(self, engine) -> None:
+        '''
+        Slot for the data engine created by the EngineJob. Loads the ticker entered while connecting, if any.
+        '''
+        self.engine_job.ready.disconnect(self.on_engine_ready)
+        self.engine_job.failed.disconnect(self.on_engine_failed)
+        self.engine = engine
+        if self.ticker is not None and self.load_job is None and not self.table_views:
+            self.__start_load()
+
+        return
+
+    def on_engine_failed(self, message: str) -> None:
+        '''
+        Slot for a failed EngineJob. Shows the error; the next ticker entered retries the connection.
+        '''
+        self.engine_job.ready.disconnect(self.on_engine_ready)
+        self.engine_job.failed.disconnect(self.on_engine_failed)
+        self.ticker = None
+        self.show_no_data_message()
+
+        QMessageBox.warning(
+            self,
+            "Connection Error",
+            f"Could not connect to the data source: {message}",
+            QMessageBox.Ok
+        )
+
+        return
+
+    def on_chain_ready(self, data: dict, r_f: float, price: float) -> None:
+        '''
+        Slot for a downloaded chain. Instantiates calls_data and puts_data attributes, adds vertical lines to the plot for the
+        current price of the stock and updates the stock labels. The loading tab stays until the first expiration arrives.
+        '''
+        self.calls_data = data['calls'] # data initialized
+        self.puts_data = data['puts']
+        self.interest_rate = r_f/100
+
+        self.display.add_vline(price, name="Current Price")
 
-        self.display.add_vline(self.engine.get_price(self.ticker), name="Current Price")
-        
         stock_data = {
             "Stock Ticker": self.ticker,
-            "Current Price": self.engine.get_price(self.ticker)
+            "Current Price": price
         }
         self.update_stock_labels(stock_data)
 
         return
 
+    def on_expiration_ready(self, expdate: str, calls_df: pd.DataFrame, puts_df: pd.DataFrame) -> None:
+        '''
+        Slot for one expiration of the chain. Replaces the loading tab on the first one, then adds a tab per expiration.
+        '''
+        if not self.table_views:
+            self.tabs.clear()
+
+        self.add_tab(expdate, calls_df, puts_df)
+
+        return
+
+    def on_load_finished(self) -> None:
+        '''
+        Slot for the end of a chain load.
+        '''
+        if not self.table_views: # chain without expirations
+            self.tabs.clear()
+            self.show_no_data_message(f"No options found for {self.ticker}.")
+        self.load_job.release()
+        self.load_job = None
+
+        return
+
+    def on_load_failed(self, message: str) -> None:
+        '''
+        Slot for a failed chain load. Shows the error and goes back to the empty state.
+        '''
+        self.load_job.release()
+        self.load_job = None
+        self.table_views.clear()
+        self.tabs.clear()
+        self.show_no_data_message()
+
+        QMessageBox.warning(
+            self,
+            "Invalid Ticker",
+            message,
+            QMessageBox.Ok
+        )
+
+        return
+
     def add_long(self) -> None:
         '''
         Adds a long option to the plot. Updates the plot with the new option. Stores the new option and its attributes 
@@ -652,6 +790,7 @@ class OptionChainWindow(qtw.QWidget):
         '''
         Shows the future payoff heatmap. Checks if the necessary data is loaded before showing the heatmap.
         Instantiates a heatmap object and passes in stored data from all the options the user added to their strategy. 
+        The legs are priced on a volatility surface fitted to the loaded chain.
         '''
         if not hasattr(self, 'interest_rate') or not self.options:
             QMessageBox.warning(
@@ -662,14 +801,26 @@ class OptionChainWindow(qtw.QWidget):
             )
             return
 
+        from vis.heatmap import Heatmap # loaded on first use, it is not needed to show the chain
+        from vis.vol_surface import VolSurface
+
+        s0 = self.engine.get_price(self.ticker)
+        try: # the chain views share one columnar OptionChain, fit the smiles of every expiration to it
+            vol_surface = VolSurface.from_chain(self.calls_data.chain, s0, self.interest_rate,
+                                                self.engine.get_div_yield(self.ticker))
+        except ValueError as e: # no usable quotes, the legs keep their quoted volatility
+            print(f'Could not fit a volatility surface for {self.ticker}: {e}')
+            vol_surface = None
+
         self.heatmap = Heatmap(self.options,
                         self.expirations,
                         self.interest_rate,
                         self.div_yields,
                         self.positions,
-                        self.engine.get_price(self.ticker),
+                        s0,
                         self.total_cost,
-                        self.demo
+                        self.demo,
+                        vol_surface=vol_surface
                         )
         self.heatmap.setStyleSheet('''
                     QWidget { 
@@ -1,8 +1,9 @@
 from PyQt5 import QtWidgets as qtw
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QIcon, QPixmap
 #from option_plotter import OptionProfitCalculator
 from src.option_chain import OptionChainWindow
+from src.chain_loader import get_engine_job
 from utils import data_utils as dat
 
 import sys
@@ -10,13 +11,21 @@ import sys
 # Import other feature windows as needed
 
 class MainWindow(qtw.QMainWindow):
-    def __init__(self, demo: bool = False):
+    def __init__(self, demo: bool = False, offline: bool = False, url: str = None):
         super().__init__()
 
         self.demo = demo
-        
+        self.offline = offline
+        self.url = url
+
+        self.strategy_builder_window = None # created on the first click of Build Strategy
+
         self.configure_main_window()
-        
+
+        # connect to the data source once the event loop runs, i.e. after the dashboard is painted, so startup does not
+        # wait for the network or authentication. The strategy builder picks up the same engine.
+        QTimer.singleShot(0, self.warm_up_engine)
+
         return
 
     def configure_main_window(self) -> None:
@@ -103,8 +112,35 @@ class MainWindow(qtw.QMainWindow):
         layout.addLayout(button_layout)
 
 
-        self.strategy_builder_window = OptionChainWindow(demo=self.demo)
-        self.strategy_builder_window.setStyleSheet('''
+        # self.portfolio_viewer_window = PortfolioViewerWindow()
+        
+        return
+
+    def warm_up_engine(self) -> None:
+        '''
+        Starts creating the data engine in the background, see src.chain_loader.get_engine_job.
+        '''
+        get_engine_job(self.demo, self.offline, self.url)
+
+        return
+
+    def open_strategy_builder(self):
+        '''
+        Shows the strategy builder, creating it on first use.
+        '''
+        if self.strategy_builder_window is None:
+            self.strategy_builder_window = self.create_strategy_builder()
+
+        self.strategy_builder_window.show()
+
+        return
+
+    def create_strategy_builder(self) -> OptionChainWindow:
+        '''
+        Creates the strategy builder window. Its data engine comes from the shared EngineJob, so this does not block.
+        '''
+        window = OptionChainWindow(demo=self.demo, offline=self.offline, url=self.url)
+        window.setStyleSheet('''
                     QWidget { 
                     font-family: Arial;
                     font-size: 16px;
@@ -124,11 +160,5 @@ class MainWindow(qtw.QMainWindow):
                     }
                     
                     ''')
-        # self.portfolio_viewer_window = PortfolioViewerWindow()
-        
-        return
-
-    def open_strategy_builder(self):
-        self.strategy_builder_window.show()
 
-        return
\ No newline at end of file
+        return window
\ No newline at end of file
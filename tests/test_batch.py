@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from batch import load_spec
+
+LEGS = [{'type': 'call', 'expiration': '12/20/2024', 'strike': 230}]
+
+
+def write_spec(tmp_path, strategies):
+    path = tmp_path / 'spec.json'
+    path.write_text(json.dumps(strategies))
+    return path
+
+
+def test_default_names(tmp_path):
+    strategies = load_spec(write_spec(tmp_path, [{'ticker': 'AAPL', 'legs': LEGS}, {'ticker': 'AAPL', 'legs': LEGS}]))
+
+    assert [strategy['name'] for strategy in strategies] == ['strategy_0', 'strategy_1']
+
+
+@pytest.mark.parametrize('name', ['../out', 'a/b', 'a\\b', '..', '.hidden', '', 'Summary.json', 5])
+def test_rejects_unsafe_names(tmp_path, name):
+    with pytest.raises(ValueError):
+        load_spec(write_spec(tmp_path, [{'name': name, 'ticker': 'AAPL', 'legs': LEGS}]))
+
+
+@pytest.mark.parametrize('names', [['spread', 'spread'], ['spread', 'SPREAD'], ['strategy_1', None]])
+def test_rejects_duplicate_names(tmp_path, names):
+    strategies = [{'ticker': 'AAPL', 'legs': LEGS} for _ in names]
+    for strategy, name in zip(strategies, names):
+        if name is not None:
+            strategy['name'] = name
+
+    with pytest.raises(ValueError, match='more than once'):
+        load_spec(write_spec(tmp_path, strategies))
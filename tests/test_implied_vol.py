@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from vis.implied_vol import implied_vol
+from vis.pricing import american_vec, gbs_vec
+
+S0, R, Q = 100.0, 0.045, 0.01
+
+
+@pytest.mark.parametrize('american', [True, False])
+def test_round_trip(american):
+    strikes = np.tile(np.linspace(70, 130, 13), 4)
+    t = np.repeat([0.05, 0.25, 1.0, 2.0], 13)
+    vols = 0.15 + 0.4 * np.abs(np.log(strikes / S0)) + 0.05 * t
+    is_call = strikes >= S0
+
+    prices = np.empty_like(strikes)
+    for opt_type, rows in [('c', is_call), ('p', ~is_call)]:
+        if american:
+            prices[rows] = american_vec(opt_type, S0, strikes[rows], t[rows], R, Q, vols[rows])
+        else:
+            prices[rows] = gbs_vec(opt_type, S0, strikes[rows], t[rows], R, R - Q, vols[rows])
+
+    solved = implied_vol(is_call, prices, S0, strikes, t, R, Q, american=american, tol=1e-9)
+
+    np.testing.assert_allclose(solved, vols, atol=1e-5)
+
+
+def test_price_below_intrinsic_is_nan():
+    assert np.isnan(implied_vol(True, 5.0, S0, 80.0, 0.5, R, Q))
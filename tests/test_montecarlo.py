@@ -0,0 +1,51 @@
+import numpy as np
+from scipy.special import ndtr
+
+from vis.montecarlo import simulate_strategy
+from vis.strategy import StrategyPayoff
+
+S0, T, R, Q, V = 100.0, 0.25, 0.045, 0.01, 0.25
+
+
+def long_call(strike: float = 105.0, premium: float = 2.0) -> StrategyPayoff:
+    strategy = StrategyPayoff()
+    strategy.add_leg('call', strike, premium, True, S0)
+    return strategy
+
+
+def analytic_pop(break_even: float) -> float:
+    # P(S_T > break_even) under the lognormal terminal price of the simulation
+    d2 = (np.log(S0 / break_even) + (R - Q - V ** 2 / 2) * T) / (V * np.sqrt(T))
+    return float(ndtr(d2))
+
+
+def test_pop_matches_lognormal():
+    metrics = simulate_strategy(long_call(), S0, T, R, Q, V, n_paths=400_000, seed=1)
+
+    expected = analytic_pop(107.0)
+    assert abs(metrics['pop'] - expected) < 4 * np.sqrt(expected * (1 - expected) / metrics['n_paths'])
+
+
+def test_expected_pnl_matches_black_scholes():
+    # the discounted expected payoff is the Black-Scholes price, so the mean P&L is its forward value less the premium
+    d1 = (np.log(S0 / 105.0) + (R - Q + V ** 2 / 2) * T) / (V * np.sqrt(T))
+    d2 = d1 - V * np.sqrt(T)
+    forward_value = S0 * np.exp((R - Q) * T) * ndtr(d1) - 105.0 * ndtr(d2)
+
+    metrics = simulate_strategy(long_call(), S0, T, R, Q, V, n_paths=400_000, seed=2)
+
+    assert abs(metrics['expected_pnl'] - (forward_value - 2.0) * 100) < 4 * metrics['std_error']
+
+
+def test_seeded_results_do_not_depend_on_workers():
+    single = simulate_strategy(long_call(), S0, T, R, Q, V, n_paths=50_000, seed=3, chunk_paths=8192, workers=1)
+    threaded = simulate_strategy(long_call(), S0, T, R, Q, V, n_paths=50_000, seed=3, chunk_paths=8192, workers=4)
+
+    assert single['pop'] == threaded['pop']
+    assert single['percentiles'] == threaded['percentiles']
+
+
+def test_touch_probability_at_least_pop():
+    metrics = simulate_strategy(long_call(), S0, T, R, Q, V, n_paths=20_000, steps=50, seed=4)
+
+    assert metrics['touch'][107.0] >= metrics['pop']
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from vis.pricing import AMERICAN_TOLERANCE, american_vec, gbs_vec, intrinsic_vec, option_greeks_surface, option_surface
+
+S = np.linspace(60, 140, 41)
+K, T, R, Q, V = 100.0, 0.5, 0.05, 0.02, 0.3
+
+# optlib.gbs.american(type, fs, x, t, r, q, v)[0] on calls and puts out of, at and in the money, including the early
+# exercise region (value equal to the intrinsic value), so the kernel is checked without optlib installed
+OPTLIB_AMERICAN = [
+    ('c', 80.0, 100.0, 0.1, 0.05, 0.02, 0.2, 0.00035564419209777043),
+    ('c', 80.0, 100.0, 0.1, 0.08, 0.12, 0.6, 0.9464721375326235),
+    ('c', 80.0, 100.0, 1.0, 0.08, 0.12, 0.2, 0.7373935779349665),
+    ('c', 100.0, 100.0, 0.1, 0.05, 0.02, 0.6, 7.682074878111912),
+    ('c', 100.0, 100.0, 1.0, 0.05, 0.02, 0.2, 9.227005539611191),
+    ('c', 100.0, 100.0, 1.0, 0.08, 0.12, 0.6, 20.4685698230384),
+    ('c', 130.0, 100.0, 0.1, 0.08, 0.12, 0.2, 30.0),
+    ('c', 130.0, 100.0, 1.0, 0.05, 0.02, 0.6, 45.36072026550291),
+    ('c', 160.0, 100.0, 0.1, 0.05, 0.02, 0.2, 60.17907186750509),
+    ('c', 160.0, 100.0, 0.1, 0.08, 0.12, 0.6, 60.0),
+    ('c', 160.0, 100.0, 1.0, 0.08, 0.12, 0.2, 60.0),
+    ('p', 80.0, 100.0, 0.1, 0.05, 0.02, 0.6, 20.735103899970106),
+    ('p', 80.0, 100.0, 1.0, 0.05, 0.02, 0.2, 20.04714724194586),
+    ('p', 80.0, 100.0, 1.0, 0.08, 0.12, 0.6, 32.101676117953716),
+    ('p', 100.0, 100.0, 0.1, 0.08, 0.12, 0.2, 2.700617646829997),
+    ('p', 100.0, 100.0, 1.0, 0.05, 0.02, 0.6, 21.713140710815587),
+    ('p', 130.0, 100.0, 0.1, 0.05, 0.02, 0.2, 2.1173567773757895e-05),
+    ('p', 130.0, 100.0, 0.1, 0.08, 0.12, 0.6, 0.8513103386064103),
+    ('p', 130.0, 100.0, 1.0, 0.08, 0.12, 0.2, 1.378567365623951),
+    ('p', 160.0, 100.0, 0.1, 0.05, 0.02, 0.6, 0.04881253302482946),
+    ('p', 160.0, 100.0, 1.0, 0.05, 0.02, 0.2, 0.04898299182875121),
+    ('p', 160.0, 100.0, 1.0, 0.08, 0.12, 0.6, 9.337499539366902),
+    ('p', 40.0, 100.0, 1.0, 0.05, 0.0, 0.2, 60.0),
+    ('c', 200.0, 100.0, 1.0, 0.02, 0.08, 0.2, 100.0),
+    ('p', 100.0, 100.0, 0.25, 0.0, 0.03, 0.3, 6.337220150651177),
+]
+
+
+@pytest.mark.parametrize('opt_type', ['c', 'p'])
+def test_american_at_least_european_and_intrinsic(opt_type):
+    american = american_vec(opt_type, S, K, T, R, Q, V)
+    european = gbs_vec(opt_type, S, K, T, R, R - Q, V)
+
+    assert np.all(american >= european - 1e-12)
+    assert np.all(american >= intrinsic_vec(opt_type, S, K) - 1e-12)
+
+
+def test_european_put_call_parity():
+    calls = gbs_vec('c', S, K, T, R, R - Q, V)
+    puts = gbs_vec('p', S, K, T, R, R - Q, V)
+
+    np.testing.assert_allclose(calls - puts, S * np.exp(-Q * T) - K * np.exp(-R * T), atol=1e-10)
+
+
+def test_american_put_call_bounds():
+    # S e^(-qT) - K <= C - P <= S - K e^(-rT) for American options on a dividend paying stock
+    difference = american_vec('c', S, K, T, R, Q, V) - american_vec('p', S, K, T, R, Q, V)
+
+    assert np.all(difference >= S * np.exp(-Q * T) - K - 1e-9)
+    assert np.all(difference <= S - K * np.exp(-R * T) + 1e-9)
+
+
+def test_call_without_dividend_is_european():
+    np.testing.assert_allclose(american_vec('c', S, K, T, R, 0.0, V), gbs_vec('c', S, K, T, R, R, V))
+
+
+def test_broadcasts_to_a_surface():
+    t = np.linspace(0.1, 1.0, 5)[:, None]
+
+    assert american_vec('p', S[None, :], K, t, R, Q, V).shape == (5, len(S))
+
+
+@pytest.mark.parametrize('surface', [option_surface, option_greeks_surface])
+def test_surface_with_one_volatility_per_date(surface):
+    dtes = np.array([0.5, 0.25, 0.1, 0.0])
+    ivs = np.array([0.35, 0.3, 0.25, 0.2])
+
+    rows = surface('p', S, dtes, K, R, Q, ivs)
+    for i, (dte, iv) in enumerate(zip(dtes, ivs)):
+        np.testing.assert_allclose(rows[..., i, :], surface('p', S, [dte], K, R, Q, iv)[..., 0, :])
+
+
+@pytest.mark.parametrize('opt_type, fs, x, t, r, q, v, expected', OPTLIB_AMERICAN)
+def test_matches_optlib_table(opt_type, fs, x, t, r, q, v, expected):
+    np.testing.assert_allclose(american_vec(opt_type, fs, x, t, r, q, v), expected, atol=AMERICAN_TOLERANCE, rtol=0)
+
+
+def test_matches_optlib():
+    gbs = pytest.importorskip('optlib.gbs')
+
+    for opt_type in ['c', 'p']:
+        expected = [gbs.american(opt_type, s, K, T, R, Q, V)[0] for s in S]
+        np.testing.assert_allclose(american_vec(opt_type, S, K, T, R, Q, V), expected, atol=AMERICAN_TOLERANCE, rtol=0)
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from utils.data_utils import DummyData
+from vis.scanner import RANK_METRICS, StrategyScanner
+
+
+@pytest.fixture(scope='module')
+def scanner(tmp_path_factory):
+    from utils.snapshots import SnapshotStore
+
+    engine = DummyData(SnapshotStore(tmp_path_factory.mktemp('snapshots')))
+    chain, rate = engine.get_option_chain('AAPL')
+    return StrategyScanner(chain, engine.get_price('AAPL'), rate / 100, engine.get_div_yield('AAPL'))
+
+
+@pytest.mark.parametrize('rank_by', list(RANK_METRICS))
+def test_top_n_is_sorted_best_first(scanner, rank_by):
+    top = scanner.scan(top_n=15, rank_by=rank_by, max_width=3)
+
+    assert len(top) == 15
+    values = top[rank_by].to_numpy()
+    assert np.all(values[:-1] >= values[1:]) if RANK_METRICS[rank_by] else np.all(values[:-1] <= values[1:])
+
+
+def test_top_n_is_the_head_of_a_longer_scan(scanner):
+    short = scanner.scan(top_n=10, rank_by='Return on Risk', max_width=3)
+    long = scanner.scan(top_n=100, rank_by='Return on Risk', max_width=3)
+
+    np.testing.assert_allclose(short['Return on Risk'].to_numpy(), long['Return on Risk'].to_numpy()[:10])
+
+
+def test_unbounded_strategies_are_excluded_by_default(scanner):
+    top = scanner.scan(top_n=20, rank_by='POP', families=['Straddle', 'Strangle'], max_width=3)
+
+    assert np.all(np.isfinite(top['Max Loss'].to_numpy()))
+
+
+def test_unknown_rank_metric(scanner):
+    with pytest.raises(ValueError):
+        scanner.scan(rank_by='Delta')
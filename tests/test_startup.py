@@ -0,0 +1,23 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# seconds from launch until the dashboard is painted, on a cold start in demo mode
+STARTUP_BUDGET = 5.0
+
+
+def test_cold_start_within_budget():
+    pytest.importorskip('PyQt5')
+
+    env = {**os.environ, 'QT_QPA_PLATFORM': 'offscreen'}
+    result = subprocess.run([sys.executable, 'main.py', '--demo', '--startup-budget', str(STARTUP_BUDGET)],
+                            cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=60)
+
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert 'Startup took' in result.stdout
@@ -0,0 +1,45 @@
+import numpy as np
+
+from vis.strategy import StrategyPayoff
+
+
+def bull_call_spread() -> StrategyPayoff:
+    # long the 100 call for 5, short the 110 call for 2: 3 debit, 7 max profit per share
+    strategy = StrategyPayoff()
+    strategy.add_leg('call', 100, 5.0, True, 105)
+    strategy.add_leg('call', 110, 2.0, False, 105)
+    return strategy
+
+
+def test_vertical_break_even_and_extremes():
+    strategy = bull_call_spread()
+
+    np.testing.assert_allclose(strategy.break_evens(), [103.0])
+    assert strategy.max_profit() == 700.0
+    assert strategy.max_loss() == -300.0
+
+
+def test_vertical_payoff():
+    strategy = bull_call_spread()
+
+    np.testing.assert_allclose(strategy.evaluate(np.array([90.0, 103.0, 105.0, 120.0])), [-300, 0, 200, 700])
+
+
+def test_unbounded_strategies():
+    strategy = StrategyPayoff()
+    strategy.add_leg('call', 100, 5.0, True, 100)
+    assert strategy.max_profit() == np.inf
+
+    strategy = StrategyPayoff()
+    strategy.add_leg('put', 100, 5.0, False, 100)
+    assert strategy.max_profit() == 500.0
+    assert strategy.max_loss() == -9500.0
+
+
+def test_removing_a_leg_restores_the_payoff():
+    strategy = bull_call_spread()
+    leg_id = strategy.add_leg('put', 95, 1.0, True, 105)
+    strategy.remove_leg(leg_id)
+
+    prices = np.linspace(50, 150, 101)
+    np.testing.assert_allclose(strategy.evaluate(prices), bull_call_spread().evaluate(prices))
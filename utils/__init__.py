@@ -1,3 +1,5 @@
 from .data_utils import SchwabData
+from .chain import OptionChain
+from .provider import MarketDataProvider
 
-__all__ = ['SchwabData']
\ No newline at end of file
+__all__ = ['SchwabData', 'OptionChain', 'MarketDataProvider']
\ No newline at end of file
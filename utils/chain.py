@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Iterator
+
+from numpy.typing import NDArray
+
+# Schwab field -> (display column name, dtype). Same columns and names as filter_chain in utils.data_utils.
+CHAIN_COLUMNS = {
+    'symbol': ('Contract Name', object),
+    'description': ('Description', object),
+    'strikePrice': ('Strike', np.float64),
+    'bid': ('Bid', np.float64),
+    'ask': ('Ask', np.float64),
+    'last': ('Last', np.float64),
+    'mark': ('Mark', np.float64),
+    'delta': ('Delta', np.float64),
+    'gamma': ('Gamma', np.float64),
+    'theta': ('Theta', np.float64),
+    'vega': ('Vega', np.float64),
+    'rho': ('Rho', np.float64),
+    'volatility': ('Volatility', np.float64),
+    'inTheMoney': ('ITM', bool),
+    'intrinsicValue': ('Intrinsic Value', np.float64),
+    'extrinsicValue': ('Extrinsic Value', np.float64),
+    'daysToExpiration': ('Days to Expiration', np.int64),
+}
+
+
+def _expiration_label(expdate: str) -> str:
+    '''
+    Convert an expiration key of the Schwab chain ("YYYY-MM-DD:DTE") to the "MM/DD/YYYY" label used for tabs.
+    Same as utils.data_utils.convert_date.
+    '''
+    return datetime.strptime(expdate.split(":")[0], "%Y-%m-%d").strftime("%m/%d/%Y")
+
+
+class OptionChain:
+    '''
+    Columnar option chain. Holds every contract of every expiration, calls and puts, in one table of contiguous
+    NumPy arrays (one per column of CHAIN_COLUMNS, plus the expiration index and call/put flag of each row).
+    Rows are grouped by (type, expiration), so each expiration is a slice of the arrays and the per-expiry
+    DataFrames are views built on top of those slices.
+
+    ### Attributes:
+    - columns: dict[str, NDArray]: Column name -> array over all contracts.
+    - expiry: NDArray[int]: Index into expirations of each contract.
+    - is_call: NDArray[bool]: True for calls, False for puts.
+    - expirations: list[str]: Expiration labels ("MM/DD/YYYY"), in chain order.
+
+    ### Methods:
+    - from_json: Build the chain from the raw Schwab option chain JSON in a single pass.
+    - view: Get the DataFrame of one type and expiration.
+    - to_dict: Get the {'calls': {exp: DataFrame}, 'puts': {exp: DataFrame}} mapping used by the app.
+    '''
+    def __init__(self, columns: dict[str, NDArray], expiry: NDArray[np.int64], is_call: NDArray[np.bool_],
+                 expirations: list[str]):
+        self.columns = columns
+        self.expiry = expiry
+        self.is_call = is_call
+        self.expirations = expirations
+
+        self._slices = self.__group_slices()
+
+        return
+
+    def __len__(self) -> int:
+        return len(self.expiry)
+
+    @classmethod
+    def from_json(cls, json_data: dict) -> 'OptionChain':
+        '''
+        Build the chain from the raw JSON of the Schwab option chain endpoint. Walks all expirations of both maps
+        once, collecting the fields of each contract straight into per-column lists that are converted to arrays
+        at the end, instead of building a DataFrame per expiration.
+
+        ### Parameters:
+        - json_data: dict: Raw option chain, with 'callExpDateMap' and 'putExpDateMap'.
+        '''
+        records = []
+        expiry = []
+        is_call = []
+        expirations = {}
+
+        for type in ['callExpDateMap', 'putExpDateMap']:
+            for expdate, strikes in json_data.get(type, {}).items():
+                exp_index = expirations.setdefault(_expiration_label(expdate), len(expirations))
+                for contracts in strikes.values():
+                    records.append(contracts[0])
+                n_new = len(records) - len(expiry)
+                expiry.extend([exp_index] * n_new)
+                is_call.extend([type == 'callExpDateMap'] * n_new)
+
+        columns = {}
+        for field, (name, dtype) in CHAIN_COLUMNS.items():
+            columns[name] = np.array([record.get(field) for record in records], dtype=dtype)
+
+        return cls(columns, np.array(expiry, dtype=np.int64), np.array(is_call, dtype=bool), list(expirations))
+
+    def view(self, kind: str, expiration: str) -> pd.DataFrame:
+        '''
+        Get the options of one type and expiration as a DataFrame with the columns of CHAIN_COLUMNS.
+        The DataFrame is built on slices of the chain arrays, without copying them.
+
+        ### Parameters:
+        - kind: str: 'calls' or 'puts'.
+        - expiration: str: Expiration label, e.g. "11/29/2024".
+        '''
+        rows = self._slices[(kind, expiration)]
+        data = {name: values[rows] for name, values in self.columns.items()}
+
+        return pd.DataFrame(data, copy=False)
+
+    def to_dict(self) -> dict[str, Mapping]:
+        '''
+        Get the chain in the format of SchwabData.get_options_chain_dict: {'calls': {exp: DataFrame}, 'puts': {...}}.
+        The per-expiry DataFrames are created on first access.
+        '''
+        return {kind: ExpirationViews(self, kind) for kind in ['calls', 'puts']}
+
+    def __group_slices(self) -> dict[tuple[str, str], slice]:
+        '''
+        Find the contiguous row range of each (type, expiration) group.
+        '''
+        slices = {}
+        if len(self.expiry) == 0:
+            return slices
+
+        # group ids change wherever the type or expiration changes
+        group = self.expiry * 2 + (~self.is_call).astype(np.int64)
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(group)) + 1])
+        stops = np.concatenate([starts[1:], [len(group)]])
+
+        for start, stop in zip(starts, stops):
+            kind = 'calls' if self.is_call[start] else 'puts'
+            slices[(kind, self.expirations[self.expiry[start]])] = slice(int(start), int(stop))
+
+        return slices
+
+
+class ExpirationViews(Mapping):
+    '''
+    Read-only mapping of expiration label -> DataFrame for one type of an OptionChain.
+    Views are created on first access and kept afterwards.
+    '''
+    def __init__(self, chain: OptionChain, kind: str):
+        self.chain = chain
+        self.kind = kind
+        self._views = {}
+
+        return
+
+    def __getitem__(self, expiration: str) -> pd.DataFrame:
+        if (self.kind, expiration) not in self.chain._slices:
+            raise KeyError(expiration)
+        if expiration not in self._views:
+            self._views[expiration] = self.chain.view(self.kind, expiration)
+        return self._views[expiration]
+
+    def __iter__(self) -> Iterator[str]:
+        return (exp for exp in self.chain.expirations if (self.kind, exp) in self.chain._slices)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
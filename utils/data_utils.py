@@ -2,16 +2,21 @@ import os
 from dotenv import load_dotenv
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import schwabdev
-from datetime import datetime
-from typing import List
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, List, Optional
 from collections import defaultdict
 import json
 from pathlib import Path
 from pytz import timezone
-import requests
+import threading
+import time
 
+from utils.chain import OptionChain
+from utils.provider import MarketDataProvider
+from utils.snapshots import SnapshotStore
+
+# fixed interest rate of the dummy data, in percent like the rates of the Schwab API
+DUMMY_INTEREST_RATE = 4.5
 
 
 def filter_chain(chain: pd.DataFrame):
@@ -60,122 +65,318 @@ def convert_date(date:str):
     return datetime.strptime(date, "%Y-%m-%d").strftime("%m/%d/%Y")
 
 
-class SchwabData:
+class QuoteCache:
+    '''
+    Time-to-live cache of quotes. A quote is fetched at most once per ticker per ttl seconds, and every field of it
+    (last price, dividend yield, ...) is served from that one response. Concurrent requests for the same ticker are
+    coalesced: the first caller fetches, the others wait for its result instead of issuing their own request.
+
+    ### Parameters:
+    - fetch: Callable[[str], dict]: Function fetching the quote of a ticker, e.g. the JSON of the Schwab quote endpoint.
+    - ttl: float: Seconds a quote stays fresh. 0 disables caching.
+    - fetch_many: Callable[[list[str]], dict[str, dict]]: Function fetching the quotes of several tickers in one
+    request, by ticker. Used by get_many; defaults to one fetch per ticker.
+
+    ### Attributes:
+    - hits: int: Number of requests served from the cache (including coalesced ones).
+    - misses: int: Number of requests that fetched a quote.
+
+    ### Methods:
+    - get: Get the quote of a ticker, fetching it if it is missing or stale.
+    - get_many: Get the quotes of several tickers, fetching the missing or stale ones together.
+    - invalidate: Drop the quote of a ticker, or all quotes.
+    '''
+    def __init__(self, fetch: Callable[[str], dict], ttl: float = 15.0,
+                 fetch_many: Optional[Callable[[list[str]], dict[str, dict]]] = None):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.fetch_many = fetch_many
+
+        self.hits = 0
+        self.misses = 0
+
+        self._quotes = {} # ticker -> (fetch time, quote)
+        self._lock = threading.Lock()
+        self._ticker_locks = {} # ticker -> lock held while its quote is being fetched
+
+        return
+
+    def get(self, ticker: str) -> dict:
+        '''
+        Get the quote of a ticker. Fetches it if there is no quote younger than ttl.
+
+        ### Parameters:
+        - ticker: str: Ticker symbol of the security (e.g. AAPL, MSFT, TSLA).
+        '''
+        ticker = ticker.upper()
+
+        with self._lock:
+            quote = self.__fresh(ticker)
+            if quote is not None:
+                self.hits += 1
+                return quote
+            ticker_lock = self._ticker_locks.setdefault(ticker, threading.Lock())
+
+        with ticker_lock:
+            with self._lock: # another thread may have fetched it while we waited
+                quote = self.__fresh(ticker)
+                if quote is not None:
+                    self.hits += 1
+                    return quote
+                self.misses += 1
+
+            quote = self.fetch(ticker)
+
+            with self._lock:
+                self._quotes[ticker] = (time.monotonic(), quote)
+
+        return quote
+
+    def get_many(self, tickers: Iterable[str]) -> dict[str, dict]:
+        '''
+        Get the quotes of several tickers, by ticker (upper case). The tickers without a fresh quote are fetched with
+        one fetch_many call. Raises ValueError if a ticker is missing from the response.
+        '''
+        tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+
+        with self._lock:
+            quotes = {ticker: self.__fresh(ticker) for ticker in tickers}
+            missing = [ticker for ticker, quote in quotes.items() if quote is None]
+            self.hits += len(tickers) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            if self.fetch_many is not None:
+                fetched = self.fetch_many(missing)
+            else:
+                fetched = {ticker: self.fetch(ticker) for ticker in missing}
+
+            unknown = [ticker for ticker in missing if ticker not in fetched]
+            if unknown:
+                raise ValueError(f"No quote for {', '.join(unknown)}.")
+
+            with self._lock:
+                now = time.monotonic()
+                for ticker in missing:
+                    self._quotes[ticker] = (now, fetched[ticker])
+                    quotes[ticker] = fetched[ticker]
+
+        return quotes
+
+    def invalidate(self, ticker: Optional[str] = None) -> None:
+        '''
+        Drop the cached quote of a ticker, or of every ticker if none is given.
+        '''
+        with self._lock:
+            if ticker is None:
+                self._quotes.clear()
+            else:
+                self._quotes.pop(ticker.upper(), None)
+
+        return
+
+    def __fresh(self, ticker: str) -> Optional[dict]:
+        entry = self._quotes.get(ticker)
+        if entry is None or time.monotonic() - entry[0] >= self.ttl:
+            return None
+        return entry[1]
+
+
+SCHWAB_API_URL = 'https://api.schwabapi.com'
+
+# chains of liquid underlyings run to several megabytes, quotes are small
+SCHWAB_TIMEOUTS = {
+    '/marketdata/v1/chains': (3.05, 30),
+    '/marketdata/v1/quotes': (3.05, 5),
+}
+
+
+class SchwabData(MarketDataProvider):
     '''
-    Class to interact with the Schwab API. Based off of the schwabdev package. Takes no parameters. 
+    Class to interact with the Schwab API. Based off of the schwabdev package, which handles the authentication;
+    market data requests go through an HTTPClient (utils.http_client), which pools connections, retries transient
+    failures and records latencies. Every fetched chain is saved to a SnapshotStore, so it can be reloaded offline
+    (see utils.snapshots.SnapshotData). Raises ConnectionError if the client cannot be created.
+
+    ### Parameters:
+    - snapshots: SnapshotStore: Store fetched chains are written to. Defaults to data/snapshots.
+    - snapshot_max_age: timedelta: If set, a snapshot younger than this is loaded instead of downloading the chain.
+    - quote_ttl: float: Seconds a quote is reused for get_price and get_div_yield before it is fetched again.
+    - retries: int: Retries of a request that timed out or failed with a transient error.
 
     ### Attributes:
     - app_key: app key for the Schwab API. Kept in the .env file.
     - secret: secret key for the Schwab API. Kept in the .env file.
-    - client: Schwab API client object.
+    - client: Schwab API client object, used for the tokens.
+    - http: HTTPClient: Pooled session of the market data requests, with their latency histograms.
+    - snapshots: SnapshotStore: Store of fetched chains.
+    - quotes: QuoteCache: Cache of quotes, shared by get_price and get_div_yield.
 
     ### Methods:
     - get_options_chain_dict(ticker:str) -> dict: Get options chain and interest rate. Returns
     a tuple of a dictionary with the options chain and the risk-free interest rate.
+    - get_option_chain(ticker:str) -> OptionChain: Get the columnar options chain and interest rate.
     - get_price(ticker:str): Get last price of the security. Returns float. 
     - get_div_yield(ticker:str): Get the current dividend yield of chosen stock. Returns float.
+    - get_prices(tickers) / get_div_yields(tickers): Batch variants, quoting every ticker in one request.
     '''
-    def __init__(self):
+    def __init__(self, snapshots: Optional[SnapshotStore] = None, snapshot_max_age: Optional[timedelta] = None,
+                 quote_ttl: float = 15.0, retries: int = 3):
         load_dotenv()
 
+        self.snapshots = snapshots if snapshots is not None else SnapshotStore()
+        self.snapshot_max_age = snapshot_max_age
+        self.quotes = QuoteCache(self.__fetch_quote, ttl=quote_ttl, fetch_many=self.__fetch_quotes)
+
         self.app_key = os.getenv('APP_KEY')
         self.secret = os.getenv('SECRET_KEY')
 
+        # schwabdev (and requests) take a while to import and are not needed in demo or offline mode
+        import requests
+        import schwabdev
+        from utils.http_client import HTTPClient
+
         try:
             self.client = schwabdev.Client(app_key=self.app_key, app_secret=self.secret)
         except requests.exceptions.ConnectionError as e:
-            print('Error connecting to Schwab API. Please check your connection and your credentials and try again.')
-            exit()
+            raise ConnectionError('Error connecting to Schwab API. Please check your connection and your credentials '
+                                  'and try again.') from e
+
+        self.http = HTTPClient(SCHWAB_API_URL, timeouts=SCHWAB_TIMEOUTS, retries=retries, auth=self.__auth_headers)
         return
     
-    def get_options_chain_dict(self, ticker:str) -> tuple[dict[pd.DataFrame], float]:
+    def get_option_chain(self, ticker:str) -> tuple[OptionChain, float]:
         '''
-        Get options chain and interest rate. Gets raw data using Schwab API client, 
-        then filters the data to separate into calls and puts and filter necessary columns.
-        Also gets the risk-free interest rate. Returns a tuple of a dictionary with the options chain and the risk-free interest rate.
+        Get the options chain of all expirations as one columnar OptionChain, and the risk-free interest rate.
+        get_options_chain_dict (see MarketDataProvider) splits it into the calls and puts DataFrames of each
+        expiration. Loads a recent snapshot instead if snapshot_max_age is set, otherwise downloads and saves a new snapshot.
         ### Parameters:
         - ticker: str: Ticker symbol of the security (e.g. AAPL, MSFT, TSLA).
         '''
-        opt_dict = {'calls':defaultdict(list), 
-                    'puts':defaultdict(list)}
-        #q: Defaultdict of dict then of lists?
-        #a: 
-        json_data = self.client.option_chains(ticker).json()
+        if self.snapshot_max_age is not None:
+            fetched_at = self.snapshots.latest(ticker, self.snapshot_max_age)
+            if fetched_at is not None:
+                return self.snapshots.load(ticker, fetched_at)
+
+        json_data = self.http.get('/marketdata/v1/chains', symbol=ticker.upper()).json()
 
         if 'errors' in json_data.keys():
             raise ValueError('Invalid ticker symbol. Please try again.')
-        else:
-            for type in ['callExpDateMap', 'putExpDateMap']:
-                for expdate in json_data[type]:
-                    records = []
-                    for k in json_data[type][expdate]:
-                        data = json_data[type][expdate][k][0]
-                        records.append(data)
-                    df=pd.DataFrame(records)
-                    opt_dict[type.split('ExpDateMap')[0]+'s'][convert_date(expdate)] = filter_chain(df)
 
         interest_rate = json_data['interestRate']
+        chain = OptionChain.from_json(json_data)
+
+        try:
+            self.snapshots.save(ticker, chain, interest_rate,
+                                underlying_price=json_data.get('underlyingPrice'),
+                                dividend_yield=json_data.get('dividendYield'))
+        except OSError as e:
+            print(f'Could not save snapshot of {ticker}: {e}')
 
-        return opt_dict, interest_rate
+        return chain, interest_rate
 
     def get_price(self, ticker:str) -> float:
         '''
-        Get last price of the security. Returns float.
+        Get last price of the security. Returns float. Served from the quote cache.
         ### Parameters:
         - ticker: str: Ticker symbol of the security (e.g. AAPL, MSFT, TSLA).
         '''
-        quote = self.client.quote(ticker).json()
+        quote = self.quotes.get(ticker)
 
-        return quote[ticker]['quote']['lastPrice']
+        return quote['quote']['lastPrice']
 
     def get_div_yield(self, ticker:str) -> float:
         '''
-        Get the current dividend yield of chosen stock. Returns float.
+        Get the current dividend yield of chosen stock. Returns float. Served from the quote cache.
         ### Parameters:
         - ticker: str: Ticker symbol of the security (e.g. AAPL, MSFT, TSLA).
         '''
-        quote = self.client.quote(ticker).json()
+        quote = self.quotes.get(ticker)
+
+        return quote['fundamental']['divYield']/100 # originally in percent
+
+    def get_prices(self, tickers: Iterable[str]) -> dict[str, float]:
+        '''
+        Get the last prices of several securities, by ticker, quoting the ones not cached in one request.
+        '''
+        return {ticker: quote['quote']['lastPrice'] for ticker, quote in self.quotes.get_many(tickers).items()}
+
+    def get_div_yields(self, tickers: Iterable[str]) -> dict[str, float]:
+        '''
+        Get the dividend yields of several securities, by ticker, quoting the ones not cached in one request.
+        '''
+        return {ticker: quote['fundamental']['divYield']/100 for ticker, quote in self.quotes.get_many(tickers).items()}
+
+    def __auth_headers(self) -> dict:
+        '''
+        Bearer token of the next request, refreshed by schwabdev when it is about to expire.
+        '''
+        self.client.update_tokens()
+        tokens = getattr(self.client, 'tokens', self.client) # schwabdev 2.x keeps the token on the client
+
+        return {'Authorization': f'Bearer {tokens.access_token}'}
+
+    def __fetch_quote(self, ticker:str) -> dict:
+        '''
+        Fetch the quote of one ticker from the Schwab API.
+        '''
+        return self.__fetch_quotes([ticker.upper()])[ticker.upper()]
 
-        return quote[ticker]['fundamental']['divYield']/100 # originally in percent
+    def __fetch_quotes(self, tickers: list[str]) -> dict[str, dict]:
+        '''
+        Fetch the quotes of several tickers from the Schwab API in one request.
+        '''
+        return self.http.get('/marketdata/v1/quotes', symbols=','.join(tickers)).json()
 
 
-class DummyData:
+class DummyData(MarketDataProvider):
     '''
-    Dummy class to mimic Schwab API client if user is in demo mode. Takes no parameters, has no attributes.
-    Directly reads from the dummy data kept in "data\dummy_data\AAPL.json".
+    Dummy class to mimic Schwab API client if user is in demo mode.
+    Reads from the dummy data kept in "data\dummy_data\AAPL.json". The parsed chain is saved to a SnapshotStore
+    keyed by the modification time of the file, so later loads memory-map the snapshot instead of parsing the JSON.
+
+    ### Parameters:
+    - snapshots: SnapshotStore: Store of the parsed dummy chain. Defaults to data/snapshots.
 
     ### Methods:
     - get_options_chain_dict(ticker:str) -> dict: Get options chain based on dummy AAPL data and a fixed 
-    interest rate. Returns a tuple of a dictionary with the options chain and the risk-free interest rate.
+    interest rate of 4.5 percent. Returns a tuple of a dictionary with the options chain and the risk-free interest rate.
+    - get_option_chain(ticker:str) -> OptionChain: Get the columnar options chain and the fixed interest rate.
     - get_price(ticker:str): Get last price of the security, based on fixed value of 229.40. Returns float. 
     - get_div_yield(ticker:str): Get the dummy dividend yield of AAPL, set at 0.00403. Returns float.
     '''
-    def __init__(self):
-        
+    def __init__(self, snapshots: Optional[SnapshotStore] = None):
+        self.snapshots = snapshots if snapshots is not None else SnapshotStore()
+
         return
     
-    def get_options_chain_dict(self, ticker:str) -> dict:
-        opt_dict = {'calls':defaultdict(list), 
-                    'puts':defaultdict(list)}
-
+    def get_option_chain(self, ticker:str) -> tuple[OptionChain, float]:
+        '''
+        Get the dummy AAPL options chain as one columnar OptionChain, and the fixed interest rate.
+        '''
         # Only have AAPL data for demo purposes
         cwd = Path.cwd()
         appl_dummy_path = cwd / 'data' / 'dummy_data' / 'AAPL.json'
+        fetched_at = datetime.fromtimestamp(appl_dummy_path.stat().st_mtime).replace(microsecond=0)
+
+        try:
+            return self.snapshots.load('AAPL', fetched_at)
+        except FileNotFoundError: # first load, parse the JSON once
+            pass
+
         with open(appl_dummy_path) as f:
             json_data = json.load(f)
-            
-        for type in ['callExpDateMap', 'putExpDateMap']:
-            for expdate in json_data[type]:
-                records = []
-                for k in json_data[type][expdate]:
-                    data = json_data[type][expdate][k][0]
-                    records.append(data)
-                df=pd.DataFrame(records)
-                opt_dict[type.split('ExpDateMap')[0]+'s'][convert_date(expdate)] = filter_chain(df)
-
-        interest_rate = 0.045
-
-        return opt_dict, interest_rate
+
+        interest_rate = DUMMY_INTEREST_RATE
+        chain = OptionChain.from_json(json_data)
+
+        try:
+            self.snapshots.save('AAPL', chain, interest_rate, underlying_price=self.get_price('AAPL'),
+                                dividend_yield=self.get_div_yield('AAPL')*100, fetched_at=fetched_at)
+        except OSError as e:
+            print(f'Could not save snapshot of AAPL: {e}')
+
+        return chain, interest_rate
         
 
     def get_price(self, ticker:str):
@@ -190,6 +391,12 @@ class DummyData:
         '''
         return 0.403/100 # originally in percent
 
+    def get_interest_rate(self, ticker:str) -> float:
+        '''
+        Get the interest rate in percent. Fixed at 4.5.
+        '''
+        return DUMMY_INTEREST_RATE
+
 
 if __name__ == '__main__':
     #print(get_options_date('AAPL'))
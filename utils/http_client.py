@@ -0,0 +1,210 @@
+import random
+import threading
+import time
+
+from bisect import bisect_left
+from typing import Callable, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+Timeout = Union[float, tuple[float, float]]
+
+# upper bounds of the latency buckets, in milliseconds (the last bucket is open ended)
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class LatencyHistogram:
+    '''
+    Histogram of request latencies over fixed buckets (LATENCY_BUCKETS_MS). Not thread safe on its own, HTTPClient
+    records under its lock.
+
+    ### Attributes:
+    - counts: list[int]: Number of requests per bucket, the last one for requests slower than the last bound.
+    - count: int: Number of requests recorded.
+    - total: float: Sum of the latencies, in seconds.
+    - max: float: Slowest latency, in seconds.
+
+    ### Methods:
+    - record: Add the latency of a request.
+    - percentile: Upper bound of the bucket the given percentile falls in, in milliseconds.
+    '''
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+        return
+
+    def record(self, seconds: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+        return
+
+    def percentile(self, p: float) -> float:
+        '''
+        Upper bound of the bucket holding the p-th percentile (0 to 100), in milliseconds, capped at the slowest
+        latency. 0 if nothing was recorded.
+        '''
+        if self.count == 0:
+            return 0.0
+
+        rank = p / 100 * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(float(bound), self.max * 1000)
+        return self.max * 1000
+
+
+class HTTPClient:
+    '''
+    HTTP layer of the REST providers (SchwabData, HTTPData). All requests share one keep-alive session with a
+    connection pool, so bursts of requests reuse connections instead of opening new ones. Each endpoint has its own
+    timeout, connection errors, timeouts and throttled or failed responses (RETRY_STATUSES) are retried a bounded
+    number of times with jittered exponential backoff, and the latency of every request is recorded per endpoint.
+    Safe to share between threads.
+
+    ### Parameters:
+    - base_url: str: URL the request paths are relative to.
+    - timeouts: dict[str, Timeout]: Timeout of each endpoint (path), in seconds, or (connect, read) tuples.
+    - default_timeout: Timeout: Timeout of the other endpoints.
+    - retries: int: Number of retries after the first attempt.
+    - backoff: float: Base of the backoff, in seconds. Retry n waits uniformly up to backoff * 2**n ("full jitter"),
+    so clients failing together do not retry together.
+    - max_backoff: float: Cap of the backoff, in seconds. Also caps the Retry-After of throttled responses.
+    - pool_size: int: Connections kept open to the server.
+    - auth: Callable[[], dict]: Returns headers to send with each request, e.g. a fresh bearer token.
+
+    ### Attributes:
+    - session: requests.Session: The pooled session.
+    - latencies: dict[str, LatencyHistogram]: Latency of the successful requests of each endpoint.
+    - attempts / retries_made / failures: dict[str, int]: Requests sent, retried and given up on, by endpoint.
+
+    ### Methods:
+    - get: GET an endpoint, retrying transient failures.
+    - stats: Request counts and latency percentiles of each endpoint.
+    - report: The stats as a printable table.
+    - close: Close the pooled connections.
+    '''
+    def __init__(self,
+                 base_url: str,
+                 timeouts: Optional[dict[str, Timeout]] = None,
+                 default_timeout: Timeout = (3.05, 10),
+                 retries: int = 3,
+                 backoff: float = 0.25,
+                 max_backoff: float = 8.0,
+                 pool_size: int = 8,
+                 auth: Optional[Callable[[], dict]] = None):
+        self.base_url = base_url.rstrip('/')
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.auth = auth
+
+        # retries are handled here rather than by urllib3, so they are counted and use our backoff
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.latencies = {}
+        self.attempts = {}
+        self.retries_made = {}
+        self.failures = {}
+        self._lock = threading.Lock()
+
+        return
+
+    def get(self, path: str, **params) -> requests.Response:
+        '''
+        GET base_url + path. Retries connection errors, timeouts and RETRY_STATUSES responses; other responses
+        (including client errors, whose body the caller may want) are returned as is. Raises ConnectionError once
+        the retries are used up.
+        '''
+        timeout = self.timeouts.get(path, self.default_timeout)
+        error = None
+
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                self.__count(self.retries_made, path)
+                time.sleep(self.__delay(attempt, error))
+
+            headers = self.auth() if self.auth is not None else None
+            self.__count(self.attempts, path)
+            start = time.perf_counter()
+            try:
+                response = self.session.get(self.base_url + path, params=params, headers=headers, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+                continue
+
+            if response.status_code in RETRY_STATUSES:
+                error = response
+                continue
+
+            with self._lock:
+                self.latencies.setdefault(path, LatencyHistogram()).record(time.perf_counter() - start)
+            return response
+
+        self.__count(self.failures, path)
+        if isinstance(error, requests.Response):
+            error = f"HTTP {error.status_code} {error.reason}"
+        raise ConnectionError(f"{path} failed after {self.retries + 1} attempts: {error}")
+
+    def stats(self) -> dict[str, dict]:
+        '''
+        Request counts and latency percentiles (in milliseconds, bucket upper bounds) of each endpoint.
+        '''
+        with self._lock:
+            stats = {}
+            for path in self.attempts:
+                histogram = self.latencies.get(path, LatencyHistogram())
+                stats[path] = {
+                    'requests': self.attempts[path],
+                    'retries': self.retries_made.get(path, 0),
+                    'failures': self.failures.get(path, 0),
+                    'mean': histogram.total / histogram.count * 1000 if histogram.count else 0.0,
+                    'p50': histogram.percentile(50),
+                    'p90': histogram.percentile(90),
+                    'p99': histogram.percentile(99),
+                    'max': histogram.max * 1000,
+                }
+            return stats
+
+    def report(self) -> str:
+        '''
+        The stats of each endpoint as a table, latencies in milliseconds.
+        '''
+        lines = [f'{"endpoint":<28}{"requests":>9}{"retries":>8}{"failed":>7}'
+                 f'{"mean":>8}{"p50":>8}{"p90":>8}{"p99":>8}{"max":>8}']
+        for path, s in self.stats().items():
+            lines.append(f"{path:<28}{s['requests']:>9}{s['retries']:>8}{s['failures']:>7}"
+                         f"{s['mean']:>8.0f}{s['p50']:>8.0f}{s['p90']:>8.0f}{s['p99']:>8.0f}{s['max']:>8.0f}")
+        return '\n'.join(lines)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __count(self, counter: dict[str, int], path: str) -> None:
+        with self._lock:
+            counter[path] = counter.get(path, 0) + 1
+
+    def __delay(self, attempt: int, error) -> float:
+        '''
+        Seconds to wait before a retry: the Retry-After of a throttled response, otherwise full-jitter backoff.
+        '''
+        if isinstance(error, requests.Response):
+            retry_after = error.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
@@ -0,0 +1,97 @@
+from typing import Iterable
+
+from utils.chain import OptionChain
+from utils.data_utils import QuoteCache
+from utils.provider import MarketDataProvider
+
+
+class HTTPData(MarketDataProvider):
+    '''
+    Provider reading Schwab-format JSON from any server exposing the market data endpoints of the Schwab API
+    (/marketdata/v1/chains and /marketdata/v1/quotes) without authentication, e.g. the local stand-in of
+    utils.mock_server. Used to load-test chain ingestion against a server of known latency.
+
+    ### Parameters:
+    - base_url: str: URL of the server, e.g. http://127.0.0.1:8765.
+    - timeout: float: Seconds to wait for a response before retrying.
+    - retries: int: Retries of a request that timed out or failed with a transient error.
+    - quote_ttl: float: Seconds a quote is reused for get_price and get_div_yield before it is fetched again.
+
+    ### Attributes:
+    - http: HTTPClient: Pooled session the requests go through, with their latency histograms.
+    - quotes: QuoteCache: Cache of quotes, shared by get_price, get_div_yield and their batch variants.
+
+    ### Methods:
+    - get_option_chain(ticker:str) -> tuple[OptionChain, float]: Get the columnar options chain and interest rate.
+    - get_price(ticker:str): Get the last price of the security. Returns float.
+    - get_div_yield(ticker:str): Get the dividend yield of the security. Returns float.
+    - get_prices(tickers) / get_div_yields(tickers): Batch variants, quoting every ticker in one request.
+    '''
+    def __init__(self, base_url: str, timeout: float = 10.0, retries: int = 3, quote_ttl: float = 15.0):
+        from utils.http_client import HTTPClient # requests is only needed when the app talks to a server
+
+        self.http = HTTPClient(base_url, default_timeout=timeout, retries=retries)
+        self.quotes = QuoteCache(self.__fetch_quote, ttl=quote_ttl, fetch_many=self.__fetch_quotes)
+
+        return
+
+    def get_option_chain(self, ticker: str) -> tuple[OptionChain, float]:
+        '''
+        Get the options chain of all expirations as one columnar OptionChain, and the interest rate in percent.
+        ### Parameters:
+        - ticker: str: Ticker symbol of the security (e.g. AAPL, MSFT, TSLA).
+        '''
+        json_data = self.__get('/marketdata/v1/chains', symbol=ticker.upper())
+
+        if 'errors' in json_data.keys():
+            raise ValueError('Invalid ticker symbol. Please try again.')
+
+        return OptionChain.from_json(json_data), json_data['interestRate']
+
+    def get_price(self, ticker: str) -> float:
+        '''
+        Get the last price of the security. Served from the quote cache.
+        '''
+        return self.quotes.get(ticker)['quote']['lastPrice']
+
+    def get_div_yield(self, ticker: str) -> float:
+        '''
+        Get the dividend yield of the security. Served from the quote cache.
+        '''
+        return self.quotes.get(ticker)['fundamental']['divYield']/100 # originally in percent
+
+    def get_prices(self, tickers: Iterable[str]) -> dict[str, float]:
+        '''
+        Get the last prices of several securities, by ticker, quoting the ones not cached in one request.
+        '''
+        return {ticker: quote['quote']['lastPrice'] for ticker, quote in self.quotes.get_many(tickers).items()}
+
+    def get_div_yields(self, tickers: Iterable[str]) -> dict[str, float]:
+        '''
+        Get the dividend yields of several securities, by ticker, quoting the ones not cached in one request.
+        '''
+        return {ticker: quote['fundamental']['divYield']/100 for ticker, quote in self.quotes.get_many(tickers).items()}
+
+    def __get(self, path: str, **params) -> dict:
+        '''
+        GET an endpoint of the server and return its JSON. Error responses of the Schwab API come with an "errors"
+        body, so they are returned rather than raised.
+        '''
+        return self.http.get(path, **params).json()
+
+    def __fetch_quote(self, ticker: str) -> dict:
+        '''
+        Fetch the quote of one ticker.
+        '''
+        return self.__fetch_quotes([ticker])[ticker]
+
+    def __fetch_quotes(self, tickers: list[str]) -> dict[str, dict]:
+        '''
+        Fetch the quotes of several tickers in one request.
+        '''
+        json_data = self.__get('/marketdata/v1/quotes', symbols=','.join(tickers))
+
+        if 'errors' in json_data.keys():
+            raise ValueError('Invalid ticker symbol. Please try again.')
+
+        return json_data
@@ -0,0 +1,284 @@
+import argparse
+import copy
+import json
+import random
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+# Local stand-in for the market data endpoints of the Schwab API, serving recorded Schwab-format JSON (the files of
+# data/dummy_data, one <TICKER>.json chain per ticker) with a configurable latency and payload size. Point the app at
+# it with `python main.py --url http://127.0.0.1:8765` (see utils.http_data.HTTPData) to load-test chain ingestion
+# and UI responsiveness without a live account:
+#
+#     python -m utils.mock_server --port 8765 --latency 0.5 --jitter 0.5 --scale 10
+#     python -m utils.mock_server --latency 0.2 --bench 20    # time 20 chain loads through HTTPData, then quit
+
+
+class MockSchwabServer:
+    '''
+    HTTP server mimicking GET /marketdata/v1/chains?symbol= and GET /marketdata/v1/quotes?symbols= of the Schwab API.
+    Runs on a daemon thread and handles requests concurrently. Unknown tickers get a 400 response with an "errors"
+    body, like the Schwab API.
+
+    ### Parameters:
+    - recordings: Path: Directory of recorded chains, <TICKER>.json each.
+    - latency: float: Seconds every response is delayed by.
+    - jitter: float: Up to this many seconds are added to the latency, uniformly at random.
+    - payload_scale: int: Every strike of the recorded chains is served this many times (the copies a cent apart),
+    to load-test the parsing of large chains.
+    - error_rate: float: Fraction of requests answered with a 503, to exercise the retries of the client.
+    - fallback: str: Recording served, relabelled, for tickers without one. None to answer them with an error.
+    - host: str: Address to listen on.
+    - port: int: Port to listen on. 0 picks a free one.
+
+    ### Attributes:
+    - url: str: Base URL of the server, once started.
+    - requests: int: Number of requests served.
+    - bytes_sent: int: Number of bytes of the response bodies.
+
+    ### Methods:
+    - start: Start serving on a daemon thread.
+    - stop: Stop the server.
+    '''
+    def __init__(self,
+                 recordings: Optional[Path] = None,
+                 latency: float = 0.0,
+                 jitter: float = 0.0,
+                 payload_scale: int = 1,
+                 error_rate: float = 0.0,
+                 fallback: Optional[str] = None,
+                 host: str = '127.0.0.1',
+                 port: int = 0):
+        self.recordings = Path(recordings) if recordings is not None else Path.cwd() / 'data' / 'dummy_data'
+        self.latency = latency
+        self.jitter = jitter
+        self.payload_scale = max(int(payload_scale), 1)
+        self.error_rate = error_rate
+        self.fallback = fallback.upper() if fallback else None
+        self.host = host
+        self.port = port
+
+        self.url = None
+        self.requests = 0
+        self.bytes_sent = 0
+
+        self._server = None
+        self._thread = None
+        self._recordings = {} # recording path -> (serialized chain, quote), loaded once
+        self._lock = threading.Lock()
+
+        return
+
+    def start(self) -> 'MockSchwabServer':
+        '''
+        Start serving on a daemon thread. Returns the server, so it can be chained with the constructor.
+        '''
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1' # keep-alive, like the Schwab API
+
+            def do_GET(self):
+                mock._handle(self)
+
+            def log_message(self, format, *args):
+                pass # keep load tests quiet
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://{self.host}:{self._server.server_address[1]}"
+
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock-schwab', daemon=True)
+        self._thread.start()
+
+        return self
+
+    def stop(self) -> None:
+        '''
+        Stop the server and wait for its thread to exit.
+        '''
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+        return
+
+    def __enter__(self) -> 'MockSchwabServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _handle(self, handler: BaseHTTPRequestHandler) -> None:
+        '''
+        Answer one request. Runs on the thread of the request.
+        '''
+        url = urlparse(handler.path)
+        params = parse_qs(url.query)
+
+        if random.random() < self.error_rate:
+            status, body = 503, json.dumps({'errors': [{'status': 503, 'title': 'Service Unavailable'}]}).encode()
+        elif url.path == '/marketdata/v1/chains':
+            status, body = self.__chain(params.get('symbol', [''])[0])
+        elif url.path == '/marketdata/v1/quotes':
+            status, body = self.__quotes(params.get('symbols', [''])[0])
+        else:
+            status, body = 404, json.dumps({'errors': [{'status': 404, 'title': 'Not Found'}]}).encode()
+
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        try:
+            handler.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            handler.close_connection = True # the client timed out and hung up
+            return
+
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += len(body)
+
+        return
+
+    def __recording(self, ticker: str) -> Optional[tuple[bytes, dict]]:
+        '''
+        The serialized chain (scaled, with its own symbol first) and the quote of the recording of a ticker, or of
+        the fallback. Recordings are loaded once, as parsing them would otherwise dominate the response time. None
+        if there is neither.
+        '''
+        path = self.recordings / f"{ticker}.json"
+        if not path.exists() and self.fallback is not None:
+            path = self.recordings / f"{self.fallback}.json"
+        if not ticker or not path.exists():
+            return None
+
+        with self._lock:
+            recording = self._recordings.get(path)
+        if recording is not None:
+            return recording
+
+        with open(path) as f:
+            data = json.load(f)
+        if self.payload_scale > 1:
+            for key in ('callExpDateMap', 'putExpDateMap'):
+                data[key] = {exp: self.__scale(strikes) for exp, strikes in data[key].items()}
+            data['numberOfContracts'] = data.get('numberOfContracts', 0) * self.payload_scale
+
+        quote = {
+            'quote': {'lastPrice': data['underlyingPrice']},
+            'fundamental': {'divYield': data.get('dividendYield') or 0.0},
+        }
+        recording = (json.dumps({'symbol': data.pop('symbol', ''), **data}).encode(), quote)
+        with self._lock:
+            self._recordings[path] = recording
+
+        return recording
+
+    def __chain(self, ticker: str) -> tuple[int, bytes]:
+        '''
+        Response to a chain request: the recording, relabelled with the requested ticker.
+        '''
+        ticker = ticker.upper()
+        recording = self.__recording(ticker)
+        if recording is None:
+            return 400, self.__error(f"No chain recorded for {ticker}")
+
+        body = recording[0]
+        symbol_end = body.index(b'",') + 1 # end of the leading "symbol" field
+        return 200, json.dumps({'symbol': ticker})[:-1].encode() + body[symbol_end:]
+
+    def __scale(self, strikes: dict) -> dict:
+        '''
+        Serve every strike payload_scale times, the copies a cent apart with their own contract symbols.
+        '''
+        scaled = {}
+        for strike, contracts in strikes.items():
+            scaled[strike] = contracts
+            for i in range(1, self.payload_scale):
+                copies = copy.deepcopy(contracts)
+                for contract in copies:
+                    contract['symbol'] = f"{contract['symbol']}.{i}"
+                    contract['strikePrice'] = round(float(strike) + i/100, 2)
+                scaled[f"{float(strike) + i/100:.2f}"] = copies
+        return scaled
+
+    def __quotes(self, symbols: str) -> tuple[int, bytes]:
+        '''
+        Response to a quote request, built from the underlying price and dividend yield of the recorded chains.
+        '''
+        quotes = {}
+        for ticker in filter(None, symbols.upper().split(',')):
+            recording = self.__recording(ticker)
+            if recording is None:
+                return 400, self.__error(f"No quote recorded for {ticker}")
+            quotes[ticker] = {'symbol': ticker, **recording[1]}
+
+        if not quotes:
+            return 400, self.__error('No symbols requested')
+        return 200, json.dumps(quotes).encode()
+
+    @staticmethod
+    def __error(detail: str) -> bytes:
+        return json.dumps({'errors': [{'status': 400, 'title': 'Bad Request', 'detail': detail}]}).encode()
+
+
+def bench(url: str, loads: int, tickers: list[str]) -> None:
+    '''
+    Time chain loads through HTTPData, like the app does them (chain, then price), one after the other.
+    '''
+    from utils.http_data import HTTPData
+
+    engine = HTTPData(url, quote_ttl=0)
+    times = []
+    for i in range(loads):
+        ticker = tickers[i % len(tickers)]
+        start = time.perf_counter()
+        chain, _ = engine.get_option_chain(ticker)
+        engine.get_price(ticker)
+        times.append(time.perf_counter() - start)
+
+    times.sort()
+    print(f"{loads} loads of {len(chain)} contracts: "
+          f"median {times[len(times)//2]*1000:.0f} ms, max {times[-1]*1000:.0f} ms")
+    print(engine.http.report())
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local stand-in for the Schwab market data API')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on, 0 for any free port.')
+    parser.add_argument('--recordings', default=None, help='Directory of recorded chains. Defaults to data/dummy_data.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds every response is delayed by.')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Up to this many seconds added to the latency.')
+    parser.add_argument('--scale', type=int, default=1, help='Serve every strike this many times.')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of requests answered with a 503 Service Unavailable.')
+    parser.add_argument('--fallback', default='AAPL',
+                        help='Recording served for tickers without one. Empty to answer them with an error.')
+    parser.add_argument('--bench', type=int, default=0, metavar='N',
+                        help='Time N chain loads through HTTPData, then quit.')
+
+    args = parser.parse_args()
+
+    server = MockSchwabServer(args.recordings, args.latency, args.jitter, args.scale, args.error_rate,
+                              args.fallback or None, port=args.port).start()
+    if args.bench:
+        bench(server.url, args.bench, ['AAPL'])
+        print(f"{server.requests} requests, {server.bytes_sent / 1e6:.1f} MB sent")
+        server.stop()
+    else:
+        print(f"Serving recorded chains on {server.url}, Ctrl+C to stop")
+        try:
+            server._thread.join()
+        except KeyboardInterrupt:
+            server.stop()
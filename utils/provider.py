@@ -0,0 +1,98 @@
+from abc import ABC, abstractmethod
+from typing import Iterable, Optional
+
+from utils.chain import OptionChain
+
+
+class MarketDataProvider(ABC):
+    '''
+    Interface of the data engines of the app (SchwabData, DummyData, SnapshotData, HTTPData). A provider serves option
+    chains, quotes, dividend yields and interest rates. Subclasses implement get_option_chain, get_price and
+    get_div_yield; the other methods have default implementations on top of them, which providers with cheaper ways
+    to get the data override (e.g. one request for the quotes of several tickers).
+
+    Methods may be called from worker threads (see src.chain_loader), so implementations must be thread safe.
+
+    ### Methods:
+    - get_option_chain(ticker:str) -> tuple[OptionChain, float]: Get the columnar options chain and the interest rate
+    (in percent, as in the Schwab response).
+    - get_options_chain_dict(ticker:str) -> tuple[dict, float]: Get the chain as {'calls': {exp: DataFrame}, 'puts': ...}
+    and the interest rate.
+    - get_price(ticker:str) -> float: Get the last price of the security.
+    - get_div_yield(ticker:str) -> float: Get the dividend yield of the security, as a decimal.
+    - get_interest_rate(ticker:str) -> float: Get the interest rate used for the chain of the security, in percent.
+    - get_option_chains(tickers) -> dict: Batch variant of get_option_chain.
+    - get_prices(tickers) -> dict: Batch variant of get_price.
+    - get_div_yields(tickers) -> dict: Batch variant of get_div_yield.
+    '''
+    @abstractmethod
+    def get_option_chain(self, ticker: str) -> tuple[OptionChain, float]:
+        '''
+        Get the options chain of all expirations as one columnar OptionChain, and the interest rate in percent.
+        Raises ValueError if the ticker is unknown.
+        '''
+
+    @abstractmethod
+    def get_price(self, ticker: str) -> float:
+        '''
+        Get the last price of the security.
+        '''
+
+    @abstractmethod
+    def get_div_yield(self, ticker: str) -> float:
+        '''
+        Get the dividend yield of the security, as a decimal (0.004 for 0.4%).
+        '''
+
+    def get_options_chain_dict(self, ticker: str) -> tuple[dict, float]:
+        '''
+        Get the chain in the format used by the app, {'calls': {exp: DataFrame}, 'puts': {exp: DataFrame}}, and the
+        interest rate in percent. The per-expiry DataFrames are views on a single columnar OptionChain.
+        '''
+        chain, interest_rate = self.get_option_chain(ticker)
+
+        return chain.to_dict(), interest_rate
+
+    def get_interest_rate(self, ticker: str) -> float:
+        '''
+        Get the interest rate used for the chain of the security, in percent. Loads the chain by default.
+        '''
+        return self.get_option_chain(ticker)[1]
+
+    def get_option_chains(self, tickers: Iterable[str]) -> dict[str, tuple[OptionChain, float]]:
+        '''
+        Get the chains and interest rates of several tickers, by ticker. One get_option_chain per ticker by default.
+        '''
+        return {ticker: self.get_option_chain(ticker) for ticker in tickers}
+
+    def get_prices(self, tickers: Iterable[str]) -> dict[str, float]:
+        '''
+        Get the last prices of several tickers, by ticker. One get_price per ticker by default.
+        '''
+        return {ticker: self.get_price(ticker) for ticker in tickers}
+
+    def get_div_yields(self, tickers: Iterable[str]) -> dict[str, float]:
+        '''
+        Get the dividend yields of several tickers, by ticker. One get_div_yield per ticker by default.
+        '''
+        return {ticker: self.get_div_yield(ticker) for ticker in tickers}
+
+
+def get_provider(demo: bool = False, offline: bool = False, url: Optional[str] = None) -> MarketDataProvider:
+    '''
+    Create the market data provider of the app: HTTPData if a server URL is given (e.g. the stand-in of
+    utils.mock_server), DummyData in demo mode, SnapshotData offline (chains captured by earlier SchwabData sessions),
+    SchwabData otherwise. Creating a SchwabData connects to the Schwab API, which can take a while and may ask for
+    authentication. The providers are imported here, so only the one in use is loaded.
+    '''
+    if url:
+        from utils.http_data import HTTPData
+        return HTTPData(url)
+    if demo:
+        from utils.data_utils import DummyData
+        return DummyData()
+    if offline:
+        from utils.snapshots import SnapshotData
+        return SnapshotData()
+    from utils.data_utils import SchwabData
+    return SchwabData()
@@ -0,0 +1,214 @@
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+from utils.chain import CHAIN_COLUMNS, OptionChain
+from utils.provider import MarketDataProvider
+
+TIMESTAMP_FORMAT = '%Y%m%dT%H%M%S'
+
+
+class SnapshotStore:
+    '''
+    On-disk store of option chain snapshots, keyed by ticker and fetch timestamp. Each snapshot is a directory
+    with one .npy file per column of the OptionChain (strings as fixed-width unicode) plus a meta.json with the
+    expirations, interest rate and underlying quote. Snapshots are reloaded with memory mapping, so loading
+    does not parse or copy the chain.
+
+    Layout: root / TICKER / YYYYMMDDTHHMMSS / {meta.json, <field>.npy, expiry.npy, is_call.npy}
+
+    ### Parameters:
+    - root: Path: Directory of the store. Defaults to data/snapshots in the working directory.
+
+    ### Methods:
+    - save: Write a chain snapshot.
+    - load: Memory-map a snapshot back into an OptionChain.
+    - list: Get the fetch timestamps available for a ticker.
+    - latest: Get the timestamp of the newest snapshot of a ticker, optionally no older than max_age.
+    - meta: Get the metadata of a snapshot.
+    '''
+    def __init__(self, root: Optional[Path] = None):
+        self.root = Path(root) if root is not None else Path.cwd() / 'data' / 'snapshots'
+
+        return
+
+    def save(self,
+             ticker: str,
+             chain: OptionChain,
+             interest_rate: float,
+             underlying_price: Optional[float] = None,
+             dividend_yield: Optional[float] = None,
+             fetched_at: Optional[datetime] = None) -> Path:
+        '''
+        Write a chain snapshot and return its directory. The snapshot is written to a temporary directory of its own
+        and renamed into place, so readers never see a partial or missing snapshot and concurrent writers (threads
+        or processes) never touch each other's files. A snapshot is never replaced: if one with the same key already
+        exists, or another writer renames theirs first, it is kept and this one is dropped.
+
+        ### Parameters:
+        - ticker: str: Ticker symbol of the security.
+        - chain: OptionChain: Chain to store.
+        - interest_rate: float: Interest rate returned with the chain, in percent as in the Schwab response.
+        - underlying_price: float: Price of the underlying when the chain was fetched.
+        - dividend_yield: float: Dividend yield of the underlying, in percent.
+        - fetched_at: datetime: Fetch time, used as the key. Defaults to now.
+        '''
+        fetched_at = fetched_at if fetched_at is not None else datetime.now()
+        path = self.__path(ticker, fetched_at)
+        if path.exists():
+            return path
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(prefix=path.name + '.', suffix='.tmp', dir=path.parent))
+
+        for field, (name, dtype) in CHAIN_COLUMNS.items():
+            values = chain.columns[name]
+            if dtype is object:
+                values = values.astype(str) # fixed-width unicode can be memory mapped
+            np.save(tmp / f'{field}.npy', values)
+        np.save(tmp / 'expiry.npy', chain.expiry)
+        np.save(tmp / 'is_call.npy', chain.is_call)
+
+        meta = {
+            'ticker': ticker.upper(),
+            'fetched_at': fetched_at.strftime(TIMESTAMP_FORMAT),
+            'expirations': chain.expirations,
+            'interest_rate': interest_rate,
+            'underlying_price': underlying_price,
+            'dividend_yield': dividend_yield,
+        }
+        with open(tmp / 'meta.json', 'w') as f:
+            json.dump(meta, f)
+
+        try:
+            os.rename(tmp, path) # fails if the snapshot exists, unlike os.replace
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not path.exists():
+                raise
+
+        return path
+
+    def load(self, ticker: str, fetched_at: Optional[datetime] = None) -> tuple[OptionChain, float]:
+        '''
+        Memory-map a snapshot into an OptionChain. Returns a tuple of the chain and the interest rate (in percent).
+        Raises FileNotFoundError if there is no such snapshot.
+
+        ### Parameters:
+        - ticker: str: Ticker symbol of the security.
+        - fetched_at: datetime: Timestamp of the snapshot. Defaults to the latest one.
+        '''
+        if fetched_at is None:
+            fetched_at = self.latest(ticker)
+            if fetched_at is None:
+                raise FileNotFoundError(f'No snapshot found for {ticker.upper()}.')
+
+        path = self.__path(ticker, fetched_at)
+        meta = self.meta(ticker, fetched_at)
+
+        columns = {name: np.load(path / f'{field}.npy', mmap_mode='r')
+                   for field, (name, dtype) in CHAIN_COLUMNS.items()}
+        expiry = np.load(path / 'expiry.npy', mmap_mode='r')
+        is_call = np.load(path / 'is_call.npy', mmap_mode='r')
+
+        return OptionChain(columns, expiry, is_call, meta['expirations']), meta['interest_rate']
+
+    def meta(self, ticker: str, fetched_at: datetime) -> dict:
+        '''
+        Get the metadata of a snapshot: ticker, fetched_at, expirations, interest_rate, underlying_price, dividend_yield.
+        '''
+        with open(self.__path(ticker, fetched_at) / 'meta.json') as f:
+            return json.load(f)
+
+    def list(self, ticker: str) -> list[datetime]:
+        '''
+        Get the fetch timestamps of all snapshots of a ticker, oldest first.
+        '''
+        ticker_dir = self.root / ticker.upper()
+        if not ticker_dir.is_dir():
+            return []
+
+        stamps = []
+        for path in ticker_dir.iterdir():
+            if path.is_dir() and (path / 'meta.json').exists():
+                try:
+                    stamps.append(datetime.strptime(path.name, TIMESTAMP_FORMAT))
+                except ValueError: # not a snapshot
+                    continue
+
+        return sorted(stamps)
+
+    def latest(self, ticker: str, max_age: Optional[timedelta] = None) -> Optional[datetime]:
+        '''
+        Get the timestamp of the newest snapshot of a ticker, or None if there is none (or none younger than max_age).
+        '''
+        stamps = self.list(ticker)
+        if not stamps:
+            return None
+        if max_age is not None and datetime.now() - stamps[-1] > max_age:
+            return None
+
+        return stamps[-1]
+
+    def __path(self, ticker: str, fetched_at: datetime) -> Path:
+        return self.root / ticker.upper() / fetched_at.strftime(TIMESTAMP_FORMAT)
+
+
+class SnapshotData(MarketDataProvider):
+    '''
+    Data engine serving chains and quotes from captured snapshots only, for working offline. Mimics SchwabData.
+    Uses the latest snapshot of each ticker.
+
+    ### Parameters:
+    - store: SnapshotStore: Store to read from. Defaults to data/snapshots in the working directory.
+
+    ### Methods:
+    - get_options_chain_dict(ticker:str) -> dict: Get options chain and interest rate from the latest snapshot.
+    - get_option_chain(ticker:str) -> OptionChain: Get the columnar options chain and interest rate.
+    - get_price(ticker:str): Get the underlying price stored with the latest snapshot. Returns float.
+    - get_div_yield(ticker:str): Get the dividend yield stored with the latest snapshot. Returns float.
+    - get_interest_rate(ticker:str): Get the interest rate stored with the latest snapshot. Returns float.
+    '''
+    def __init__(self, store: Optional[SnapshotStore] = None):
+        self.store = store if store is not None else SnapshotStore()
+
+        return
+
+    def get_option_chain(self, ticker:str) -> tuple[OptionChain, float]:
+        '''
+        Get the chain of the latest snapshot. Raises ValueError if the ticker has no snapshot.
+        '''
+        try:
+            return self.store.load(ticker)
+        except FileNotFoundError as e:
+            raise ValueError(f'{e} Load the ticker once while online to capture it.')
+
+    def get_price(self, ticker:str) -> float:
+        '''
+        Get the underlying price stored with the latest snapshot.
+        '''
+        return self.__meta(ticker)['underlying_price']
+
+    def get_div_yield(self, ticker:str) -> float:
+        '''
+        Get the dividend yield stored with the latest snapshot.
+        '''
+        return (self.__meta(ticker)['dividend_yield'] or 0)/100 # originally in percent
+
+    def get_interest_rate(self, ticker:str) -> float:
+        '''
+        Get the interest rate stored with the latest snapshot, in percent.
+        '''
+        return self.__meta(ticker)['interest_rate']
+
+    def __meta(self, ticker: str) -> dict:
+        fetched_at = self.store.latest(ticker)
+        if fetched_at is None:
+            raise ValueError(f'No snapshot found for {ticker.upper()}.')
+        return self.store.meta(ticker, fetched_at)
@@ -0,0 +1,117 @@
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Iterator, Optional
+
+from utils.provider import MarketDataProvider
+
+# Schwab allows 120 market data requests a minute per app
+SCHWAB_REQUESTS_PER_SECOND = 2.0
+
+
+class RateLimiter:
+    '''
+    Token bucket shared by the threads of a load: up to burst requests go out at once, then rate per second.
+
+    ### Parameters:
+    - rate: float: Requests per second. 0 or less disables the limit.
+    - burst: int: Requests allowed back to back after an idle period.
+
+    ### Methods:
+    - acquire: Block until a request may be sent.
+    '''
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(int(burst), 1)
+
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+        return
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def load_chains(engine: MarketDataProvider,
+                tickers: Iterable[str],
+                max_workers: int = 8,
+                rate: float = SCHWAB_REQUESTS_PER_SECOND,
+                burst: int = 8) -> Iterator[dict]:
+    '''
+    Download and parse the chains of a watchlist concurrently, yielding each ticker as soon as it is done (not in
+    the order of the watchlist). The quotes of every ticker are fetched first with one batched request (see
+    MarketDataProvider.get_prices) and handed to the chain loads, then the chains on max_workers threads, no faster
+    than the rate limit. If the batch fails, each ticker is quoted on its own, also under the rate limit. Requests
+    throttled by the server anyway are retried by the provider (see utils.http_client.HTTPClient). Closing the
+    generator early cancels the chains not started yet.
+
+    Yields one dict per ticker: ticker, chain (OptionChain), interest_rate (percent), price, div_yield (decimal),
+    seconds (time to load it, including the wait for the rate limit) and error (message, None if it loaded; the
+    other values are None if not).
+
+    ### Parameters:
+    - engine: MarketDataProvider: Provider to load from. Must be thread safe, as all providers of the app are.
+    - tickers: Iterable[str]: Ticker symbols. Duplicates are loaded once.
+    - max_workers: int: Chains downloaded at once. Keep it at most the pool size of the HTTP client (8).
+    - rate: float: Chain requests per second, 0 for no limit. Defaults to the Schwab limit.
+    - burst: int: Chain requests allowed back to back before the rate limit applies.
+    '''
+    tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+    limiter = RateLimiter(rate, burst)
+
+    limiter.acquire()
+    try:
+        prices = engine.get_prices(tickers)
+        div_yields = engine.get_div_yields(tickers) # served from the quotes just fetched by the REST providers
+        quotes = {ticker: (prices[ticker], div_yields[ticker]) for ticker in tickers}
+    except Exception:
+        quotes = {} # an invalid ticker fails the whole batch, quote them one by one instead
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='watchlist')
+    try:
+        futures = [executor.submit(_load_chain, engine, ticker, limiter, quotes.get(ticker)) for ticker in tickers]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return
+
+
+def _load_chain(engine: MarketDataProvider, ticker: str, limiter: RateLimiter,
+                quote: Optional[tuple[float, float]] = None) -> dict:
+    '''
+    Load the chain of one ticker, and its (price, dividend yield) quote unless given. Any error is reported in the
+    result rather than raised, so one bad ticker does not stop the others.
+    '''
+    start = time.perf_counter()
+    result = {'ticker': ticker, 'chain': None, 'interest_rate': None, 'price': None, 'div_yield': None,
+              'seconds': None, 'error': None}
+    try:
+        limiter.acquire()
+        result['chain'], result['interest_rate'] = engine.get_option_chain(ticker)
+        if quote is None:
+            limiter.acquire()
+            quote = engine.get_price(ticker), engine.get_div_yield(ticker)
+        result['price'], result['div_yield'] = quote
+    except Exception as e:
+        result['chain'] = result['interest_rate'] = result['price'] = result['div_yield'] = None
+        result['error'] = str(e) or type(e).__name__
+    result['seconds'] = time.perf_counter() - start
+
+    return result
@@ -1 +1,11 @@
-from .payoff import *
+import importlib
+
+
+def __getattr__(name: str):
+    # vis.payoff needs PyQt5 and pyqtgraph, so its names are only imported when first used. The computational modules
+    # (vis.pricing, vis.strategy, vis.surface_cache, ...) can then be imported without a display, e.g. by batch.py.
+    payoff = importlib.import_module('.payoff', __name__)
+    try:
+        return getattr(payoff, name)
+    except AttributeError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
@@ -0,0 +1,113 @@
+import numpy as np
+
+from typing import Optional
+
+import pyqtgraph as pg
+from PyQt5 import QtCore, QtGui
+from PyQt5.QtCore import Qt
+
+from numpy.typing import NDArray
+
+
+class CellAnnotations(pg.GraphicsObject):
+    '''
+    A single graphics item that draws the value of every cell of a heatmap image in one paint pass.
+    Replaces one pg.TextItem per cell. Only cells inside the visible view are drawn, and no labels are drawn
+    when the cells are too small on screen to fit them (level of detail). New data is swapped in place with set_data,
+    without adding or removing scene items.
+
+    ### Parameters:
+    - color: str: Color of the text.
+    - font: QtGui.QFont: Font of the text. Defaults to the application font.
+
+    ### Methods:
+    - set_data: Set the matrix to annotate and the position of its first cell.
+    - clear: Remove the data, nothing is drawn.
+    '''
+    def __init__(self, color: str = 'black', font: Optional[QtGui.QFont] = None):
+        super().__init__()
+
+        self.pen = pg.mkPen(color)
+        self.font = font if font is not None else QtGui.QFont()
+        self.metrics = QtGui.QFontMetrics(self.font)
+
+        self.values = None
+        self.x0, self.y0 = 0.0, 0.0
+        self.widest = ''
+
+        return
+
+    def set_data(self, values: NDArray[np.float64], x0: float, y0: float) -> None:
+        '''
+        Set the matrix to annotate. Cell (i, j) spans [x0 + i, x0 + i + 1] x [y0 + j, y0 + j + 1], the same layout
+        as a pg.ImageItem positioned at (x0, y0).
+
+        ### Parameters:
+        - values: NDArray: 2D array of values, formatted with two decimals.
+        - x0: float: x coordinate of the first cell.
+        - y0: float: y coordinate of the first cell.
+        '''
+        self.prepareGeometryChange()
+
+        self.values = np.asarray(values)
+        self.x0, self.y0 = x0, y0
+
+        # widest label decides whether labels fit in a cell
+        self.widest = f"{-np.abs(self.values).max():.2f}" if self.values.size > 0 else ''
+
+        self.update()
+
+        return
+
+    def clear(self) -> None:
+        '''
+        Remove the data, nothing is drawn until set_data is called again.
+        '''
+        self.prepareGeometryChange()
+        self.values = None
+        self.update()
+
+        return
+
+    def boundingRect(self) -> QtCore.QRectF:
+        if self.values is None:
+            return QtCore.QRectF()
+        return QtCore.QRectF(self.x0, self.y0, self.values.shape[0], self.values.shape[1])
+
+    def paint(self, painter: QtGui.QPainter, option, widget=None) -> None:
+        if self.values is None or self.values.size == 0:
+            return
+
+        transform = painter.transform()
+
+        # size of one cell on screen, skip drawing when labels would not fit
+        cell = transform.mapRect(QtCore.QRectF(0, 0, 1, 1))
+        width, height = abs(cell.width()), abs(cell.height())
+        if width < self.metrics.horizontalAdvance(self.widest) + 4 or height < self.metrics.height():
+            return
+
+        # only draw the cells inside the view
+        n_x, n_y = self.values.shape
+        view = self.viewRect()
+        if view is None:
+            i0, i1, j0, j1 = 0, n_x, 0, n_y
+        else:
+            i0 = max(0, int(np.floor(view.left() - self.x0)))
+            i1 = min(n_x, int(np.ceil(view.right() - self.x0)))
+            j0 = max(0, int(np.floor(view.top() - self.y0)))
+            j1 = min(n_y, int(np.ceil(view.bottom() - self.y0)))
+
+        painter.save()
+        painter.resetTransform() # draw in screen pixels so text is not scaled with the view
+        painter.setFont(self.font)
+        painter.setPen(self.pen)
+
+        for i in range(i0, i1):
+            for j in range(j0, j1):
+                center = transform.map(QtCore.QPointF(self.x0 + i + 0.5, self.y0 + j + 0.5))
+                rect = QtCore.QRectF(center.x() - width / 2, center.y() - height / 2, width, height)
+                painter.drawText(rect, Qt.AlignCenter, f"{self.values[i, j]:.2f}")
+
+        painter.restore()
+
+        return
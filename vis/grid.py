@@ -0,0 +1,111 @@
+import numpy as np
+
+from typing import Iterable
+
+from numpy.typing import NDArray
+
+# Helpers for the high resolution heatmap. The surface is priced on an adaptive set of nodes that is dense where the
+# payoff has curvature (around strikes and close to expiry) and coarse elsewhere, then linearly interpolated onto
+# the uniform display grid.
+
+
+def adaptive_price_nodes(lower: float,
+                         upper: float,
+                         strikes: Iterable[float],
+                         num_nodes: int = 120,
+                         concentration: float = 8.0) -> NDArray[np.float64]:
+    '''
+    Get stock prices to price the surface at, concentrated around the strikes of the strategy. Nodes are drawn by
+    inverting the CDF of a density that is flat across the range plus a Gaussian bump around each strike, and
+    always include the range end points and every strike inside the range (where the expiry payoff has a kink).
+    Returns a sorted array of unique prices rounded to cents.
+
+    ### Parameters:
+    - lower: float: Lowest stock price of the range.
+    - upper: float: Highest stock price of the range.
+    - strikes: Iterable[float]: Strikes of the legs in the strategy.
+    - num_nodes: int: Approximate number of nodes to return.
+    - concentration: float: Height of the bump around each strike relative to the flat part of the density.
+    '''
+    strikes = np.asarray(list(strikes), dtype=np.float64)
+    width = (upper - lower) / 25
+
+    fine = np.linspace(lower, upper, 4096)
+    density = np.ones_like(fine)
+    for k in strikes:
+        density += concentration * np.exp(-0.5 * ((fine - k) / width) ** 2)
+
+    cdf = np.concatenate([[0], np.cumsum((density[1:] + density[:-1]) / 2)])
+    cdf /= cdf[-1]
+
+    nodes = np.interp(np.linspace(0, 1, num_nodes), cdf, fine)
+    in_range = strikes[(strikes >= lower) & (strikes <= upper)]
+
+    return np.unique(np.round(np.concatenate([nodes, in_range, [lower, upper]]), 2))
+
+
+def adaptive_date_nodes(dtes: NDArray[np.float64], num_nodes: int = 40, dense_days: int = 5) -> NDArray[np.int64]:
+    '''
+    Get the indices of the rows (dates) to price the surface at, concentrated close to expiry where time value
+    decays fastest. Every row within dense_days of expiry is included; further out, rows are picked so that the
+    time to expiration of the nodes grows quadratically. Always includes the first and last rows. Returns sorted indices.
+
+    ### Parameters:
+    - dtes: NDArray: Times to expiration in years of every row, in decreasing order.
+    - num_nodes: int: Approximate number of nodes to return.
+    - dense_days: int: Rows with fewer days than this to expiration are always included.
+    '''
+    dtes = np.asarray(dtes, dtype=np.float64)
+    if len(dtes) <= num_nodes:
+        return np.arange(len(dtes))
+
+    max_dte = dtes.max()
+    targets = max_dte * np.linspace(0, 1, num_nodes) ** 2
+
+    # dtes decrease with the row index, search on the reversed (increasing) array
+    ascending = dtes[::-1]
+    pos = np.clip(np.searchsorted(ascending, targets), 0, len(dtes) - 1)
+    rows = len(dtes) - 1 - pos
+
+    dense = np.flatnonzero(dtes * 365 <= dense_days)
+
+    return np.unique(np.concatenate([rows, dense, [0, len(dtes) - 1]]))
+
+
+def interp_matrix(x_nodes: NDArray[np.float64], x_new: NDArray[np.float64]) -> NDArray[np.float64]:
+    '''
+    Get the matrix of linear interpolation weights from x_nodes to x_new, of shape (len(x_new), len(x_nodes)), so that
+    interp_matrix(x_nodes, x_new) @ y equals np.interp(x_new, x_nodes, y). x_nodes can be in any order.
+    '''
+    x_nodes = np.asarray(x_nodes, dtype=np.float64)
+    x_new = np.asarray(x_new, dtype=np.float64)
+
+    order = np.argsort(x_nodes)
+    xs = x_nodes[order]
+
+    weights = np.zeros((len(x_new), len(x_nodes)))
+    if len(xs) == 1:
+        weights[:, 0] = 1
+        return weights
+
+    upper = np.clip(np.searchsorted(xs, x_new), 1, len(xs) - 1)
+    lower = upper - 1
+    frac = np.clip((x_new - xs[lower]) / (xs[upper] - xs[lower]), 0, 1)
+
+    rows = np.arange(len(x_new))
+    weights[rows, order[lower]] = 1 - frac
+    weights[rows, order[upper]] += frac
+
+    return weights
+
+
+def interpolate_surface(node_values: NDArray[np.float64],
+                        node_dtes: NDArray[np.float64],
+                        node_prices: NDArray[np.float64],
+                        dtes: NDArray[np.float64],
+                        prices: NDArray[np.float64]) -> NDArray[np.float64]:
+    '''
+    Bilinearly interpolate a surface priced on (node_dtes x node_prices) onto the (dtes x prices) display grid.
+    Returns an array of shape (len(dtes), len(prices)).
+    '''
+    return interp_matrix(node_dtes, dtes) @ node_values @ interp_matrix(node_prices, prices).T
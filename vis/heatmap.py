@@ -5,9 +5,11 @@ from datetime import datetime, timedelta
 from typing import Optional
 import random
 
-import matplotlib.pyplot as plt
-
-from optlib.gbs import american, black_scholes
+from vis.surface_cache import SurfaceCache, default_cache, default_greeks_cache
+from vis.pricing import GREEKS
+from vis.heatmap_worker import HeatmapJob
+from vis.grid import adaptive_price_nodes, adaptive_date_nodes, interpolate_surface
+from vis.annotations import CellAnnotations
 
 import PyQt5.QtWidgets as qtw
 import pyqtgraph as pg
@@ -16,7 +18,19 @@ from numpy.typing import NDArray
 
 
 class Heatmap(qtw.QWidget):
-    def __init__(self, options, expirations, interest_rate, div_yields, positions, stock_price, cost, demo=False):
+    # Grid sizes of the high resolution mode. The surface is priced on the adaptive nodes and interpolated
+    # onto the display grid, see vis.grid.
+    HIGH_RES_PRICES = 400
+    HIGH_RES_DATES = 250
+    HIGH_RES_PRICE_NODES = 120
+    HIGH_RES_DATE_NODES = 40
+
+    # Surfaces that can be shown, the Greeks are computed together with the value once one of them is selected
+    DISPLAYS = ['Value', 'Profit'] + [greek.capitalize() for greek in GREEKS[1:]]
+
+    def __init__(self, options, expirations, interest_rate, div_yields, positions, stock_price, cost, demo=False,
+                 cache: Optional[SurfaceCache] = None, greeks_cache: Optional[SurfaceCache] = None,
+                 vol_surface=None):
         '''
         Initialize the heatmap class. 
 
@@ -28,6 +42,11 @@ class Heatmap(qtw.QWidget):
         - positions: list[str]: List of positions (long/short).
         - stock_price: float: Current stock price.
         - cost: float: Cost of the option strategy.
+        - demo: bool: Whether the app is running on dummy data.
+        - cache: SurfaceCache: Cache of per-leg value surfaces. Defaults to the cache shared by all heatmaps.
+        - greeks_cache: SurfaceCache: Cache of per-leg value and Greeks surfaces. Defaults to the shared Greeks cache.
+        - vol_surface: VolSurface: Volatility surface of the underlying (vis.vol_surface). If given, every leg is
+        priced at the volatility of the surface at its strike and the time left on each date, instead of its quoted one.
 
         '''
         super().__init__()
@@ -41,9 +60,16 @@ class Heatmap(qtw.QWidget):
         self.s0 = stock_price
         self.cost = cost
         self.num_prices = 20
+        self.num_dates = 20
+        self.high_res = False
         self.demo = demo
+        self.cache = cache if cache is not None else default_cache
+        self.greeks_cache = greeks_cache if greeks_cache is not None else default_greeks_cache
+        self.vol_surface = vol_surface
 
-        self.value_toggle = True
+        # surface currently shown, one of DISPLAYS
+        self.display = 'Value'
+        self.greeks_enabled = False
         # controls how many stock prices are displayed on the heatmap
 
         # Default price range
@@ -65,6 +91,9 @@ class Heatmap(qtw.QWidget):
         self.__configure_plot(main_layout)
         right_layout = self.__configure_buttons(main_layout)
         self.__configure_controls(right_layout)
+
+        # Compute the surface off the event loop, the image is swapped in when ready
+        self.__start_job()
         
         return
 
@@ -76,8 +105,8 @@ class Heatmap(qtw.QWidget):
     
     def __configure_plot(self, layout: qtw.QHBoxLayout):
         '''
-        Configure the plot layout. Generates plot data using self.generate_data(). Sets zoom limits for the plot and 
-        adds annotations to the plot.
+        Configure the plot layout. Sets zoom limits for the plot and starts a background HeatmapJob to generate the
+        plot data. The image and annotations are added when the job finishes.
 
         ### Parameters:
         - layout: qtw.QHBoxLayout: Layout to add the plot to.
@@ -88,20 +117,21 @@ class Heatmap(qtw.QWidget):
         
         # Add a plot to the GraphicsLayoutWidget
         
-        # Generate sample data for the heatmap
-        self.value_matrix, self.profit_matrix = self.generate_data()
+        # Data is generated in the background, see self.__start_job()
+        self.value_matrix, self.profit_matrix = None, None
+        self.greek_matrices = {}
+        self.job = None
         
         # Create an ImageItem
         self.img_item = pg.ImageItem()
         
         self.plot = self.__label_plot(self.img_item) # adds labels to plot
         
-        # Initialize annotations
-        self.annotations = []
+        # Initialize annotations, a single overlay item drawing the value of every visible cell
+        self.annotations = CellAnnotations(color='black')
+        self.plot.addItem(self.annotations)
         
-        # Set the data for the heatmap
-        self.__set_plot_data(self.value_matrix) 
-
+        self.view_box = self.plot.getViewBox()
         self.set_zoom_limits()
 
         return
@@ -113,15 +143,10 @@ class Heatmap(qtw.QWidget):
         - img: pg.ImageItem: ImageItem to add to the plot.
         '''
         
-        xticks = [ (pos+0.5, date) for pos, date in zip(self.date_indices, self.date_range) ]
-        yticks = [ (pos, str(price)) for pos, price in enumerate(self.prices) ]
-
         # Create a custom AxisItem
         self.xaxis = pg.AxisItem('bottom')
-        self.xaxis.setTicks([xticks])
-
         self.yaxis = pg.AxisItem('left')
-        self.yaxis.setTicks([yticks])
+        self.__update_ticks()
 
         plot = self.graph_widget.addPlot(axisItems={'bottom': self.xaxis, 
                                                     'left': self.yaxis})
@@ -137,7 +162,8 @@ class Heatmap(qtw.QWidget):
 
     def __configure_buttons(self, layout: qtw.QHBoxLayout) -> qtw.QVBoxLayout:
         '''
-        Configure the buttons layout. Adds the profit button to toggle between value and profit. 
+        Configure the buttons layout. Adds the profit button to toggle between value and profit, and a selector
+        for the surface to show (value, profit or one of the Greeks). 
 
         ### Parameters:
         - layout: qtw.QHBoxLayout: Layout to add the buttons to.
@@ -150,6 +176,23 @@ class Heatmap(qtw.QWidget):
         profit_button.clicked.connect(self.profit_value_toggle)
         button_layout.addWidget(profit_button)
 
+        display_label = qtw.QLabel("Show:")
+        self.display_selector = qtw.QComboBox()
+        self.display_selector.addItems(self.DISPLAYS)
+        self.display_selector.currentTextChanged.connect(self.select_display)
+        button_layout.addWidget(display_label)
+        button_layout.addWidget(self.display_selector)
+
+        high_res_button = qtw.QPushButton("Toggle High Resolution")
+        high_res_button.clicked.connect(self.high_res_toggle)
+        button_layout.addWidget(high_res_button)
+
+        # Shows progress of the background computation
+        self.progress_bar = qtw.QProgressBar()
+        self.progress_bar.setFormat("Computing... %p%")
+        self.progress_bar.setVisible(False)
+        button_layout.addWidget(self.progress_bar)
+
         return button_layout
 
     def __configure_controls(self, layout: qtw.QVBoxLayout) -> None:
@@ -200,16 +243,11 @@ class Heatmap(qtw.QWidget):
         self.img_item.setLookupTable(cmap.getLookupTable(0.0, 1.0, data.size), update=True)
         self.img_item.setLevels([np.min(data), np.max(data)])
         
-        # Remove previous annotations if any
-        for text_item in self.annotations: 
-            self.plot.removeItem(text_item)
-        self.annotations.clear()
-
         self.img_item.setPos(self.x_min, self.y_min)
 
         self.view_box = self.plot.getViewBox()
 
-        # Add annotations to the heatmap
+        # Update annotations in place, labels are hidden while cells are too small to read them
         self.add_annotations()
 
         return
@@ -218,25 +256,132 @@ class Heatmap(qtw.QWidget):
         '''
         Update the plot with new data. Usually used if the user changes the stock range. 
         '''
-        self.value_matrix, self.profit_matrix = self.generate_data()
-        
-        # Set the data for the heatmap
-        if self.value_toggle:
-            self.__set_plot_data(self.value_matrix) 
+        self.__start_job()
+
+        return
+
+    def __start_job(self) -> None:
+        '''
+        Starts a HeatmapJob computing the data for the current price and date grids on the shared thread pool.
+        Cancels the previous job if it is still running. The plot is updated in self.__on_data_ready.
+        '''
+        if self.job is not None and not (self.job.done or self.job.cancelled):
+            # a job that finished or failed was already scheduled for deletion by its slot
+            self.job.cancel()
+            self.job.release()
+
+        self.dtes = self.get_dtes()
+
+        if self.high_res: # price on the adaptive nodes only, interpolated in self.__on_data_ready
+            node_dtes = self.dtes[adaptive_date_nodes(self.dtes, self.HIGH_RES_DATE_NODES)]
+            legs = self.get_legs(node_dtes)
+            node_prices = adaptive_price_nodes(min(self.prices), max(self.prices), [leg['k'] for leg in legs],
+                                               self.HIGH_RES_PRICE_NODES)
+        else:
+            node_prices, node_dtes = self.prices, self.dtes
+            legs = self.get_legs(node_dtes)
+
+        # the Greeks cache prices value and Greeks in the same pass
+        cache = self.greeks_cache if self.greeks_enabled else self.cache
+
+        self.job = HeatmapJob(legs, node_prices, node_dtes, self.r_f, cache, parent=self)
+        self.job.progress.connect(self.__on_progress)
+        self.job.finished.connect(self.__on_data_ready)
+        self.job.failed.connect(self.__on_job_failed)
+
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+
+        self.job.start()
+
+        return
+
+    def __on_progress(self, done: int, total: int) -> None:
+        '''
+        Slot to update the progress bar while a job is running.
+        '''
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(done)
+
+        return
+
+    def __on_data_ready(self, values: NDArray[np.float64]) -> None:
+        '''
+        Slot called when the running job finishes. Swaps the new data into the plot.
+        '''
+        if self.high_res:
+            values = interpolate_surface(values, self.job.dtes, self.job.prices, self.dtes, self.prices)
+        self.job.release() # done with its grids, do not keep it (and its arrays) attached to the heatmap
+
+        if values.ndim == 3: # value and Greeks stacked in the order of vis.pricing.GREEKS
+            self.greek_matrices = {greek.capitalize(): values[i] for i, greek in enumerate(GREEKS) if i > 0}
+            values = values[0]
         else:
-            self.__set_plot_data(self.profit_matrix)
+            self.greek_matrices = {}
+
+        self.value_matrix = values
+        self.profit_matrix = values - self.cost
+        self.progress_bar.setVisible(False)
+
+        self.__update_ticks()
+        self.__update_limits()
+
+        # Set the data for the heatmap
+        self.__set_plot_data(self.__current_data())
+
+        return
+
+    def __current_data(self) -> NDArray[np.float64]:
+        '''
+        Returns the matrix of the surface currently selected in self.display.
+        '''
+        if self.display == 'Value':
+            return self.value_matrix
+        elif self.display == 'Profit':
+            return self.profit_matrix
+        return self.greek_matrices[self.display]
+
+    def __on_job_failed(self, message: str) -> None:
+        '''
+        Slot called if the running job fails.
+        '''
+        self.job.release()
+        self.progress_bar.setVisible(False)
+        qtw.QMessageBox.warning(self, "Heatmap Error", f"Could not compute the heatmap: {message}")
 
         return
 
-    def __update_yticks(self) -> None:
+    def __update_ticks(self, max_ticks: int = 20) -> None:
         '''
-        Update the y-axis (stock prices) ticks.
+        Update the x-axis (dates) and y-axis (stock prices) ticks. Shows at most max_ticks labels per axis.
         '''
-        yticks = [ (pos, str(price)) for pos, price in enumerate(self.prices) ]
+        xstep = int(np.ceil(len(self.date_range) / max_ticks))
+        ystep = int(np.ceil(len(self.prices) / max_ticks))
+
+        xticks = [ (pos+0.5, date) for pos, date in zip(self.date_indices, self.date_range) ][::xstep]
+        yticks = [ (pos, str(price)) for pos, price in enumerate(self.prices) ][::ystep]
+
+        self.xaxis.setTicks([xticks])
         self.yaxis.setTicks([yticks])
 
         return
 
+    def __update_limits(self) -> None:
+        '''
+        Update the zoom limits if the number of dates or prices changed, e.g. after toggling high resolution.
+        '''
+        x_min, x_max = min(self.date_indices), max(self.date_indices) + 1
+        y_min, y_max = min(self.price_indices)-0.5, max(self.price_indices)+0.5
+
+        if (x_min, x_max, y_min, y_max) == (self.x_min, self.x_max, self.y_min, self.y_max):
+            return
+
+        self.x_min, self.x_max, self.y_min, self.y_max = x_min, x_max, y_min, y_max
+        self.view_box.setLimits(xMin=self.x_min, xMax=self.x_max, yMin=self.y_min, yMax=self.y_max)
+        self.view_box.setRange(xRange=(self.x_min, self.x_max), yRange=(self.y_min, self.y_max))
+
+        return
+
 
     ##############################
     ####### Data Functions #######
@@ -254,7 +399,7 @@ class Heatmap(qtw.QWidget):
     
     def generate_dates(self) -> tuple[list, list]:
         '''
-        Get a range of dates, limited to 20 dates equally spaced apart. Also gets the indices of the dates.
+        Get a range of dates, limited to self.num_dates dates equally spaced apart. Also gets the indices of the dates.
         '''
         # date_range = []
         # exp = max(self.expirations)
@@ -274,14 +419,14 @@ class Heatmap(qtw.QWidget):
         else:
             today = datetime.today().date()
 
-        if exp <= 19:
-            # If the range is 20 days or fewer, include every date
+        if exp <= self.num_dates - 1:
+            # If the range is num_dates days or fewer, include every date
             for i in range(0, exp + 1):
                 current_date = today + timedelta(days=i)
                 date_range.append(current_date.strftime('%Y-%m-%d'))
         else:
-            # If the range exceeds 20 days, select 20 equally spaced dates
-            num_dates = 20  
+            # If the range exceeds num_dates days, select num_dates equally spaced dates
+            num_dates = self.num_dates
             step = exp / (num_dates - 1)  
 
             indices = [int(round(i * step)) for i in range(num_dates)]
@@ -311,76 +456,76 @@ class Heatmap(qtw.QWidget):
     def generate_data(self) -> tuple[NDArray[np.array], NDArray[np.array]]:
         '''
         Generates data for heatmap using attributes of the class. Calculates value using Bjerksund-Stensland model. Returns
-        a tuple of the value matrix and profit matrix, both 2D numpy arrays.
+        a tuple of the value matrix and profit matrix, both 2D numpy arrays. Each leg is priced over the whole
+        (date x price) grid in one batched call to vis.pricing.option_surface, which matches optlib.gbs.american
+        to within vis.pricing.AMERICAN_TOLERANCE. Leg surfaces go through self.cache, so only stock prices that
+        have not been priced before for the same leg and date grid are computed.
         '''
 
         values = np.zeros((len(self.date_range), len(self.prices)))
+        dtes = self.get_dtes()
 
-        exp = datetime.strptime(max(self.date_range), '%Y-%m-%d').replace(hour=16, minute=0, second=0) # set time to 4pm for market close
+        for leg in self.get_legs(dtes):
+            # if T = 0 or if time has expired, the surface takes intrinsic value
+            leg_values = self.cache.get_surface(leg['opt_type'], self.prices, dtes, leg['k'], self.r_f, leg['q'],
+                                                leg['iv'], contract=leg['contract'])
 
-        for option, div_yield, position in zip(self.options, self.div_yields, self.positions):
-            opt_type = option['Description'][-1].lower()
-
-            k = option['Strike']
-            iv = option['Volatility']/100 if option['Volatility'] < 200 else 2
-
-            for i, date in enumerate(self.date_range):
-                if i == 0:
-                    if self.demo:
-                        dt = datetime(2024, 11, 22)
-                    else:   
-                        dt = datetime.today()
-                else:
-                    dt = datetime.strptime(date, '%Y-%m-%d').replace(hour=16, minute=0, second=0) # set time to 4pm for market close
-                dte = (exp - dt).total_seconds()/(365*86400)
-                for j, price in enumerate(self.prices):
-                    if dte > 0.001:
-                        val = american(opt_type,
-                                            price, 
-                                            k, 
-                                            dte,
-                                            self.r_f,
-                                            div_yield, 
-                                            iv)[0] # use option pricing library to get American option value
-                    else: # if T = 0 or if time has expired, we just take intrinsic value
-                        if opt_type == 'c':
-                            val = max(price - k, 0)
-                        else:
-                            val = max(k - price, 0)
-                    if position == 'long':
-                        values[i, j] += (val * 100)  # 100 shares per contract
-                    elif position == 'short':
-                        values[i, j] -= (val * 100)
+            values += leg['sign'] * (leg_values * 100)  # 100 shares per contract
 
         profit = values - self.cost
         return values, profit
 
+    def get_legs(self, dtes: NDArray[np.float64]) -> list[dict]:
+        '''
+        Get the pricing inputs of each leg of the strategy. Returns a list of dictionaries with the option type ('c'/'p'),
+        strike, implied volatility, dividend yield, contract name and sign (1 for long, -1 for short, 0 otherwise).
+        With a volatility surface, the implied volatility is an array with one value per date of dtes.
+
+        ### Parameters:
+        - dtes: NDArray: Times to expiration in years of the dates the legs are priced on.
+        '''
+        # volatilities of whole days, so the legs keep their cache key through the day like the date grid
+        days = np.round(np.asarray(dtes) * 365) / 365
+
+        legs = []
+        for option, div_yield, position in zip(self.options, self.div_yields, self.positions):
+            legs.append({
+                'opt_type': option['Description'][-1].lower(),
+                'k': option['Strike'],
+                'iv': (self.vol_surface.iv(option['Strike'], days) if self.vol_surface is not None else
+                       option['Volatility']/100 if option['Volatility'] < 200 else 2),
+                'q': div_yield,
+                'contract': option.get('Contract Name'),
+                'sign': {'long': 1, 'short': -1}.get(position, 0)
+            })
+
+        return legs
+
+    def get_dtes(self) -> NDArray[np.float64]:
+        '''
+        Get the time to expiration (in years) of the longest dated leg for each date in self.date_range.
+        '''
+        exp = datetime.strptime(max(self.date_range), '%Y-%m-%d').replace(hour=16, minute=0, second=0) # set time to 4pm for market close
+
+        dtes = np.zeros(len(self.date_range))
+        for i, date in enumerate(self.date_range):
+            if i == 0:
+                if self.demo:
+                    dt = datetime(2024, 11, 22)
+                else:   
+                    dt = datetime.today()
+            else:
+                dt = datetime.strptime(date, '%Y-%m-%d').replace(hour=16, minute=0, second=0) # set time to 4pm for market close
+            dtes[i] = (exp - dt).total_seconds()/(365*86400)
+
+        return dtes
+
     def add_annotations(self) -> None:
         """
-        Adds text annotations to each cell of the heatmap.
+        Adds text annotations to each cell of the heatmap. Swaps the current value or profit matrix into the
+        annotation overlay, which only draws the cells that are visible and large enough to fit a label.
         """
-        for i in self.date_indices:
-            for j in self.price_indices:
-                # Calculate the center position of each cell
-                # x = self.x_min + (j + 0.5) * (self.x_max - self.x_min) / len(self.prices)
-                # y = self.y_min + (i + 0.5) * (self.y_max - self.y_min) / len(self.date_range)
-                
-                # Retrieve the value to annotate
-                if self.value_toggle:
-                    value = self.value_matrix[i, j]
-                else:
-                    value = self.profit_matrix[i, j]
-
-                formatted_value = f"{value:.2f}"
-                
-                # Create a TextItem
-                text = pg.TextItem(text=formatted_value, anchor=(0.5, 0.5), color='black', border=None)
-                
-                # Set position and add
-                text.setPos(i+0.5, j)
-                self.plot.addItem(text)
-
-                self.annotations.append(text) # keep track of annotations
+        self.annotations.set_data(self.__current_data(), self.x_min, self.y_min)
 
         return
 
@@ -467,12 +612,53 @@ class Heatmap(qtw.QWidget):
         '''
         Toggle between profit and value.
         '''
-        if self.value_toggle:
-            self.value_toggle = False
-            self.__set_plot_data(self.profit_matrix)
+        self.display_selector.setCurrentText('Profit' if self.display == 'Value' else 'Value') # calls select_display
+
+    def select_display(self, display: str) -> None:
+        '''
+        Show the given surface, one of DISPLAYS. The first time a Greek is selected, value and Greeks are recomputed
+        together for the current grid, and kept up to date on later range changes.
+
+        ### Parameters:
+        - display: str: Name of the surface to show.
+        '''
+        self.display = display
+        self.plot.setTitle(f"Option Strategy {display} Over Time")
+
+        if display not in ('Value', 'Profit') and display not in self.greek_matrices:
+            if not self.greeks_enabled:
+                self.greeks_enabled = True
+                self.__update_plot()
+            return # shown once the data is ready
+
+        if self.value_matrix is None: # still computing, the selection is applied when the data is ready
+            return
+
+        self.__set_plot_data(self.__current_data())
+
+        return
+
+    
+    def high_res_toggle(self) -> None:
+        '''
+        Toggle between the default 20 x 20 grid and the high resolution grid. In high resolution, the surface is priced
+        on adaptive nodes concentrated around the strikes and close to expiry, then interpolated onto the display grid.
+        '''
+        self.high_res = not self.high_res
+
+        if self.high_res:
+            self.num_prices, self.num_dates = self.HIGH_RES_PRICES, self.HIGH_RES_DATES
         else:
-            self.value_toggle = True
-            self.__set_plot_data(self.value_matrix)
+            self.num_prices, self.num_dates = 20, 20
+
+        self.prices, self.price_indices = self.get_price_range(min(self.prices), 
+                                                            max(self.prices), 
+                                                            self.num_prices)
+        self.date_range, self.date_indices = self.generate_dates()
+
+        self.__update_plot() # ticks and limits are updated once the new data is ready
+
+        return
 
     
     def update_y_range(self) -> None:
@@ -496,8 +682,7 @@ class Heatmap(qtw.QWidget):
                                                                 new_max, 
                                                                 self.num_prices)
 
-            self.__update_plot()
-            self.__update_yticks()
+            self.__update_plot() # y-ticks are updated once the new data is ready
 
         return
 
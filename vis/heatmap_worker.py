@@ -0,0 +1,219 @@
+import os
+import threading
+import numpy as np
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from PyQt5 import QtCore
+
+from numpy.typing import NDArray
+
+from vis.surface_cache import SurfaceCache
+
+_executor = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    '''
+    Returns the thread pool shared by all heatmap jobs, creating it on first use with one worker per core.
+    NumPy releases the GIL inside the pricing kernel, so row chunks priced on different threads run in parallel.
+    '''
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='heatmap')
+    return _executor
+
+
+class HeatmapJob(QtCore.QObject):
+    '''
+    Computes the value surface of an option strategy on the shared thread pool, off the Qt event loop.
+    Only price columns missing from the cache are priced; the rows (dates) of every missing block are split
+    into chunks so they are priced across all cores. Signals are delivered on the GUI thread.
+
+    ### Parameters:
+    - legs: list[dict]: Legs of the strategy, as returned by Heatmap.get_legs.
+    - prices: NDArray: Stock prices (columns of the surface).
+    - dtes: NDArray: Times to expiration in years (rows of the surface).
+    - r_f: float: Risk-free interest rate.
+    - cache: SurfaceCache: Cache of per-leg surfaces, its pricer prices the missing columns. Read and written
+    only on the GUI thread.
+
+    ### Signals:
+    - progress(int, int): Number of finished chunks and total number of chunks.
+    - finished(object): The strategy surface of shape (..., len(dtes), len(prices)), in dollars. The leading
+    dimensions depend on the pricer of the cache, e.g. (len(GREEKS), ...) for vis.pricing.option_greeks_surface.
+    - failed(str): Error message if pricing failed.
+
+    ### Methods:
+    - start: Submit the job to the thread pool.
+    - cancel: Cancel the job. Pending chunks are dropped and no further signals are emitted.
+    - release: Delete the job once none of its chunks can report back anymore.
+    '''
+    progress = QtCore.pyqtSignal(int, int)
+    finished = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal(str)
+
+    # emitted from worker threads, queued to the GUI thread
+    _chunk_done = QtCore.pyqtSignal(object)
+
+    def __init__(self, legs: list[dict], prices: NDArray[np.float64], dtes: NDArray[np.float64], r_f: float,
+                 cache: SurfaceCache, parent: Optional[QtCore.QObject] = None):
+        super().__init__(parent)
+
+        self.legs = legs
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.dtes = np.asarray(dtes, dtype=np.float64)
+        self.r_f = r_f
+        self.cache = cache
+
+        self.cancelled = False
+        self.done = False
+
+        self._futures = []
+        self._running = 0 # chunks whose done callback has not finished yet
+        self._released = False
+        self._lock = threading.Lock()
+        self._blocks = {} # leg index -> [missing prices, values being filled, allocated on the first chunk]
+        self._finished_chunks = 0
+
+        self._chunk_done.connect(self.__on_chunk_done, QtCore.Qt.QueuedConnection)
+
+        return
+
+    def start(self) -> None:
+        '''
+        Looks up every leg in the cache and submits the missing blocks, split by rows, to the thread pool.
+        Emits finished straight away if everything is cached.
+        '''
+        n_chunks = max(1, min(len(self.dtes), 2 * (os.cpu_count() or 1)))
+        row_chunks = [rows for rows in np.array_split(np.arange(len(self.dtes)), n_chunks) if rows.size > 0]
+
+        tasks = []
+        keys = set()
+        for i, leg in enumerate(self.legs):
+            key = self.__key(leg)
+            if key in keys: # the same contract twice (e.g. bought twice) is priced once
+                continue
+            keys.add(key)
+            missing = self.cache.missing(key, self.prices)
+            if missing.size == 0:
+                continue
+            self._blocks[i] = [missing, None]
+            tasks.extend((i, rows) for rows in row_chunks)
+
+        self._total_chunks = len(tasks)
+        if not tasks:
+            self.__finish()
+            return
+
+        self._running = len(tasks)
+        executor = get_executor()
+        for i, rows in tasks:
+            future = executor.submit(self.__price_chunk, i, rows)
+            future.add_done_callback(self.__on_future_done)
+            self._futures.append(future)
+
+        return
+
+    def cancel(self) -> None:
+        '''
+        Cancels the job. Chunks that have not started are removed from the pool, running chunks are discarded.
+        '''
+        self.cancelled = True
+        for future in self._futures:
+            future.cancel()
+
+        return
+
+    def release(self) -> None:
+        '''
+        Schedules the job for deletion. Chunks still running report back from the thread pool, so the job is only
+        deleted once the last of them has, otherwise they would emit on a deleted object. Call it once.
+        '''
+        with self._lock:
+            self._released = True
+            idle = self._running == 0
+        if idle:
+            self.deleteLater()
+
+        return
+
+    def __on_future_done(self, future: Future) -> None:
+        '''
+        Done callback of every chunk, runs on a worker thread (or on the GUI thread for a chunk cancelled before it
+        started). Queues the chunk to the GUI thread, then deletes the job if it was released and this was the last one.
+        '''
+        self._chunk_done.emit(future)
+        with self._lock:
+            self._running -= 1
+            delete = self._released and self._running == 0
+        if delete:
+            self.deleteLater()
+
+        return
+
+    def __key(self, leg: dict) -> tuple:
+        return self.cache.make_key(leg['opt_type'], self.dtes, leg['k'], self.r_f, leg['q'], leg['iv'],
+                                   leg['contract'])
+
+    def __price_chunk(self, i: int, rows: NDArray[np.int64]) -> tuple:
+        '''
+        Runs on a worker thread. Prices the missing columns of leg i for the given rows.
+        '''
+        if self.cancelled:
+            return i, rows, None
+
+        leg = self.legs[i]
+        missing = self._blocks[i][0]
+        iv = leg['iv'] if np.ndim(leg['iv']) == 0 else leg['iv'][rows] # one volatility per row with a VolSurface
+        values = self.cache.pricer(leg['opt_type'], missing, self.dtes[rows], leg['k'], self.r_f, leg['q'], iv)
+
+        return i, rows, values
+
+    def __on_chunk_done(self, future: Future) -> None:
+        '''
+        Runs on the GUI thread whenever a chunk finishes.
+        '''
+        if self.cancelled or self.done or future.cancelled():
+            return
+
+        if future.exception() is not None:
+            self.cancel()
+            self.failed.emit(str(future.exception()))
+            return
+
+        i, rows, values = future.result()
+        if self._blocks[i][1] is None:
+            self._blocks[i][1] = np.empty(values.shape[:-2] + (len(self.dtes), values.shape[-1]))
+        self._blocks[i][1][..., rows, :] = values
+
+        self._finished_chunks += 1
+        self.progress.emit(self._finished_chunks, self._total_chunks)
+
+        if self._finished_chunks == self._total_chunks:
+            for j, (missing, block) in self._blocks.items():
+                self.cache.insert(self.__key(self.legs[j]), missing, block, requested=self.prices)
+            self.__finish()
+
+        return
+
+    def __finish(self) -> None:
+        '''
+        Sums the cached leg surfaces into the strategy value matrix and emits finished.
+        '''
+        values = np.zeros((len(self.dtes), len(self.prices)))
+
+        for leg in self.legs:
+            key = self.__key(leg)
+            try:
+                leg_values = self.cache.lookup(key, self.prices)
+            except KeyError: # evicted by another heatmap while this job was running
+                leg_values = self.cache.get_surface(leg['opt_type'], self.prices, self.dtes, leg['k'], self.r_f,
+                                                    leg['q'], leg['iv'], leg['contract'])
+            values = values + leg['sign'] * leg_values * 100 # 100 shares per contract
+
+        self.done = True
+        self.finished.emit(values)
+
+        return
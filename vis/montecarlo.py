@@ -0,0 +1,172 @@
+import os
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
+
+from numpy.typing import NDArray
+
+from vis.strategy import StrategyPayoff
+
+CHUNK_PATHS = 1 << 18 # prices simulated per batch (paths x steps), bounds the memory of the normals and prices
+PNL_BINS = 1 << 18 # bins of the P&L histogram the percentiles are read from
+PNL_RANGE_SIGMAS = 9.0 # the histogram covers the P&L of stock prices within this many standard deviations
+
+
+def terminal_prices(s0: float, t: float, r: float, q: float, iv: float, n_paths: int,
+                    rng: np.random.Generator) -> NDArray[np.float64]:
+    '''
+    Simulate stock prices at time t under geometric Brownian motion with the risk-neutral drift r - q.
+
+    ### Parameters:
+    - s0: float: Current stock price.
+    - t: float: Time in years.
+    - r: float: Risk-free interest rate.
+    - q: float: Dividend yield.
+    - iv: float: Volatility.
+    - n_paths: int: Number of prices to simulate.
+    - rng: np.random.Generator: Random number generator.
+    '''
+    z = rng.standard_normal(n_paths)
+
+    return s0 * np.exp((r - q - 0.5 * iv ** 2) * t + iv * np.sqrt(t) * z)
+
+
+def price_paths(s0: float, t: float, r: float, q: float, iv: float, n_paths: int, steps: int,
+                rng: np.random.Generator) -> NDArray[np.float64]:
+    '''
+    Simulate stock price paths with steps equal time steps up to time t, same model as terminal_prices.
+    Returns an array of shape (n_paths, steps); the last column holds the prices at time t.
+    '''
+    dt = t / steps
+    increments = (r - q - 0.5 * iv ** 2) * dt + iv * np.sqrt(dt) * rng.standard_normal((n_paths, steps))
+
+    return s0 * np.exp(np.cumsum(increments, axis=1))
+
+
+def simulate_strategy(strategy: StrategyPayoff,
+                      s0: float,
+                      t: float,
+                      r: float,
+                      q: float,
+                      iv: float,
+                      n_paths: int = 1_000_000,
+                      steps: int = 1,
+                      seed: Optional[int] = None,
+                      workers: Optional[int] = 1,
+                      chunk_paths: int = CHUNK_PATHS,
+                      percentiles: Iterable[float] = (5, 25, 50, 75, 95)) -> dict:
+    '''
+    Monte Carlo probability metrics of an options strategy held to expiry. Simulates the stock price at expiry and
+    evaluates the exact expiry payoff of the strategy on every path, in batches of chunk_paths // steps paths, so
+    memory does not grow with n_paths or steps. Paths are not kept: each batch adds to running sums and to a
+    histogram of PNL_BINS bins over the range the P&L can take within PNL_RANGE_SIGMAS standard deviations of the
+    stock price (the payoff is piecewise linear, so its extremes there are at the ends or the strikes). Percentiles
+    are interpolated from the histogram, exact to within a bin width; the rare paths beyond the range are counted
+    in the end bins.
+
+    Batches draw from independent streams spawned from seed, so results only depend on seed, n_paths and chunk_paths,
+    not on the number of workers. NumPy releases the GIL while generating and transforming the batches, so batches
+    run in parallel on a thread pool when workers > 1.
+
+    Returns a dict with:
+    - pop: Probability of profit (P&L > 0 at expiry).
+    - expected_pnl: Mean P&L at expiry, in dollars.
+    - std_error: Standard error of expected_pnl.
+    - percentiles: dict of percentile -> P&L at expiry.
+    - n_paths: Number of simulated paths.
+    - touch: Only if steps > 1, dict of break-even price -> probability that the stock reaches it before expiry.
+
+    ### Parameters:
+    - strategy: StrategyPayoff: Legs of the strategy.
+    - s0: float: Current stock price.
+    - t: float: Time to expiration in years.
+    - r: float: Risk-free interest rate.
+    - q: float: Dividend yield.
+    - iv: float: Volatility of the underlying, e.g. the implied volatility of the chain.
+    - n_paths: int: Number of simulated paths.
+    - steps: int: Number of time steps per path. 1 only simulates the price at expiry.
+    - seed: int: Seed of the random number generator. None for a random seed.
+    - workers: int: Number of threads. None for one per core.
+    - chunk_paths: int: Number of simulated prices (paths x steps) per batch.
+    - percentiles: Iterable[float]: Percentiles of the P&L to report.
+    '''
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    batch = max(chunk_paths // steps, 1)
+    sizes = [min(batch, n_paths - start) for start in range(0, n_paths, batch)]
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
+    break_evens = strategy.break_evens() if steps > 1 else np.array([])
+
+    # P&L range of the histogram: the payoff at the ends of the price range and at the strikes in between
+    spread = PNL_RANGE_SIGMAS * iv * np.sqrt(t)
+    drift = (r - q - 0.5 * iv ** 2) * t
+    _, extremes = strategy.vertices(s0 * np.exp(drift - spread), s0 * np.exp(drift + spread))
+    pnl_low, pnl_high = float(extremes.min()), float(extremes.max())
+    bin_width = (pnl_high - pnl_low) / PNL_BINS
+
+    def run(i: int) -> tuple:
+        rng = np.random.default_rng(streams[i])
+        if steps > 1:
+            paths = price_paths(s0, t, r, q, iv, sizes[i], steps, rng)
+            final = paths[:, -1]
+            # a level is reached if it lies between the lowest and highest price of the path (or the start)
+            low = np.minimum(paths.min(axis=1), s0)[:, None]
+            high = np.maximum(paths.max(axis=1), s0)[:, None]
+            touched = np.sum((low <= break_evens) & (break_evens <= high), axis=0)
+        else:
+            final = terminal_prices(s0, t, r, q, iv, sizes[i], rng)
+            touched = None
+
+        pnl = strategy.evaluate(final)
+        if bin_width > 0:
+            bins = np.clip(((pnl - pnl_low) / bin_width).astype(np.int64), 0, PNL_BINS - 1)
+            histogram = np.bincount(bins, minlength=PNL_BINS)
+        else:
+            histogram = None # the P&L is the same on every path
+
+        return histogram, np.sum(pnl > 0), pnl.sum(), np.square(pnl).sum(), touched
+
+    if workers > 1 and len(sizes) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run, range(len(sizes))))
+    else:
+        results = [run(i) for i in range(len(sizes))]
+
+    n_profit = sum(result[1] for result in results)
+    total = sum(result[2] for result in results)
+    total_sq = sum(result[3] for result in results)
+
+    mean = total / n_paths
+    variance = max(total_sq / n_paths - mean ** 2, 0)
+    percentiles = list(percentiles)
+
+    metrics = {
+        'pop': n_profit / n_paths,
+        'expected_pnl': mean,
+        'std_error': np.sqrt(variance / n_paths),
+        'percentiles': dict(zip(percentiles, _histogram_percentiles(results, percentiles, pnl_low, bin_width))),
+        'n_paths': n_paths,
+    }
+    if steps > 1:
+        touched = sum(result[4] for result in results)
+        metrics['touch'] = dict(zip(break_evens.tolist(), (touched / n_paths).tolist()))
+
+    return metrics
+
+
+def _histogram_percentiles(results: list[tuple], percentiles: list[float], low: float, width: float) -> list[float]:
+    '''
+    Percentiles of the P&L from the histograms of the batches, interpolated linearly within a bin.
+    '''
+    if width == 0:
+        return [low] * len(percentiles)
+
+    counts = sum(result[0] for result in results)
+    cumulative = np.cumsum(counts)
+    targets = np.asarray(percentiles, dtype=np.float64) / 100 * cumulative[-1]
+
+    bins = np.minimum(np.searchsorted(cumulative, targets), PNL_BINS - 1)
+    before = np.where(bins > 0, cumulative[bins - 1], 0)
+    fraction = np.clip((targets - before) / np.maximum(counts[bins], 1), 0, 1)
+
+    return (low + (bins + fraction) * width).tolist()
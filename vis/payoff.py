@@ -1,7 +1,5 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -10,6 +8,8 @@ from PyQt5 import QtWidgets as qtw
 
 from typing import Union
 
+from vis.strategy import StrategyPayoff
+
 def convert_dates(dates: list) -> list:
     '''
     Converts a list of dates from the format 'Month Day, Year' to 'YYYY-MM-DD'.
@@ -62,6 +62,7 @@ def get_stock_prices(s0,K):
     return np.linspace(lower, upper, num=1000).round(2)
 
 def plot_payoff(stock_series, payoff_series):
+    import matplotlib.pyplot as plt # only this static figure uses matplotlib, keep it off the startup path
 
     fig, ax = plt.subplots(figsize=(10, 6))
     colors = ['green' if profit >= 0 else 'red' for profit in payoff_series]
@@ -92,12 +93,14 @@ class OptionPayoffPlot(qtw.QWidget):
     - add_vline: Add a vertical line to the plot
     - remove_vlines: Remove all vertical lines from the plot
     - add_option: Add an option to the plot
+    - remove_option: Remove an option from the plot
     - reset_data: Reset the plot to empty
     - update_traces: Update the plot with the current data. Designed to be called after add_option.
 
     ### Attributes:
-    - xdata: array of x-axis (stock price) data
-    - ydata: array of y-axis (option value) data
+    - strategy: StrategyPayoff with the legs of the strategy on one shared price grid
+    - xdata: array of x-axis (stock price) data, the grid of the strategy
+    - ydata: array of y-axis (option value) data, the payoff of the strategy
     - plot_widget: PyQtGraph PlotWidget object
     - positive_curve: PyQtGraph curve for positive profits
     - negative_curve: PyQtGraph curve for negative profits
@@ -109,8 +112,7 @@ class OptionPayoffPlot(qtw.QWidget):
     def __init__(self):
         super().__init__()
 
-        self.xdata = np.array([])
-        self.ydata = np.array([])
+        self.strategy = StrategyPayoff()
 
         # Create a vertical layout
         layout = qtw.QVBoxLayout()
@@ -262,55 +264,61 @@ class OptionPayoffPlot(qtw.QWidget):
         
         return
 
-    def add_option(self, option: dict, opt_type:str, buy: bool, s0: float) -> None:
+    @property
+    def xdata(self) -> np.ndarray:
+        return self.strategy.prices
+
+    @property
+    def ydata(self) -> np.ndarray:
+        return self.strategy.payoff
+
+    def add_option(self, option: dict, opt_type:str, buy: bool, s0: float) -> int:
         '''
-        Adds an option's payoff to the plot
+        Adds an option's payoff to the plot. Returns the id of the leg, to remove it with remove_option.
         '''
-
-        self.xdata = get_stock_prices(s0, option['Strike'])
         self.s0 = s0
 
-        if opt_type == 'call':
-            if buy:
-                payoff_series = long_call(self.xdata, option['Strike'], option['Ask'])
-                label = 'Long Call'
-            else:
-                payoff_series = short_call(self.xdata, option['Strike'], option['Ask'])
-                label = 'Short Call'
-        elif opt_type == 'put':
-            if buy:
-                payoff_series = long_put(self.xdata, option['Strike'], option['Ask'])
-                label = 'Long Put'
-            else:
-                payoff_series = short_put(self.xdata, option['Strike'], option['Ask'])
-                label = 'Short Put'
-
-        if self.ydata.size > 0:
-            self.ydata += payoff_series
-        else:
-            self.ydata = payoff_series
+        leg_id = self.strategy.add_leg(opt_type, option['Strike'], option['Ask'], buy, s0)
 
         self.update_traces()
         self.__set_plot_range(self.view_box, s0)
         
-        return 
+        return leg_id
+
+    def remove_option(self, leg_id: int) -> None:
+        '''
+        Removes an option's payoff from the plot.
+        '''
+        self.strategy.remove_leg(leg_id)
+
+        if len(self.strategy) == 0:
+            self.reset_data()
+        else:
+            self.update_traces()
+
+        return
     
     def update_traces(self):
         '''
-        Splits the data into positive and negative segments and updates the Plotly traces.
+        Updates the curves with the exact vertices of the strategy payoff, split into positive and negative parts at the
+        break-even points. Draws a handful of points instead of the whole price grid.
         '''
-        pos_mask = self.ydata >= 0
-        neg_mask = self.ydata < 0
-        
-        pos_x = self.xdata[pos_mask]
-        pos_y = self.ydata[pos_mask]
-        
-        neg_x = self.xdata[neg_mask]
-        neg_y = self.ydata[neg_mask]
+        x, y = self.strategy.vertices()
+
+        # add the break-evens so each segment is entirely on one side of zero
+        break_evens = self.strategy.break_evens()
+        break_evens = break_evens[(break_evens > x[0]) & (break_evens < x[-1])]
+        order = np.argsort(np.concatenate([x, break_evens]), kind='stable')
+        x = np.concatenate([x, break_evens])[order]
+        y = np.concatenate([y, np.zeros_like(break_evens)])[order]
+
+        # NaN breaks the line, so each curve only connects its own segments
+        pos_y = np.where(y >= 0, y, np.nan)
+        neg_y = np.where(y <= 0, y, np.nan)
         
         # Update the curves
-        self.positive_curve.setData(pos_x, pos_y)
-        self.negative_curve.setData(neg_x, neg_y)
+        self.positive_curve.setData(x, pos_y, connect='finite')
+        self.negative_curve.setData(x, neg_y, connect='finite')
 
         return 
     
@@ -318,8 +326,7 @@ class OptionPayoffPlot(qtw.QWidget):
         '''
         Reset the x and y data arrays to empty.
         '''
-        self.xdata = np.array([])
-        self.ydata = np.array([])
+        self.strategy.clear()
 
         # self.fig.update_traces(x=[], y=[], selector=dict(name='Profit >= 0'))
         # self.fig.update_traces(x=[], y=[], selector=dict(name='Profit < 0'))
@@ -0,0 +1,326 @@
+import numpy as np
+from scipy.special import ndtr
+
+from typing import Union
+
+from numpy.typing import NDArray
+
+# Vectorized port of the Bjerksund-Stensland (2002) American option model used by optlib.gbs.american.
+# Every function broadcasts over NumPy arrays, so a whole (date x price) grid is priced in one call.
+# Values agree with the scalar optlib.gbs.american output to within AMERICAN_TOLERANCE (absolute, per share).
+
+AMERICAN_TOLERANCE = 1e-8
+
+# maximum number of grid cells priced per batch, bounds the temporaries created by the bivariate normal quadrature
+CHUNK_CELLS = 1 << 16
+
+# Gauss-Legendre nodes and weights (10 point rule) used by Genz's bivariate normal algorithm
+_GL_X = np.array([-0.9931285991850949, -0.9639719272779138, -0.9122344282513259, -0.8391169718222188,
+                  -0.7463319064601508, -0.6360536807265150, -0.5108670019508271, -0.3737060887154196,
+                  -0.2277858511416451, -0.0765265211334973])
+_GL_W = np.array([0.0176140071391521, 0.0406014298003869, 0.0626720483341091, 0.0832767415767048,
+                  0.1019301198172404, 0.1181945319615184, 0.1316886384491766, 0.1420961093183821,
+                  0.1491729864726037, 0.1527533871307259])
+
+
+def _cbnd(x: NDArray[np.float64], y: NDArray[np.float64], rho: float) -> NDArray[np.float64]:
+    '''
+    Cumulative bivariate normal distribution P(X < x, Y < y) with correlation rho. Vectorized version of Genz's
+    algorithm for |rho| < 0.925, which covers the fixed correlation sqrt(t1/t2) used by Bjerksund-Stensland 2002.
+    '''
+    if abs(rho) >= 0.925:
+        raise ValueError('Vectorized bivariate normal only supports |rho| < 0.925.')
+
+    h = -np.asarray(x, dtype=np.float64)
+    k = -np.asarray(y, dtype=np.float64)
+    hk = h * k
+    hs = (h * h + k * k) / 2
+
+    asr = np.arcsin(rho)
+    # nodes mirrored around zero, same as looping over is = -1, 1 in the scalar version
+    sn = np.sin(asr * (np.concatenate([-_GL_X, _GL_X]) + 1) / 2)
+    w = np.concatenate([_GL_W, _GL_W])
+
+    terms = np.exp((sn * hk[..., None] - hs[..., None]) / (1 - sn * sn))
+    bvn = (terms @ w) * asr / (4 * np.pi)
+
+    return bvn + ndtr(-h) * ndtr(-k)
+
+
+def _phi(fs, t, gamma, h, i, r, b, v) -> NDArray[np.float64]:
+    '''
+    Phi function of the Bjerksund-Stensland model. All inputs broadcast.
+    '''
+    vsqrt_t = v * np.sqrt(t)
+    d1 = -(np.log(fs / h) + (b + (gamma - 0.5) * v ** 2) * t) / vsqrt_t
+    d2 = d1 - 2 * np.log(i / fs) / vsqrt_t
+
+    lambda1 = -r + gamma * b + 0.5 * gamma * (gamma - 1) * v ** 2
+    kappa = (2 * b) / v ** 2 + (2 * gamma - 1)
+
+    return np.exp(lambda1 * t) * fs ** gamma * (ndtr(d1) - (i / fs) ** kappa * ndtr(d2))
+
+
+def _psi(fs, t2, gamma, h, i2, i1, t1, r, b, v) -> NDArray[np.float64]:
+    '''
+    Psi function of the Bjerksund-Stensland 2002 model. All inputs broadcast.
+    '''
+    vsqrt_t1 = v * np.sqrt(t1)
+    vsqrt_t2 = v * np.sqrt(t2)
+
+    bgamma_t1 = (b + (gamma - 0.5) * v ** 2) * t1
+    bgamma_t2 = (b + (gamma - 0.5) * v ** 2) * t2
+
+    e1 = (np.log(fs / i1) + bgamma_t1) / vsqrt_t1
+    e2 = (np.log(i2 ** 2 / (fs * i1)) + bgamma_t1) / vsqrt_t1
+    e3 = (np.log(fs / i1) - bgamma_t1) / vsqrt_t1
+    e4 = (np.log(i2 ** 2 / (fs * i1)) - bgamma_t1) / vsqrt_t1
+
+    f1 = (np.log(fs / h) + bgamma_t2) / vsqrt_t2
+    f2 = (np.log(i2 ** 2 / (fs * h)) + bgamma_t2) / vsqrt_t2
+    f3 = (np.log(i1 ** 2 / (fs * h)) + bgamma_t2) / vsqrt_t2
+    f4 = (np.log(fs * i1 ** 2 / (h * i2 ** 2)) + bgamma_t2) / vsqrt_t2
+
+    # t1/t2 is the same constant for every cell, so rho is a scalar
+    rho = np.sqrt(0.5 * (np.sqrt(5) - 1))
+    lambda1 = -r + gamma * b + 0.5 * gamma * (gamma - 1) * v ** 2
+    kappa = (2 * b) / v ** 2 + (2 * gamma - 1)
+
+    return np.exp(lambda1 * t2) * fs ** gamma * (_cbnd(-e1, -f1, rho)
+                                                 - (i2 / fs) ** kappa * _cbnd(-e2, -f2, rho)
+                                                 - (i1 / fs) ** kappa * _cbnd(-e3, -f3, -rho)
+                                                 + (i1 / i2) ** kappa * _cbnd(-e4, -f4, -rho))
+
+
+def gbs_vec(opt_type: str, fs, x, t, r, b, v) -> NDArray[np.float64]:
+    '''
+    Generalized Black-Scholes value of a European option. Returns an array broadcast over all inputs.
+
+    ### Parameters:
+    - opt_type: str: 'c' for call, 'p' for put.
+    - fs: price of the underlying.
+    - x: strike price.
+    - t: time to expiration in years.
+    - r: risk-free interest rate.
+    - b: cost of carry (r - q for stocks with dividend yield q).
+    - v: implied volatility.
+    '''
+    vsqrt_t = v * np.sqrt(t)
+    d1 = (np.log(fs / x) + (b + v ** 2 / 2) * t) / vsqrt_t
+    d2 = d1 - vsqrt_t
+
+    if opt_type == 'c':
+        return fs * np.exp((b - r) * t) * ndtr(d1) - x * np.exp(-r * t) * ndtr(d2)
+    return x * np.exp(-r * t) * ndtr(-d2) - fs * np.exp((b - r) * t) * ndtr(-d1)
+
+
+def _bjerksund_stensland_2002(fs, x, t, r, b, v) -> NDArray[np.float64]:
+    '''
+    Bjerksund-Stensland 2002 American call value. Inputs must already be broadcast to a common shape, and b < r must
+    hold for every element (otherwise early exercise is never optimal and the European value should be used).
+    '''
+    v2 = v ** 2
+    t1 = 0.5 * (np.sqrt(5) - 1) * t
+    t2 = t
+
+    beta_inside = np.abs((b / v2 - 0.5) ** 2 + 2 * r / v2)
+    beta = (0.5 - b / v2) + np.sqrt(beta_inside)
+    b_infinity = (beta / (beta - 1)) * x
+    b_zero = np.maximum(x, (r / (r - b)) * x)
+
+    h1 = -(b * t1 + 2 * v * np.sqrt(t1)) * (x ** 2 / ((b_infinity - b_zero) * b_zero))
+    h2 = -(b * t2 + 2 * v * np.sqrt(t2)) * (x ** 2 / ((b_infinity - b_zero) * b_zero))
+
+    i1 = b_zero + (b_infinity - b_zero) * (1 - np.exp(h1))
+    i2 = b_zero + (b_infinity - b_zero) * (1 - np.exp(h2))
+
+    alpha1 = (i1 - x) * i1 ** -beta
+    alpha2 = (i2 - x) * i2 ** -beta
+
+    # cells at or above the exercise boundary are exercised immediately and worth intrinsic value
+    exercise = fs >= i2
+
+    value = (alpha2 * fs ** beta
+             - alpha2 * _phi(fs, t1, beta, i2, i2, r, b, v)
+             + _phi(fs, t1, 1, i2, i2, r, b, v)
+             - _phi(fs, t1, 1, i1, i2, r, b, v)
+             - x * _phi(fs, t1, 0, i2, i2, r, b, v)
+             + x * _phi(fs, t1, 0, i1, i2, r, b, v)
+             + alpha1 * _phi(fs, t1, beta, i1, i2, r, b, v)
+             - alpha1 * _psi(fs, t2, beta, i1, i2, i1, t1, r, b, v)
+             + _psi(fs, t2, 1, i1, i2, i1, t1, r, b, v)
+             - _psi(fs, t2, 1, x, i2, i1, t1, r, b, v)
+             - x * _psi(fs, t2, 0, i1, i2, i1, t1, r, b, v)
+             + x * _psi(fs, t2, 0, x, i2, i1, t1, r, b, v))
+
+    return np.where(exercise, fs - x, value)
+
+
+def american_vec(opt_type: str,
+                 fs: Union[NDArray[np.float64], float],
+                 x: float,
+                 t: Union[NDArray[np.float64], float],
+                 r: float,
+                 q: float,
+                 v: Union[NDArray[np.float64], float]) -> NDArray[np.float64]:
+    '''
+    Value of an American option using the Bjerksund-Stensland 2002 model, the same model as optlib.gbs.american.
+    Accepts arrays for the underlying price, time and volatility and returns the value for every broadcast element
+    in one call, e.g. fs of shape (1, n_prices) and t of shape (n_dates, 1) give a (n_dates, n_prices) surface.
+    Only the value is returned (optlib returns a tuple whose first element is the value).
+
+    ### Parameters:
+    - opt_type: str: 'c' for call, 'p' for put.
+    - fs: price(s) of the underlying.
+    - x: float: strike price.
+    - t: time(s) to expiration in years. Must be positive.
+    - r: float: risk-free interest rate.
+    - q: float: continuous dividend yield.
+    - v: implied volatility.
+    '''
+    fs, t, v = np.broadcast_arrays(*(np.asarray(a, dtype=np.float64) for a in (fs, t, v)))
+    b = r - q
+
+    if opt_type == 'c':
+        e_value = gbs_vec('c', fs, x, t, r, b, v)
+        if b >= r: # early exercise is never optimal, American call is worth the European call
+            return e_value
+        value = _bjerksund_stensland_2002(fs, np.full_like(fs, x), t, r, b, v)
+    elif opt_type == 'p':
+        e_value = gbs_vec('p', fs, x, t, r, b, v)
+        # put-call transformation, the put is priced as a call with spot and strike swapped
+        put_r = r - b
+        put_b = -b
+        if put_b >= put_r:
+            return e_value
+        value = _bjerksund_stensland_2002(np.full_like(fs, x), fs, t, put_r, put_b, v)
+    else:
+        raise ValueError("opt_type must be 'c' or 'p'.")
+
+    # in boundary conditions the approximation can break down, never go below the European value
+    return np.maximum(value, e_value)
+
+
+def intrinsic_vec(opt_type: str, fs: Union[NDArray[np.float64], float], x: float) -> NDArray[np.float64]:
+    '''
+    Intrinsic value of an option for an array of underlying prices.
+    '''
+    if opt_type == 'c':
+        return np.maximum(np.asarray(fs, dtype=np.float64) - x, 0)
+    return np.maximum(x - np.asarray(fs, dtype=np.float64), 0)
+
+
+def option_surface(opt_type: str,
+                   prices: NDArray[np.float64],
+                   dtes: NDArray[np.float64],
+                   k: float,
+                   r: float,
+                   q: float,
+                   iv: Union[NDArray[np.float64], float],
+                   min_dte: float = 0.001) -> NDArray[np.float64]:
+    '''
+    Value of a single option over a grid of dates and prices. Returns a 2D array of shape (len(dtes), len(prices)).
+    Rows whose time to expiration is at or below min_dte are set to intrinsic value, matching Heatmap.generate_data.
+
+    ### Parameters:
+    - opt_type: str: 'c' for call, 'p' for put.
+    - prices: NDArray: Stock prices (columns of the surface).
+    - dtes: NDArray: Times to expiration in years (rows of the surface).
+    - k: float: Strike price.
+    - r: float: Risk-free interest rate.
+    - q: float: Dividend yield.
+    - iv: float | NDArray: Implied volatility, or one per row (e.g. from vis.vol_surface.VolSurface.iv at each dte).
+    - min_dte: float: Times at or below this are treated as expired.
+    '''
+    prices = np.asarray(prices, dtype=np.float64)
+    dtes = np.asarray(dtes, dtype=np.float64)
+    ivs = np.broadcast_to(np.asarray(iv, dtype=np.float64), dtes.shape)
+
+    surface = np.empty((len(dtes), len(prices)))
+    live = dtes > min_dte
+
+    live_rows = np.flatnonzero(live)
+    rows_per_chunk = max(1, CHUNK_CELLS // max(len(prices), 1))
+    for start in range(0, len(live_rows), rows_per_chunk):
+        rows = live_rows[start:start + rows_per_chunk]
+        surface[rows] = american_vec(opt_type, prices[None, :], k, dtes[rows][:, None], r, q, ivs[rows][:, None])
+    if (~live).any():
+        surface[~live] = intrinsic_vec(opt_type, prices, k)[None, :]
+
+    return surface
+
+
+GREEKS = ('value', 'delta', 'gamma', 'theta', 'vega')
+
+
+def _american_or_intrinsic(opt_type, fs, x, t, r, q, v, min_dte: float = 0.001) -> NDArray[np.float64]:
+    '''
+    Elementwise American value where the time to expiration is above min_dte and intrinsic value elsewhere.
+    Live elements are priced in batches of CHUNK_CELLS.
+    '''
+    fs, t, v = np.broadcast_arrays(*(np.asarray(a, dtype=np.float64) for a in (fs, t, v)))
+
+    out = intrinsic_vec(opt_type, fs, x)
+    live = t > min_dte
+
+    fs_live, t_live, v_live = fs[live], t[live], v[live]
+    values = np.empty(fs_live.size)
+    for start in range(0, fs_live.size, CHUNK_CELLS):
+        chunk = slice(start, start + CHUNK_CELLS)
+        values[chunk] = american_vec(opt_type, fs_live[chunk], x, t_live[chunk], r, q, v_live[chunk])
+    out[live] = values
+
+    return out
+
+
+def option_greeks_surface(opt_type: str,
+                          prices: NDArray[np.float64],
+                          dtes: NDArray[np.float64],
+                          k: float,
+                          r: float,
+                          q: float,
+                          iv: Union[NDArray[np.float64], float],
+                          min_dte: float = 0.001,
+                          bump: float = 0.005) -> NDArray[np.float64]:
+    '''
+    Value and Greeks of a single option over a grid of dates and prices. Returns an array of shape
+    (len(GREEKS), len(dtes), len(prices)) holding value, delta, gamma, theta and vega, in that order.
+
+    The Greeks are central finite differences of the American value. The base grid and the bumped grids are stacked
+    and priced in a single american_vec pass, so the value shares the computation with the Greeks. Units match the
+    Schwab chain: delta per $1 move, gamma per $1 move, theta per calendar day and vega per 1 volatility point.
+
+    ### Parameters:
+    - opt_type: str: 'c' for call, 'p' for put.
+    - prices: NDArray: Stock prices (columns of the surface).
+    - dtes: NDArray: Times to expiration in years (rows of the surface).
+    - k: float: Strike price.
+    - r: float: Risk-free interest rate.
+    - q: float: Dividend yield.
+    - iv: float | NDArray: Implied volatility, or one per row.
+    - min_dte: float: Times at or below this are treated as expired.
+    - bump: float: Relative size of the stock price bump used for delta and gamma.
+    '''
+    prices = np.asarray(prices, dtype=np.float64)[None, :]
+    dtes = np.asarray(dtes, dtype=np.float64)[:, None]
+    shape = (dtes.shape[0], prices.shape[1])
+
+    ivs = np.broadcast_to(np.asarray(iv, dtype=np.float64), dtes.shape[:1])[:, None]
+
+    h = bump * prices
+    dt = 1 / 365
+    v_up, v_down = ivs + 0.01, np.maximum(ivs - 0.01, 1e-4)
+
+    # base, spot up, spot down, one day later, vol up, vol down
+    fs = np.stack([np.broadcast_to(p, shape) for p in (prices, prices + h, prices - h, prices, prices, prices)])
+    t = np.stack([np.broadcast_to(d, shape) for d in (dtes, dtes, dtes, dtes - dt, dtes, dtes)])
+    v = np.stack([np.broadcast_to(s, shape) for s in (ivs, ivs, ivs, ivs, v_up, v_down)])
+
+    base, up, down, later, vol_up, vol_down = _american_or_intrinsic(opt_type, fs, k, t, r, q, v, min_dte)
+
+    delta = (up - down) / (2 * h)
+    gamma = (up - 2 * base + down) / h ** 2
+    theta = np.where(dtes > min_dte, later - base, 0)
+    vega = (vol_up - vol_down) / (v_up - v_down) * 0.01
+
+    return np.stack([base, delta, gamma, theta, vega])
@@ -0,0 +1,373 @@
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr
+
+from typing import Iterable, Iterator, Optional
+
+from numpy.typing import NDArray
+
+# Strategy families: leg types (True for calls) and quantities of the long version of the strategy, legs ordered by
+# strike (the scanner relies on the order). The short version of each family is scanned as well, with every quantity negated.
+FAMILIES = {
+    'Call Vertical': ((True, True), (1, -1)),
+    'Put Vertical': ((False, False), (-1, 1)),
+    'Straddle': ((False, True), (1, 1)),
+    'Strangle': ((False, True), (1, 1)),
+    'Iron Condor': ((False, False, True, True), (-1, 1, 1, -1)),
+    'Butterfly': ((True, True, True), (1, -2, 1)),
+}
+
+# metric -> True if higher is better
+RANK_METRICS = {'POP': True, 'Cost': False, 'Max Loss': True, 'Return on Risk': True}
+
+MAX_LEGS = max(len(legs) for legs, _ in FAMILIES.values())
+
+BLOCK_CANDIDATES = 1 << 16 # candidates scored per block, bounds the memory of a scan
+
+
+class StrategyScanner:
+    '''
+    Enumerates candidate strategies (verticals, straddles, strangles, iron condors and butterflies, long and short)
+    over every strike of every expiration of an OptionChain and ranks them. Each family is generated in blocks of
+    strike index tuples, every block is scored with array operations on its (candidates x legs) strikes and quotes,
+    and only the running top-N is kept, so the full set of combinations is never held in memory.
+
+    Scores use the expiry payoff, which is piecewise linear with kinks at the strikes: cost (net debit, long legs
+    bought at the ask and short legs sold at the bid), max profit, max loss, break-evens, and the probability of
+    profit under a lognormal terminal price with the at the money volatility of the expiration.
+
+    ### Parameters:
+    - chain: OptionChain: Chain to scan (utils.chain).
+    - s0: float: Price of the underlying.
+    - r: float: Risk-free interest rate.
+    - q: float: Dividend yield.
+    - vol_surface: VolSurface: Surface giving the at the money volatility of each expiration (vis.vol_surface).
+    Defaults to the Volatility column of the contracts closest to the money.
+
+    ### Methods:
+    - scan: Get the top-N strategies as a DataFrame.
+    '''
+    def __init__(self, chain, s0: float, r: float, q: float, vol_surface=None):
+        self.chain = chain
+        self.s0, self.r, self.q = s0, r, q
+        self.vol_surface = vol_surface
+
+        self.expirations = self.__prepare()
+
+        return
+
+    def scan(self,
+             top_n: int = 20,
+             rank_by: str = 'POP',
+             families: Optional[Iterable[str]] = None,
+             max_width: int = 10,
+             allow_unbounded: bool = False) -> pd.DataFrame:
+        '''
+        Scan the chain and return the best top_n strategies, best first. Columns: Strategy, Direction, Expiration,
+        Legs, Cost, Max Profit, Max Loss, Break-evens, POP and Return on Risk. Dollar amounts are per strategy
+        (100 shares per contract); a negative cost is a credit.
+
+        ### Parameters:
+        - top_n: int: Number of strategies to return.
+        - rank_by: str: One of RANK_METRICS: 'POP', 'Cost', 'Max Loss' or 'Return on Risk' (max profit / max loss).
+        - families: Iterable[str]: Families of FAMILIES to scan. Defaults to all.
+        - max_width: int: Maximum distance, in strikes, between the legs of a spread (verticals, condor wings,
+        butterfly wings, strangles).
+        - allow_unbounded: bool: Keep strategies with unlimited loss (e.g. short straddles).
+        '''
+        if rank_by not in RANK_METRICS:
+            raise ValueError(f"rank_by must be one of {', '.join(RANK_METRICS)}.")
+        families = list(FAMILIES) if families is None else list(families)
+
+        best = None
+        for exp_index, exp in enumerate(self.expirations):
+            for family in families:
+                for block in self.__blocks(family, exp, max_width):
+                    for direction in (1, -1):
+                        scored = self.__score(family, exp_index, block, direction)
+                        best = self.__merge(best, scored, top_n, rank_by, allow_unbounded)
+
+        return self.__to_frame(best, rank_by)
+
+    def __prepare(self) -> list[dict]:
+        '''
+        Sorted strike arrays and quotes of calls and puts of every expiration, plus its time and volatility.
+        '''
+        expirations = []
+        for label in self.chain.expirations:
+            exp = {'label': label}
+            for kind in ['calls', 'puts']:
+                try:
+                    df = self.chain.view(kind, label)
+                except KeyError:
+                    df = None
+                if df is None or len(df) == 0:
+                    break
+                order = np.argsort(df['Strike'].to_numpy(), kind='stable')
+                exp[kind] = {name: df[name].to_numpy()[order].astype(np.float64)
+                             for name in ['Strike', 'Bid', 'Ask', 'Volatility']}
+                exp['t'] = float(df['Days to Expiration'].iloc[0]) / 365
+            else:
+                exp['iv'] = self.__atm_vol(exp)
+                expirations.append(exp)
+
+        return expirations
+
+    def __atm_vol(self, exp: dict) -> float:
+        t = max(exp['t'], 0.5 / 365)
+        if self.vol_surface is not None:
+            return float(self.vol_surface.iv(self.s0, t))
+
+        vols = []
+        for kind in ['calls', 'puts']:
+            strikes, vol = exp[kind]['Strike'], exp[kind]['Volatility']
+            valid = np.flatnonzero((vol > 0) & (vol < 500))
+            if valid.size > 0:
+                vols.append(vol[valid[np.argmin(np.abs(strikes[valid] - self.s0))]] / 100)
+
+        return float(np.mean(vols)) if vols else np.nan
+
+    def __blocks(self, family: str, exp: dict, max_width: int) -> Iterator[NDArray[np.int64]]:
+        '''
+        Yield blocks of at most BLOCK_CANDIDATES candidates as (n, legs) arrays of indices into the sorted strikes of
+        each leg's type. Candidates are generated a few lower strikes at a time, never all at once.
+        '''
+        if family not in FAMILIES:
+            raise ValueError(f"Unknown strategy family {family}. Use one of {', '.join(FAMILIES)}.")
+
+        yield from _blocks_of(self.__candidates(family, exp, max_width))
+
+    def __candidates(self, family: str, exp: dict, max_width: int) -> Iterator[NDArray[np.int64]]:
+        '''
+        Yield the candidates of a family in pieces of about BLOCK_CANDIDATES rows.
+        '''
+        n_calls, n_puts = len(exp['calls']['Strike']), len(exp['puts']['Strike'])
+        put_strikes, call_strikes = exp['puts']['Strike'], exp['calls']['Strike']
+
+        if family in ('Call Vertical', 'Put Vertical'):
+            n = n_calls if family == 'Call Vertical' else n_puts
+            for i, j in _pair_blocks(n, max_width):
+                yield np.stack([i, j], axis=1)
+
+        elif family == 'Straddle':
+            _, put_idx, call_idx = np.intersect1d(put_strikes, call_strikes, return_indices=True)
+            yield np.stack([put_idx, call_idx], axis=1)
+
+        elif family == 'Strangle':
+            # put strike below call strike, within max_width strikes of each other on the call axis
+            width = max(max_width, 1)
+            rows = max(BLOCK_CANDIDATES // width, 1)
+            for lo in range(0, n_puts, rows):
+                p = np.repeat(np.arange(lo, min(lo + rows, n_puts)), width)
+                c = np.searchsorted(call_strikes, put_strikes[p], side='right') + np.tile(np.arange(width), len(p) // width)
+                keep = c < n_calls
+                yield np.stack([p[keep], c[keep]], axis=1)
+
+        elif family == 'Iron Condor':
+            # the put spreads of each inner put strike b with every call spread above it, call spreads generated a
+            # few lower strikes at a time
+            for b in range(1, n_puts):
+                wings = np.arange(max(b - max_width, 0), b)
+                first = np.searchsorted(call_strikes, put_strikes[b], side='right')
+                for call_i, call_j in _pair_blocks(n_calls, max_width, first, max(BLOCK_CANDIDATES // wings.size, 1)):
+                    a, k = (x.ravel() for x in np.meshgrid(wings, np.arange(call_i.size), indexing='ij'))
+                    yield np.stack([a, np.full(a.size, b), call_i[k], call_j[k]], axis=1)
+
+        elif family == 'Butterfly':
+            # equal wings: the upper strike mirrors the lower one around the body
+            for i, j in _pair_blocks(n_calls, max_width):
+                target = 2 * call_strikes[j] - call_strikes[i]
+                k = np.clip(np.searchsorted(call_strikes, target), 0, n_calls - 1)
+                keep = np.isclose(call_strikes[k], target) & (k > j)
+                yield np.stack([i[keep], j[keep], k[keep]], axis=1)
+
+    def __score(self, family: str, exp_index: int, idx: NDArray[np.int64], direction: int) -> dict:
+        '''
+        Score a block of candidates. Returns a dict of arrays, one entry per tradable candidate.
+        '''
+        exp = self.expirations[exp_index]
+        is_call, base_qty = FAMILIES[family]
+        qty = direction * np.array(base_qty, dtype=np.float64)
+
+        # buy at the ask, sell at the bid; a leg without a quote on its side cannot be traded
+        cols = [exp['calls'] if c else exp['puts'] for c in is_call]
+        premiums = np.stack([col['Ask' if n > 0 else 'Bid'][idx[:, leg]]
+                             for leg, (col, n) in enumerate(zip(cols, qty))], axis=1)
+        tradable = np.all(premiums > 0, axis=1)
+        idx, premiums = idx[tradable], premiums[tradable]
+
+        strikes = np.stack([col['Strike'][idx[:, leg]] for leg, col in enumerate(cols)], axis=1)
+        cost = np.sum(qty * premiums, axis=1) # per share, positive for a debit
+
+        # the legs are in strike order, so the slope of the payoff left of each strike is the same for every candidate:
+        # puts give -qty at a price of 0 and every leg adds its qty past its strike
+        points = np.concatenate([np.zeros((len(strikes), 1)), strikes], axis=1)
+        call_mask = np.array(is_call)
+        slopes = -np.sum(qty[~call_mask]) + np.concatenate([[0], np.cumsum(qty)])
+        value0 = np.sum(qty * np.where(call_mask, 0, strikes), axis=1) - cost
+        values = value0[:, None] + np.concatenate([np.zeros((len(strikes), 1)),
+                                                   np.cumsum(slopes[:-1] * np.diff(points, axis=1), axis=1)], axis=1)
+        tail = slopes[-1]
+
+        max_profit = np.where(tail > 0, np.inf, values.max(axis=1))
+        max_loss = np.where(tail < 0, -np.inf, values.min(axis=1))
+
+        break_evens, pop = self.__profit_regions(points, values, tail, exp)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return_on_risk = np.where(max_loss < 0, max_profit / -max_loss, np.inf)
+
+        # pad the legs, so blocks of every family can be merged
+        pad = ((0, 0), (0, MAX_LEGS - len(is_call)))
+
+        return {
+            'family': np.full(len(strikes), list(FAMILIES).index(family)),
+            'direction': np.full(len(strikes), direction),
+            'expiration': np.full(len(strikes), exp_index),
+            'strikes': np.pad(strikes, pad, constant_values=np.nan),
+            'qty': np.pad(np.broadcast_to(qty, strikes.shape), pad),
+            'Cost': cost * 100,
+            'Max Profit': max_profit * 100,
+            'Max Loss': max_loss * 100,
+            'Break-evens': np.pad(break_evens, pad, constant_values=np.nan),
+            'POP': pop,
+            'Return on Risk': return_on_risk,
+        }
+
+    def __profit_regions(self, points: NDArray[np.float64], values: NDArray[np.float64], tail: float,
+                         exp: dict) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+        '''
+        Break-evens (padded with NaN) and probability of profit of piecewise linear payoffs given by their values at
+        the sorted points (first point 0) and the slope past the last point.
+        '''
+        t = max(exp['t'], 0.5 / 365)
+        vsqrt_t = exp['iv'] * np.sqrt(t)
+        drift = (self.r - self.q - exp['iv'] ** 2 / 2) * t
+
+        def cdf(x):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return ndtr((np.log(x / self.s0) - drift) / vsqrt_t)
+
+        x0, x1 = points[:, :-1], points[:, 1:]
+        y0, y1 = values[:, :-1], values[:, 1:]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cross = x0 - y0 * (x1 - x0) / (y1 - y0)
+        crosses = (y0 > 0) != (y1 > 0)
+
+        lower = np.where(y0 > 0, x0, cross)
+        upper = np.where(y1 > 0, x1, cross)
+        profitable = (y0 > 0) | (y1 > 0)
+        pop = np.sum(np.where(profitable, cdf(upper) - cdf(lower), 0), axis=1)
+
+        # past the last strike the payoff is a ray
+        x_last, y_last = points[:, -1], values[:, -1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tail_cross = x_last - y_last / tail if tail != 0 else np.full(len(points), np.nan)
+        if tail > 0:
+            pop += 1 - cdf(np.where(y_last > 0, x_last, tail_cross))
+        elif tail < 0:
+            pop += np.where(y_last > 0, cdf(tail_cross) - cdf(x_last), 0)
+        else:
+            pop += np.where(y_last > 0, 1 - cdf(x_last), 0)
+
+        tail_crosses = (y_last > 0) != (tail > 0) if tail != 0 else np.zeros(len(points), dtype=bool)
+        break_evens = np.concatenate([np.where(crosses, cross, np.nan),
+                                      np.where(tail_crosses, tail_cross, np.nan)[:, None]], axis=1)
+
+        return break_evens, pop
+
+    def __merge(self, best: Optional[dict], scored: dict, top_n: int, rank_by: str, allow_unbounded: bool) -> dict:
+        '''
+        Keep the top_n candidates of the previous best and a newly scored block.
+        '''
+        keep = np.isfinite(scored['POP'])
+        if not allow_unbounded:
+            keep &= np.isfinite(scored['Max Loss'])
+        score = np.where(keep, scored[rank_by] if RANK_METRICS[rank_by] else -scored[rank_by], -np.inf)
+
+        # the block's own top_n first, so only small arrays are concatenated
+        top = np.flatnonzero(keep)
+        if top.size > top_n:
+            top = top[np.argpartition(-score[top], top_n - 1)[:top_n]]
+        scored = {name: values[top] for name, values in scored.items()}
+
+        if best is None:
+            return scored
+
+        merged = {name: np.concatenate([best[name], values]) for name, values in scored.items()}
+        score = merged[rank_by] if RANK_METRICS[rank_by] else -merged[rank_by]
+        if len(score) > top_n:
+            top = np.argpartition(-score, top_n - 1)[:top_n]
+            merged = {name: values[top] for name, values in merged.items()}
+
+        return merged
+
+    def __to_frame(self, best: Optional[dict], rank_by: str) -> pd.DataFrame:
+        '''
+        Rows of the best candidates, best first. argpartition leaves the top candidates unordered, so they are
+        sorted here.
+        '''
+        columns = ['Strategy', 'Direction', 'Expiration', 'Legs', 'Cost', 'Max Profit', 'Max Loss', 'Break-evens',
+                   'POP', 'Return on Risk']
+        if best is None or len(best['POP']) == 0:
+            return pd.DataFrame(columns=columns)
+
+        score = best[rank_by] if RANK_METRICS[rank_by] else -best[rank_by]
+        rows = []
+        for i in np.argsort(-score, kind='stable'):
+            family = list(FAMILIES)[best['family'][i]]
+            is_call = FAMILIES[family][0]
+            legs = ' / '.join(f"{int(qty):+d} {'C' if call else 'P'} {strike:g}"
+                              for qty, call, strike in zip(best['qty'][i], is_call, best['strikes'][i][:len(is_call)]))
+            break_evens = best['Break-evens'][i]
+            rows.append({
+                'Strategy': family,
+                'Direction': 'Long' if best['direction'][i] > 0 else 'Short',
+                'Expiration': self.expirations[best['expiration'][i]]['label'],
+                'Legs': legs,
+                'Cost': round(float(best['Cost'][i]), 2),
+                'Max Profit': round(float(best['Max Profit'][i]), 2),
+                'Max Loss': round(float(best['Max Loss'][i]), 2),
+                'Break-evens': tuple(round(float(x), 2) for x in np.sort(break_evens[np.isfinite(break_evens)])),
+                'POP': float(best['POP'][i]),
+                'Return on Risk': float(best['Return on Risk'][i]),
+            })
+
+        return pd.DataFrame(rows, columns=columns)
+
+
+def _pair_blocks(n: int, max_width: int, start: int = 0,
+                 block: int = BLOCK_CANDIDATES) -> Iterator[tuple[NDArray[np.int64], NDArray[np.int64]]]:
+    '''
+    Yield the index pairs (i, j) with start <= i < j <= i + max_width and j < n, in blocks of at most block pairs,
+    a few lower indices i at a time.
+    '''
+    width = max(min(max_width, n - 1), 1)
+    offsets = np.arange(1, width + 1)
+    rows = max(block // width, 1)
+
+    for lo in range(start, n - 1, rows):
+        i = np.repeat(np.arange(lo, min(lo + rows, n - 1)), width)
+        j = i + np.tile(offsets, len(i) // width)
+        keep = j < n
+        yield i[keep], j[keep]
+
+
+def _blocks_of(pieces: Iterable[NDArray[np.int64]]) -> Iterator[NDArray[np.int64]]:
+    '''
+    Regroup pieces of candidates into blocks of at most BLOCK_CANDIDATES rows, skipping empty ones.
+    '''
+    pending, size = [], 0
+    for piece in pieces:
+        if len(piece) == 0:
+            continue
+        pending.append(piece)
+        size += len(piece)
+        while size >= BLOCK_CANDIDATES:
+            merged = np.concatenate(pending)
+            yield merged[:BLOCK_CANDIDATES]
+            pending = [merged[BLOCK_CANDIDATES:]]
+            size = len(pending[0])
+    if size > 0:
+        yield np.concatenate(pending)
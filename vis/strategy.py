@@ -0,0 +1,227 @@
+import numpy as np
+
+from typing import Optional, Union
+
+from numpy.typing import NDArray
+
+from vis.pricing import intrinsic_vec
+
+
+class StrategyPayoff:
+    '''
+    Expiry payoff of an options strategy, kept on one stock price grid shared by every leg. The payoff vector of each
+    leg is stored, so adding or removing a leg only adds or subtracts one vector from the total. The grid covers
+    5% to 600% of the spot price and of every strike, like vis.payoff.get_stock_prices; it is only rebuilt (and the
+    legs re-evaluated) when a new leg falls outside of it.
+
+    The expiry payoff is also kept exactly: it is piecewise linear with kinks only at the strikes, so it is fully
+    described by its value at a price of 0, its value at each strike and the slope past the highest strike. Break-even
+    points, max profit and max loss are computed from these kinks in O(legs log legs), without sampling.
+
+    ### Parameters:
+    - num_prices: int: Number of stock prices in the grid.
+
+    ### Attributes:
+    - prices: NDArray: Stock prices of the grid.
+    - payoff: NDArray: Payoff of the whole strategy at each price of the grid, in dollars.
+    - legs: dict[int, dict]: Legs by id, each a dict with opt_type ('call' or 'put'), strike, premium and buy.
+
+    ### Methods:
+    - add_leg: Add a leg, returns its id.
+    - remove_leg: Remove a leg by id.
+    - leg_payoff: Get the payoff vector of one leg.
+    - evaluate: Get the exact expiry payoff at any stock prices.
+    - vertices: Get the exact vertices of the payoff curve over a price range.
+    - break_evens: Get the stock prices where the payoff is zero.
+    - max_profit: Get the highest payoff (inf if unbounded).
+    - max_loss: Get the lowest payoff (-inf if unbounded).
+    - clear: Remove every leg and the grid.
+    '''
+    def __init__(self, num_prices: int = 1000):
+        self.num_prices = num_prices
+
+        self.prices = np.array([])
+        self.payoff = np.array([])
+        self.legs = {}
+
+        self._leg_payoffs = {}
+        self._bounds = None # (lower, upper) of the grid
+        self._next_id = 0
+
+        return
+
+    def __len__(self) -> int:
+        return len(self.legs)
+
+    def add_leg(self, opt_type: str, strike: float, premium: float, buy: bool, s0: float) -> int:
+        '''
+        Add a leg to the strategy and return its id.
+
+        ### Parameters:
+        - opt_type: str: 'call' or 'put'.
+        - strike: float: Strike of the option.
+        - premium: float: Price paid (or received if sold) per share.
+        - buy: bool: True for a long position, False for a short one.
+        - s0: float: Current stock price, used for the range of the grid.
+        '''
+        lower = min(s0 * 0.05, strike * 0.05)
+        upper = max(s0 * 6, strike * 6)
+
+        leg = {'opt_type': opt_type, 'strike': strike, 'premium': premium, 'buy': buy}
+        leg_id = self._next_id
+        self._next_id += 1
+        self.legs[leg_id] = leg
+
+        if self._bounds is None or lower < self._bounds[0] or upper > self._bounds[1]:
+            if self._bounds is not None:
+                lower, upper = min(lower, self._bounds[0]), max(upper, self._bounds[1])
+            self.__regrid(lower, upper)
+        else:
+            self._leg_payoffs[leg_id] = self.__evaluate(leg)
+            self.payoff = self.payoff + self._leg_payoffs[leg_id]
+
+        return leg_id
+
+    def remove_leg(self, leg_id: int) -> None:
+        '''
+        Remove a leg from the strategy. Raises KeyError if there is no leg with this id.
+        '''
+        del self.legs[leg_id]
+        self.payoff = self.payoff - self._leg_payoffs.pop(leg_id)
+
+        return
+
+    def leg_payoff(self, leg_id: int) -> NDArray[np.float64]:
+        '''
+        Get the payoff vector of one leg on the grid, in dollars.
+        '''
+        return self._leg_payoffs[leg_id]
+
+    def evaluate(self, prices: Union[NDArray[np.float64], float]) -> Union[NDArray[np.float64], float]:
+        '''
+        Get the exact payoff of the strategy at expiry for any stock prices, in dollars. Costs O(log legs) per price.
+        '''
+        kink_x, kink_y, tail_slope = self.__kinks()
+        prices = np.asarray(prices, dtype=np.float64)
+
+        # linear between kinks, np.interp clamps past the last kink so add the tail separately
+        values = np.interp(prices, kink_x, kink_y) + tail_slope * np.maximum(prices - kink_x[-1], 0)
+
+        return values if values.ndim > 0 else float(values)
+
+    def vertices(self, lower: float = 0.0, upper: Optional[float] = None) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+        '''
+        Get the vertices (prices, payoffs) of the expiry payoff curve between lower and upper: the two ends and every
+        strike in between. Drawing straight lines between them gives the exact curve.
+
+        ### Parameters:
+        - lower: float: Lowest stock price.
+        - upper: float: Highest stock price. Defaults to the end of the grid.
+        '''
+        kink_x, _, _ = self.__kinks()
+        if upper is None:
+            upper = self.prices[-1] if self.prices.size > 0 else max(kink_x[-1] * 6, lower)
+
+        inside = kink_x[(kink_x > lower) & (kink_x < upper)]
+        x = np.concatenate([[lower], inside, [upper]])
+
+        return x, self.evaluate(x)
+
+    def break_evens(self) -> NDArray[np.float64]:
+        '''
+        Get the stock prices at expiry where the payoff of the strategy is zero, sorted. If the payoff is zero over a
+        whole range, the ends of the range are returned.
+        '''
+        kink_x, kink_y, tail_slope = self.__kinks()
+
+        x0, x1 = kink_x[:-1], kink_x[1:]
+        y0, y1 = kink_y[:-1], kink_y[1:]
+
+        crossing = y0 * y1 < 0
+        points = [x0[crossing] - y0[crossing] * (x1[crossing] - x0[crossing]) / (y1[crossing] - y0[crossing]),
+                  kink_x[kink_y == 0]]
+
+        # past the last strike the payoff is a ray
+        if kink_y[-1] * tail_slope < 0:
+            points.append([kink_x[-1] - kink_y[-1] / tail_slope])
+
+        return np.unique(np.concatenate(points))
+
+    def max_profit(self) -> float:
+        '''
+        Get the highest payoff of the strategy at expiry, in dollars. inf if the profit is unbounded.
+        '''
+        _, kink_y, tail_slope = self.__kinks()
+
+        return np.inf if tail_slope > 0 else float(kink_y.max())
+
+    def max_loss(self) -> float:
+        '''
+        Get the lowest payoff of the strategy at expiry, in dollars (negative for a loss). -inf if the loss is unbounded.
+        '''
+        _, kink_y, tail_slope = self.__kinks()
+
+        return -np.inf if tail_slope < 0 else float(kink_y.min())
+
+    def clear(self) -> None:
+        '''
+        Remove every leg and the grid.
+        '''
+        self.prices = np.array([])
+        self.payoff = np.array([])
+        self.legs.clear()
+        self._leg_payoffs.clear()
+        self._bounds = None
+
+        return
+
+    def __kinks(self) -> tuple[NDArray[np.float64], NDArray[np.float64], float]:
+        '''
+        Get the kinks of the expiry payoff: prices (0 then the sorted unique strikes), payoff at each of them, and the
+        slope of the payoff past the highest strike, in dollars per dollar of stock price.
+        '''
+        legs = list(self.legs.values())
+        if not legs:
+            return np.zeros(1), np.zeros(1), 0.0
+
+        strikes = np.array([leg['strike'] for leg in legs], dtype=np.float64)
+        premiums = np.array([leg['premium'] for leg in legs], dtype=np.float64)
+        signs = np.array([100.0 if leg['buy'] else -100.0 for leg in legs]) # 100 shares per contract
+        is_call = np.array([leg['opt_type'] == 'call' for leg in legs])
+
+        # at a price of 0 only puts have value, and their payoff falls with the price
+        value0 = np.sum(signs * (np.where(is_call, 0, strikes) - premiums))
+        slope0 = np.sum(np.where(is_call, 0, -signs))
+
+        # both calls and puts add sign to the slope at their strike
+        strikes, inverse = np.unique(strikes, return_inverse=True)
+        slopes = slope0 + np.cumsum(np.bincount(inverse, weights=signs, minlength=len(strikes)))
+
+        kink_x = np.concatenate([[0.0], strikes])
+        segment_slopes = np.concatenate([[slope0], slopes[:-1]]) # slope left of each strike
+        kink_y = value0 + np.concatenate([[0.0], np.cumsum(segment_slopes * np.diff(kink_x))])
+
+        return kink_x, kink_y, float(slopes[-1])
+
+    def __evaluate(self, leg: dict) -> NDArray[np.float64]:
+        '''
+        Payoff of a leg at expiry on the grid, in dollars (100 shares per contract).
+        '''
+        value = intrinsic_vec(leg['opt_type'][0], self.prices, leg['strike']) - leg['premium']
+        sign = 1.0 if leg['buy'] else -1.0
+
+        return sign * value * 100
+
+    def __regrid(self, lower: float, upper: float) -> None:
+        '''
+        Rebuild the grid over [lower, upper] and re-evaluate every leg on it.
+        '''
+        self._bounds = (lower, upper)
+        self.prices = np.linspace(lower, upper, num=self.num_prices).round(2)
+
+        self._leg_payoffs = {leg_id: self.__evaluate(leg) for leg_id, leg in self.legs.items()}
+        self.payoff = np.zeros_like(self.prices)
+        for values in self._leg_payoffs.values():
+            self.payoff = self.payoff + values
+
+        return
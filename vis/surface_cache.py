@@ -0,0 +1,209 @@
+import numpy as np
+
+from collections import OrderedDict
+from typing import Callable, Optional, Union
+
+from numpy.typing import NDArray
+
+from vis.pricing import option_surface, option_greeks_surface
+
+
+class SurfaceCache:
+    '''
+    LRU cache of per-leg option value surfaces. Entries are keyed by (contract, option type, strike, IV, rate,
+    dividend yield, date grid) and hold the surface columns for every stock price priced so far, so a request
+    with a shifted or resized price grid only prices the prices that are not cached yet. Surfaces can have leading
+    dimensions (e.g. value and Greeks stacked), as long as the last two axes are dates and prices.
+
+    ### Parameters:
+    - max_entries: int: Maximum number of legs (keys) kept before the least recently used one is evicted.
+    - max_columns: int: Maximum number of price columns kept per entry. When exceeded, only the columns of
+    the latest request are kept.
+    - pricer: Callable: Function pricing missing columns, with the signature of vis.pricing.option_surface.
+    - key_resolution: float: If set, times to expiration are rounded to this many years in the cache key only, so
+    grids whose first row is valued at slightly different times share an entry. Priced values are not rounded.
+
+    ### Attributes:
+    - hits: int: Number of price columns served from the cache.
+    - misses: int: Number of price columns that had to be priced.
+
+    ### Methods:
+    - get_surface: Get the value surface of one leg over a (date x price) grid.
+    - make_key: Build the cache key of one leg and date grid.
+    - missing: Get the prices of a request that are not cached yet.
+    - insert: Add newly priced columns to an entry.
+    - lookup: Get cached columns of an entry.
+    - clear: Remove all entries and reset the counters.
+    '''
+    def __init__(self,
+                 max_entries: int = 64,
+                 max_columns: int = 4096,
+                 pricer: Callable = option_surface,
+                 key_resolution: Optional[float] = None):
+        self.max_entries = max_entries
+        self.max_columns = max_columns
+        self.pricer = pricer
+        self.key_resolution = key_resolution
+
+        self._entries = OrderedDict() # key -> (sorted prices, values of shape (..., n_dates, n_prices))
+
+        self.hits = 0
+        self.misses = 0
+
+        return
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def make_key(self,
+                 opt_type: str,
+                 dtes: NDArray[np.float64],
+                 k: float,
+                 r: float,
+                 q: float,
+                 iv: Union[NDArray[np.float64], float],
+                 contract: Optional[str] = None) -> tuple:
+        '''
+        Build the cache key of one leg priced over the date grid dtes. Parameters are the same as get_surface.
+        '''
+        dtes = np.asarray(dtes, dtype=np.float64)
+        if self.key_resolution is not None:
+            dtes = np.round(dtes / self.key_resolution)
+        return (contract, opt_type, float(k), np.asarray(iv, dtype=np.float64).tobytes(), float(r), float(q),
+                dtes.tobytes())
+
+    def missing(self, key: tuple, prices: NDArray[np.float64]) -> NDArray[np.float64]:
+        '''
+        Returns the sorted unique prices of the request that are not cached for key yet, and updates the hit/miss
+        counters. Marks key as recently used.
+
+        ### Parameters:
+        - key: tuple: Cache key from make_key.
+        - prices: NDArray: Requested stock prices.
+        '''
+        prices = np.asarray(prices, dtype=np.float64)
+
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            cached_prices = self._entries[key][0]
+        else:
+            cached_prices = np.array([])
+
+        found = self.__lookup(cached_prices, prices) >= 0
+
+        self.hits += int(found.sum())
+        self.misses += len(prices) - int(found.sum())
+
+        return np.unique(prices[~found])
+
+    def insert(self,
+               key: tuple,
+               new_prices: NDArray[np.float64],
+               new_values: NDArray[np.float64],
+               requested: Optional[NDArray[np.float64]] = None) -> None:
+        '''
+        Add newly priced columns to the entry of key, evicting the least recently used entry if the cache is full.
+
+        ### Parameters:
+        - key: tuple: Cache key from make_key.
+        - new_prices: NDArray: Stock prices of the new columns. Must not already be cached.
+        - new_values: NDArray: Values of shape (..., n_dates, len(new_prices)).
+        - requested: NDArray: Prices of the current request, kept if the entry exceeds max_columns.
+        '''
+        new_prices = np.asarray(new_prices, dtype=np.float64)
+
+        if key in self._entries:
+            cached_prices, cached_values = self._entries[key]
+        else:
+            cached_prices, cached_values = np.array([]), np.empty(new_values.shape[:-1] + (0,))
+
+        if new_prices.size > 0:
+            merged_prices = np.concatenate([cached_prices, new_prices])
+            order = np.argsort(merged_prices)
+            cached_prices = merged_prices[order]
+            cached_values = np.concatenate([cached_values, new_values], axis=-1)[..., order]
+
+            if cached_prices.size > self.max_columns and requested is not None:
+                keep = self.__lookup(cached_prices, np.asarray(requested, dtype=np.float64))
+                keep = np.unique(keep[keep >= 0])
+                cached_prices, cached_values = cached_prices[keep], cached_values[..., keep]
+
+        self._entries[key] = (cached_prices, cached_values)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False) # evict least recently used
+
+        return
+
+    def lookup(self, key: tuple, prices: NDArray[np.float64]) -> NDArray[np.float64]:
+        '''
+        Returns the cached surface of key for the requested prices, of shape (..., n_dates, len(prices)).
+        Raises KeyError if the key or any of the prices is not cached.
+        '''
+        prices = np.asarray(prices, dtype=np.float64)
+        cached_prices, cached_values = self._entries[key]
+
+        idx = self.__lookup(cached_prices, prices)
+        if (idx < 0).any():
+            raise KeyError('Not all requested prices are cached.')
+
+        return cached_values[..., idx]
+
+    def get_surface(self,
+                    opt_type: str,
+                    prices: NDArray[np.float64],
+                    dtes: NDArray[np.float64],
+                    k: float,
+                    r: float,
+                    q: float,
+                    iv: Union[NDArray[np.float64], float],
+                    contract: Optional[str] = None) -> NDArray[np.float64]:
+        '''
+        Get the value of one option over a grid of dates and prices, pricing only the columns not already cached.
+        Returns an array of shape (..., len(dtes), len(prices)), as returned by self.pricer.
+
+        ### Parameters:
+        - opt_type: str: 'c' for call, 'p' for put.
+        - prices: NDArray: Stock prices (columns of the surface).
+        - dtes: NDArray: Times to expiration in years (rows of the surface).
+        - k: float: Strike price.
+        - r: float: Risk-free interest rate.
+        - q: float: Dividend yield.
+        - iv: float | NDArray: Implied volatility, or one per row (date).
+        - contract: str: Contract name of the option, e.g. "AAPL  241129C00100000".
+        '''
+        key = self.make_key(opt_type, dtes, k, r, q, iv, contract)
+
+        missing = self.missing(key, prices)
+        new_values = self.pricer(opt_type, missing, dtes, k, r, q, iv)
+        self.insert(key, missing, new_values, requested=prices)
+
+        return self.lookup(key, prices)
+
+    def clear(self) -> None:
+        '''
+        Remove all cached surfaces and reset the hit/miss counters.
+        '''
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+        return
+
+    @staticmethod
+    def __lookup(cached_prices: NDArray[np.float64], prices: NDArray[np.float64]) -> NDArray[np.int64]:
+        '''
+        Returns the column index of each price in cached_prices, or -1 where the price is not cached.
+        '''
+        if cached_prices.size == 0:
+            return np.full(len(prices), -1)
+
+        pos = np.clip(np.searchsorted(cached_prices, prices), 0, cached_prices.size - 1)
+
+        return np.where(cached_prices[pos] == prices, pos, -1)
+
+
+# shared between heatmaps so re-opening a heatmap reuses surfaces computed by earlier ones. Heatmaps value their
+# first row at the current time, keyed to the day so re-renders later in the day still hit the cache
+default_cache = SurfaceCache(key_resolution=1/365)
+default_greeks_cache = SurfaceCache(pricer=option_greeks_surface, key_resolution=1/365)
@@ -0,0 +1,158 @@
+import numpy as np
+
+from typing import Optional, Union
+
+from numpy.typing import NDArray
+
+# smallest total variance returned by a smile, keeps the wings of a concave fit from going negative
+MIN_TOTAL_VARIANCE = 1e-8
+
+
+class VolSurface:
+    '''
+    Implied volatility surface of one underlying, built from every strike and expiration of a chain. Each expiry gets
+    a parametric smile: total implied variance w = iv^2 * t as a quadratic in log-moneyness k = ln(K / F), with F the
+    forward price. All smiles are fitted together with one batched least squares solve. Between expiries the total
+    variance is interpolated linearly in time at constant log-moneyness; before the first and after the last expiry
+    the volatility is held constant. Outside the fitted strikes the smile is held flat.
+
+    The smiles are evaluated once on a grid of log-moneyness x expiry, so a lookup is a bilinear interpolation on
+    that grid with O(1) work per point, and iv takes arrays of any shape.
+
+    ### Parameters:
+    - expiries: NDArray: Times to expiration of the smiles, in years, increasing.
+    - params: NDArray: (len(expiries), 3) coefficients (a, b, c) of w = a + b k + c k^2 of each smile.
+    - k_range: tuple[float, float]: Range of log-moneyness covered by the quotes.
+    - s0: float: Price of the underlying.
+    - r: float: Risk-free interest rate, as a decimal (0.045, not the percent of the providers).
+    - q: float: Dividend yield, as a decimal.
+    - num_k: int: Number of log-moneyness nodes of the lookup grid.
+
+    ### Methods:
+    - from_chain: Fit the surface to an OptionChain.
+    - iv: Get implied volatilities at (strike, time) points.
+    - total_variance: Get total implied variances at (log-moneyness, time) points.
+    '''
+    def __init__(self,
+                 expiries: NDArray[np.float64],
+                 params: NDArray[np.float64],
+                 k_range: tuple[float, float],
+                 s0: float,
+                 r: float,
+                 q: float,
+                 num_k: int = 201):
+        self.expiries = np.asarray(expiries, dtype=np.float64)
+        self.params = np.asarray(params, dtype=np.float64)
+        self.s0, self.r, self.q = s0, r, q
+
+        self.k_nodes = np.linspace(k_range[0], k_range[1], num_k)
+        self._dk = self.k_nodes[1] - self.k_nodes[0] if num_k > 1 else 1.0
+
+        # (len(expiries), num_k) total variance of every smile on the grid
+        a, b, c = (self.params[:, i:i + 1] for i in range(3))
+        self.w_grid = np.maximum(a + b * self.k_nodes + c * self.k_nodes ** 2, MIN_TOTAL_VARIANCE)
+
+        return
+
+    @classmethod
+    def from_chain(cls,
+                   chain,
+                   s0: float,
+                   r: float,
+                   q: float,
+                   ivs: Optional[NDArray[np.float64]] = None,
+                   min_quotes: int = 3,
+                   max_iv: float = 5.0) -> 'VolSurface':
+        '''
+        Fit the surface to an OptionChain (utils.chain). Uses the out of the money contract at each strike (puts below
+        the forward, calls above), which carry the most reliable volatilities, and skips quotes without a bid.
+        Raises ValueError if no quote is usable.
+
+        ### Parameters:
+        - chain: OptionChain: Chain of the underlying, all expirations.
+        - s0: float: Price of the underlying.
+        - r: float: Risk-free interest rate, as a decimal.
+        - q: float: Dividend yield, as a decimal.
+        - ivs: NDArray: Implied volatilities of the contracts (decimals), e.g. from vis.implied_vol.chain_implied_vols.
+        Defaults to the Volatility column of the chain.
+        - min_quotes: int: Expirations with fewer usable quotes get a flat smile at their average volatility.
+        - max_iv: float: Volatilities above this are treated as bad quotes.
+        '''
+        columns = chain.columns
+        strikes = np.asarray(columns['Strike'], dtype=np.float64)
+        t = np.asarray(columns['Days to Expiration'], dtype=np.float64) / 365
+        ivs = np.asarray(columns['Volatility'], dtype=np.float64) / 100 if ivs is None else np.asarray(ivs)
+        is_call = np.asarray(chain.is_call)
+
+        forward = s0 * np.exp((r - q) * t)
+        k = np.log(strikes / forward)
+
+        usable = (np.isfinite(ivs) & (ivs > 0) & (ivs < max_iv) & (t > 0) & (np.asarray(columns['Bid']) > 0)
+                  & (is_call == (k >= 0)))
+
+        if not usable.any():
+            raise ValueError('No usable quotes to fit a volatility surface.')
+
+        expiries, inverse = np.unique(t[usable], return_inverse=True)
+        k, w = k[usable], ivs[usable] ** 2 * t[usable]
+
+        # weighted normal equations of w = a + b k + c k^2 for every expiry at once. Weights of 1 / w^2 fit the
+        # relative error, otherwise the steep wing of the smile outweighs the quotes near the money
+        n = len(expiries)
+        weights = 1 / w ** 2
+        moments = np.stack([np.bincount(inverse, weights=weights * k ** p, minlength=n) for p in range(5)], axis=1)
+        rhs = np.stack([np.bincount(inverse, weights=weights * w * k ** p, minlength=n) for p in range(3)], axis=1)
+        lhs = np.stack([moments[:, i:i + 3] for i in range(3)], axis=1)
+
+        # a flat smile where the quadratic is not determined
+        counts = np.bincount(inverse, minlength=n)
+        enough = counts >= min_quotes
+        params = np.zeros((n, 3))
+        params[:, 0] = rhs[:, 0] / moments[:, 0]
+        solvable = enough & (np.linalg.cond(lhs) < 1e12)
+        if solvable.any():
+            params[solvable] = np.linalg.solve(lhs[solvable], rhs[solvable][..., None])[..., 0]
+
+        return cls(expiries, params, (float(k.min()), float(k.max())), s0, r, q)
+
+    def total_variance(self, k: Union[NDArray[np.float64], float], t: Union[NDArray[np.float64], float]) -> NDArray[np.float64]:
+        '''
+        Get the total implied variance at log-moneyness k and time t (arrays broadcast). Bilinear interpolation on
+        the precomputed grid, see the class docstring for the extrapolation rules.
+        '''
+        k, t = np.broadcast_arrays(np.asarray(k, dtype=np.float64), np.asarray(t, dtype=np.float64))
+
+        # position on the uniform log-moneyness axis, clamped (flat smile outside the quotes)
+        pos = np.clip((k - self.k_nodes[0]) / self._dk, 0, len(self.k_nodes) - 1)
+        j0 = np.minimum(pos.astype(np.int64), len(self.k_nodes) - 2) if len(self.k_nodes) > 1 else np.zeros(pos.shape, np.int64)
+        fk = pos - j0
+        j1 = np.minimum(j0 + 1, len(self.k_nodes) - 1)
+
+        def smile(e: NDArray[np.int64]) -> NDArray[np.float64]:
+            return (1 - fk) * self.w_grid[e, j0] + fk * self.w_grid[e, j1]
+
+        n = len(self.expiries)
+        e1 = np.clip(np.searchsorted(self.expiries, t), 1, max(n - 1, 1)) if n > 1 else np.zeros(t.shape, np.int64)
+        e0 = np.maximum(e1 - 1, 0)
+        t0, t1 = self.expiries[e0], self.expiries[e1]
+        w0, w1 = smile(e0), smile(e1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ft = np.where(t1 > t0, (t - t0) / (t1 - t0), 0.0)
+            w = w0 + ft * (w1 - w0)
+            # constant volatility outside the expiries: scale the total variance of the nearest smile with time
+            w = np.where(t < self.expiries[0], smile(np.zeros(t.shape, np.int64)) * t / self.expiries[0], w)
+            w = np.where(t > self.expiries[-1], smile(np.full(t.shape, n - 1)) * t / self.expiries[-1], w)
+
+        return np.maximum(w, 0)
+
+    def iv(self, strikes: Union[NDArray[np.float64], float], t: Union[NDArray[np.float64], float]) -> NDArray[np.float64]:
+        '''
+        Get implied volatilities (decimals) at strikes and times to expiration in years (arrays broadcast), e.g.
+        strikes of shape (1, n) and t of shape (m, 1) give an (m, n) array.
+        '''
+        strikes = np.asarray(strikes, dtype=np.float64)
+        t = np.maximum(np.asarray(t, dtype=np.float64), 1e-8)
+        k = np.log(strikes / (self.s0 * np.exp((self.r - self.q) * t)))
+
+        return np.sqrt(self.total_variance(k, t) / t)